@@ -0,0 +1,253 @@
+#
+#   Benchmarks for the LCONF load, parse, and analysis hot paths
+#
+"""Benchmark suite for lconfig.py
+
+    python lcbench.py [-o results.json] [--compare old.json]
+
+Synthetic LConf data files of configurable size are generated in a
+temporary directory, and the bundled data files (10.dat - 25.dat, cal.dat,
+and zero.dat) are used when they are found next to this script.  Each
+benchmark case is timed as the best of several repetitions, and its peak
+Python memory allocation (including NumPy arrays) is measured separately
+with tracemalloc.  Results are written to JSON so that they can be
+compared between versions with --compare.
+
+Run with --help for the list of options.
+"""
+import os, sys, time, json, argparse, tempfile, tracemalloc, platform, subprocess
+# Plotting benchmarks must not need a display
+os.environ.setdefault('MPLBACKEND', 'Agg')
+import numpy as np
+import lconfig as lc
+
+BUNDLED = ['10.dat', '15.dat', '20.dat', '25.dat', 'cal.dat', 'zero.dat']
+
+
+def write_synthetic(filename, naich=2, nsample=10000, distream=False,
+        samplehz=1000., seed=0):
+    """Write a synthetic LConf data file
+    write_synthetic(filename, naich=2, nsample=10000, distream=False)
+
+Channel 0 is a noisy 5Hz triangle wave, and the remaining channels are
+noise.  If DISTREAM is True, a digital input stream column is appended
+with bit 0 toggling once per triangle period and bit 1 toggling at
+random.  Every channel is given a calibration slope and zero so that the
+calibration step is not skipped.
+"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(nsample) / samplehz
+    data = 0.01*rng.standard_normal((nsample, naich))
+    data[:,0] += 5.*np.abs(((t*5.) % 1.) - 0.5)
+    with open(filename, 'w') as ff:
+        ff.write('# Configuration automatically generated by LCBENCH\n')
+        ff.write('connection eth\ndevice t7\nname "BENCH"\n')
+        ff.write('samplehz %f\nsettleus 1.000000\nnsample %d\n'%(samplehz, nsample))
+        if distream:
+            ff.write('distream 1\n')
+        for aich in range(naich):
+            ff.write('\naichannel %d\nailabel "AI%d"\nainegative 199\n'%(aich, aich))
+            ff.write('airange 10.000000\nairesolution 0\n')
+            ff.write('aicalslope 2.000000\naicalzero 0.100000\naicalunits "V"\n')
+        ff.write('\naochannel 0\naosignal triangle\naofrequency 5.000000\n')
+        ff.write('aoamplitude 2.500000\naooffset 2.500000\naoduty 0.500000\n')
+        ff.write('\nmeta float\nfg_scfh 4.550000\no2_scfh 5.490000\nmeta end\n')
+        ff.write('\n## End Configuration ##\n#: %s\n'%time.ctime(0))
+        if distream:
+            bits = (((t*5.) % 1.) < 0.5).astype(int)
+            bits |= (rng.random(nsample) < 0.01).cumsum() % 2 << 1
+            data = np.concatenate((data, bits.reshape(-1,1)), axis=1)
+        np.savetxt(ff, data, fmt='%e', delimiter='\t')
+
+
+def _read_params(filename):
+    """Tokenize a configuration header with _read_param()"""
+    with open(filename, 'r') as ff:
+        param = lc._read_param(ff)
+        while param and param != '##':
+            param = lc._read_param(ff)
+
+
+def _plot(conf):
+    """Plot every channel to an off-screen figure"""
+    import matplotlib.pyplot as plt
+    fig = plt.figure()
+    ax = fig.add_subplot(111)
+    for aich in range(conf.naich(0)):
+        conf.show_channel(aich, ax=ax, show=False)
+    if conf.didata is not None:
+        conf.show_dichannel(0, ax=ax, show=False)
+    plt.close(fig)
+
+
+def _slices(conf):
+    """Repeatedly retrieve channel windows with get_channel()"""
+    duration = conf.ndata() / conf.get(0, 'samplehz')
+    for aich in range(conf.naich(0)):
+        for start in np.linspace(0, duration, 20, endpoint=False):
+            conf.get_channel(aich, start=start, stop=start+duration/10.)
+            conf.get_channel(aich, start=start, downsample=4)
+        conf.get_channel(aich)
+
+
+def cases(filename):
+    """Return a list of (name, function) benchmark cases for a data file"""
+    conf = lc.LConf(filename, data=True)
+    header = lc.LConf(filename)
+    with open(filename, 'rb') as ff:
+        ff.seek(header._offset)
+        text = ff.read()
+    raw = lc._parse_rows(text)
+    out = [
+        ('read_param', lambda: _read_params(filename)),
+        ('header', lambda: lc.LConf(filename)),
+        ('parse', lambda: lc._parse_rows(text)),
+        ('load', lambda: lc.LConf(filename, data=True, cal=False)),
+        ('calibrate', lambda: header._convert_block(raw.copy())),
+        ('load_cal', lambda: lc.LConf(filename, data=True, cal=True)),
+        ('load_compact', lambda: lc.LConf(filename, data=True, compact=True)),
+        ('get_channel', lambda: _slices(conf)),
+        ('get_events', lambda: conf.get_events(0, level=conf.get_channel(0).mean())),
+    ]
+    if conf.didata is not None:
+        out.append(('get_dievents', lambda: conf.get_dievents(0, level=1)))
+    out.append(('plot', lambda: _plot(conf)))
+    return out
+
+
+def measure(fn, repeat=3):
+    """Return the best time in seconds and the peak allocation in bytes
+    seconds, peak = measure(fn, repeat=3)
+"""
+    best = None
+    for index in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run(files, repeat=3, skip=(), verbose=True):
+    """Run the benchmark cases on each file and return a list of results"""
+    results = []
+    for filename, label in files:
+        for name, fn in cases(filename):
+            if name in skip:
+                continue
+            seconds, peak = measure(fn, repeat=repeat)
+            results.append({'file':label, 'case':name,
+                    'seconds':seconds, 'peak_bytes':peak,
+                    'size_bytes':os.path.getsize(filename)})
+            if verbose:
+                print('%-28s %-14s %10.3f ms %10.1f kB'%(
+                        label, name, seconds*1e3, peak/1024.))
+    return results
+
+
+def startup(repeat=3, verbose=True):
+    """Time "import lconfig" in fresh interpreters
+    
+Three cases are timed: importing numpy alone (the unavoidable floor),
+importing lconfig, and importing lconfig and then touching lconfig.plt,
+which is what every import cost before matplotlib was loaded lazily.
+"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    statements = [
+        ('import_numpy', 'import numpy'),
+        ('import_lconfig', 'import lconfig'),
+        ('import_lconfig_plt', 'import lconfig; lconfig.plt'),
+    ]
+    results = []
+    for name, statement in statements:
+        code = ('import time; t0 = time.perf_counter(); %s; '
+                'print(time.perf_counter() - t0)'%statement)
+        best = None
+        for index in range(repeat):
+            out = subprocess.run([sys.executable, '-c', code], cwd=here,
+                    capture_output=True, text=True, check=True)
+            dt = float(out.stdout.split()[-1])
+            best = dt if best is None else min(best, dt)
+        results.append({'file':'startup', 'case':name, 'seconds':best,
+                'peak_bytes':0, 'size_bytes':0})
+        if verbose:
+            print('%-28s %-18s %10.3f ms'%('startup', name, best*1e3))
+    return results
+
+
+def compare(results, old):
+    """Print the ratio of new to old times for matching cases"""
+    previous = {(this['file'], this['case']):this for this in old['results']}
+    print('\n*** Compared with version %s ***'%old.get('version', '?'))
+    for this in results:
+        key = (this['file'], this['case'])
+        if key in previous and previous[key]['seconds'] > 0:
+            ratio = this['seconds'] / previous[key]['seconds']
+            print('%-28s %-14s %8.2fx time %8.2fx memory'%(
+                    key[0], key[1], ratio,
+                    this['peak_bytes'] / max(previous[key]['peak_bytes'], 1)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark lconfig.py hot paths.')
+    parser.add_argument('-o', '--output', default='bench_output.json',
+            help='JSON file to write the results to')
+    parser.add_argument('--compare', default=None,
+            help='JSON results from a previous run to compare against')
+    parser.add_argument('--naich', type=int, nargs='+', default=[2, 8],
+            help='Numbers of analog input channels in the synthetic files')
+    parser.add_argument('--nsample', type=int, nargs='+', default=[10000, 100000],
+            help='Numbers of samples in the synthetic files')
+    parser.add_argument('--repeat', type=int, default=3,
+            help='Number of timed repetitions per case')
+    parser.add_argument('--skip', nargs='*', default=[],
+            help='Names of cases to skip (e.g. startup plot get_events)')
+    parser.add_argument('--no-bundled', action='store_true',
+            help='Do not benchmark the bundled data files')
+    args = parser.parse_args(argv)
+
+    results = []
+    if 'startup' not in args.skip:
+        results += startup(repeat=args.repeat)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for naich in args.naich:
+            for nsample in args.nsample:
+                for distream in (False, True):
+                    label = 'synth_%dch_%d%s'%(naich, nsample, '_di' if distream else '')
+                    filename = os.path.join(tmp, label + '.dat')
+                    write_synthetic(filename, naich=naich, nsample=nsample,
+                            distream=distream)
+                    files.append((filename, label))
+        if not args.no_bundled:
+            here = os.path.dirname(os.path.abspath(__file__))
+            for name in BUNDLED:
+                filename = os.path.join(here, name)
+                if os.path.isfile(filename):
+                    files.append((filename, name))
+        results += run(files, repeat=args.repeat, skip=args.skip)
+
+    out = {'version':lc.__version__,
+            'python':platform.python_version(),
+            'numpy':np.__version__,
+            'platform':platform.platform(),
+            'time':time.strftime('%Y-%m-%d %H:%M:%S'),
+            'results':results}
+    with open(args.output, 'w') as ff:
+        json.dump(out, ff, indent=1)
+
+    if args.compare:
+        with open(args.compare, 'r') as ff:
+            compare(results, json.load(ff))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+#
+#   Batched IV characteristic model fitting for LCONF data
+#
+"""Nonlinear fits of IV characteristic models to many runs
+
+The IV characteristic of each run is first binned by voltage with
+LConfSet.get_binned(), and the models are fit to the bin means weighted
+by their standard errors.  Runs are ordered by total flow rate and split
+into contiguous groups that are fit in parallel worker processes.  Within
+each group, every fit is started from the result for the neighboring
+flow rate.
+
+    import lconfig as lc
+    import lcfit
+    LS = lc.LConfSet(['10.dat', '15.dat', '20.dat', '25.dat'], data=True)
+    table = lcfit.fit_runs(LS, 'saturation', vmin=0.)
+    table['isat'], table['isat_err']
+
+MODELS is a dictionary of the available models.  Each entry is a tuple
+(fn, names, guess) where fn(v, *p) evaluates the model, NAMES is a tuple
+of the parameter names, and guess(v, i) returns an initial guess from
+binned data.  New models can be added to the dictionary.
+
+    saturation      i = isat * (1 - exp(-(v - v0)/vs))
+    exponential     i = i0 + a * exp(v/ve)
+"""
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from scipy.optimize import curve_fit
+import lconfig as lc
+
+
+def _saturation(v, isat, v0, vs):
+    return isat * (1. - np.exp(-(v - v0)/vs))
+
+
+def _saturation_guess(v, i):
+    isat = i[np.argmax(np.abs(v))]
+    # The zero crossing or the middle of the voltage range
+    cross = np.flatnonzero(np.diff(np.sign(i)))
+    v0 = v[cross[0]] if cross.size else v.mean()
+    return (isat, v0, max(np.ptp(v)/4., 1e-3))
+
+
+def _exponential(v, i0, a, ve):
+    return i0 + a * np.exp(v/ve)
+
+
+def _exponential_guess(v, i):
+    # Decay toward the end of the voltage range with the smaller slope
+    i0 = i[-1] if abs(i[-1]-i[-2]) < abs(i[1]-i[0]) else i[0]
+    ve = np.ptp(v)/3. if i0 == i[0] else -np.ptp(v)/3.
+    a = (i[np.argmax(np.abs(i - i0))] - i0) / \
+            np.exp(v[np.argmax(np.abs(i - i0))]/ve)
+    return (i0, a, ve)
+
+
+MODELS = {
+    'saturation':(_saturation, ('isat', 'v0', 'vs'), _saturation_guess),
+    'exponential':(_exponential, ('i0', 'a', 've'), _exponential_guess),
+}
+
+
+def fit_curve(v, i, sigma=None, model='saturation', p0=None, maxfev=10000):
+    """Fit a model to a single binned IV characteristic
+    p, perr, chi2 = fit_curve(v, i, sigma=None, model='saturation', p0=None)
+
+V and I are the bin voltages and mean currents, and SIGMA is the
+standard error of each bin mean.  Bins with NaN values are ignored.  P
+is the array of best-fit parameters, PERR is the array of their standard
+errors, and CHI2 is the reduced chi-squared of the fit.  If P0 is None,
+the model's guess function is used.  If the fit fails, P and PERR are
+NaN, and an exception is not raised.
+"""
+    fn, names, guess = MODELS[model]
+    v = np.asarray(v, dtype=float)
+    i = np.asarray(i, dtype=float)
+    keep = np.isfinite(v) & np.isfinite(i)
+    if sigma is not None:
+        sigma = np.asarray(sigma, dtype=float)
+        keep &= np.isfinite(sigma) & (sigma > 0)
+        sigma = sigma[keep]
+    v = v[keep]
+    i = i[keep]
+    nan = np.full(len(names), np.nan)
+    if v.size <= len(names):
+        return nan, nan, np.nan
+    if p0 is None or not np.all(np.isfinite(p0)):
+        p0 = guess(v, i)
+    try:
+        p, pcov = curve_fit(fn, v, i, p0=p0, sigma=sigma,
+                absolute_sigma=sigma is not None, maxfev=maxfev)
+    except (RuntimeError, ValueError):
+        return nan, nan, np.nan
+    resid = (i - fn(v, *p))
+    if sigma is not None:
+        resid /= sigma
+    chi2 = (resid*resid).sum() / (v.size - len(names))
+    return p, np.sqrt(np.diag(pcov)), chi2
+
+
+def _fit_group(model, v, curves, p0):
+    """Fit a sequence of curves, starting each from the previous result
+
+This is the function run by each worker process.  CURVES is a list of
+(i, sigma) pairs that share the bin voltages V.
+"""
+    out = []
+    for i, sigma in curves:
+        p, perr, chi2 = fit_curve(v, i, sigma, model=model, p0=p0)
+        if np.all(np.isfinite(p)):
+            p0 = p
+        out.append((p, perr, chi2))
+    return out
+
+
+def fit_runs(runs, model='saturation', aich=0, xaich=1, bins=100,
+        vmin=None, vmax=None, p0=None, nproc=None, minchain=4, **kwarg):
+    """Fit a model to the binned IV characteristic of many runs
+    table = fit_runs(runs, model='saturation', aich=0, xaich=1, bins=100)
+
+RUNS is an lconfig.LConfSet or a list of file names or LConf objects.
+Additional keyword arguments are passed to LConf when files are loaded
+(data=True is the default).
+The current in channel AICH is binned by the voltage in channel XAICH
+with LConfSet.get_binned(), and BINS is passed to it.  Only bins with
+centers between VMIN and VMAX (if specified) are fit.
+
+The runs are sorted by total flow (fg_scfh + o2_scfh), split into 
+contiguous groups, and the groups are fit in parallel processes.  Each
+fit starts from the result of the run with the next lower flow rate in
+its group, and the first fit in each group starts from P0 (or the
+model's guess).  So that there are warm starts to speak of, each group 
+has at least MINCHAIN runs, and the number of groups is the smaller of 
+NPROC and nrun // MINCHAIN (but at least 1).  NPROC defaults to the 
+number of CPUs.  If there is one group, all fits are done in this 
+process.
+
+TABLE is a NumPy structured array with one row per run in the original
+order.  The fields are 'filename', 'fg_scfh', 'o2_scfh', 'flow', each
+parameter name, each parameter name with '_err' appended for its
+standard error, and 'chi2' for the reduced chi-squared.
+"""
+    if not isinstance(runs, lc.LConfSet):
+        kwarg.setdefault('data', True)
+        runs = lc.LConfSet(runs, **kwarg)
+    names = MODELS[model][1]
+    v, mean, std, count = runs.get_binned(aich, xaich, bins=bins)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sigma = std / np.sqrt(count)
+    keep = np.ones(v.shape, dtype=bool)
+    if vmin is not None:
+        keep &= v >= vmin
+    if vmax is not None:
+        keep &= v <= vmax
+    v = v[keep]
+    mean = mean[:,keep]
+    sigma = sigma[:,keep]
+
+    fg = runs.get_meta('fg_scfh')
+    o2 = runs.get_meta('o2_scfh')
+    flow = fg + o2
+    # NaN flow rates are sorted last
+    order = np.argsort(flow, kind='stable')
+    nrun = len(runs)
+    if nproc is None:
+        nproc = os.cpu_count() or 1
+    # Keep the groups long enough for the warm starts to matter
+    nproc = max(min(nproc, nrun // max(int(minchain), 1)), 1)
+    groups = [group for group in np.array_split(order, nproc) if group.size]
+
+    if nproc == 1:
+        results = [_fit_group(model, v, [(mean[k], sigma[k]) for k in group], p0)
+                for group in groups]
+    else:
+        with ProcessPoolExecutor(max_workers=nproc) as pool:
+            futures = [pool.submit(_fit_group, model, v,
+                    [(mean[k], sigma[k]) for k in group], p0)
+                    for group in groups]
+            results = [future.result() for future in futures]
+
+    dtype = [('filename', 'U256'), ('fg_scfh', float), ('o2_scfh', float),
+            ('flow', float)]
+    dtype += [(name, float) for name in names]
+    dtype += [(name + '_err', float) for name in names]
+    dtype += [('chi2', float)]
+    table = np.zeros(nrun, dtype=dtype)
+    table['filename'] = runs.get_filenames()
+    table['fg_scfh'] = fg
+    table['o2_scfh'] = o2
+    table['flow'] = flow
+    for group, result in zip(groups, results):
+        for k, (p, perr, chi2) in zip(group, result):
+            for index, name in enumerate(names):
+                table[name][k] = p[index]
+                table[name + '_err'][k] = perr[index]
+            table['chi2'][k] = chi2
+    return table
@@ -1,14 +1,81 @@
 #
 #   Load LCONF configuration and data
 #
-import os, sys
+import os, sys, re, time, hashlib
 import numpy as np
 import json
-import matplotlib.pyplot as plt
 
 __version__ = '4.04a'
 
 
+def _pyplot():
+    """Import matplotlib.pyplot on first use and return it
+    
+Importing matplotlib is slow and may require a display, so it is put off 
+until something is actually plotted.
+"""
+    global plt
+    import matplotlib.pyplot as plt
+    return plt
+
+
+###
+# Instrumentation
+###
+
+# Instrumentation is off unless instrument() is called
+_INSTRUMENT = False
+_HOOKS = []
+
+def instrument(enable=True):
+    """Turn the LConf hot-path instrumentation on or off
+    previous = instrument(enable=True)
+
+When instrumentation is on, each LConf object accumulates a record of the
+time spent in each phase of its work in its stats member, and the hooks 
+registered with add_hook() are called with each measurement.  The phases
+are:
+    header      Tokenizing the configuration header
+    parse       Reading and parsing numeric rows
+    calibrate   Splitting the digital input stream and applying calibrations
+    events      get_events()
+    dievents    get_dievents()
+    plot        show_channel() and show_dichannel()
+    
+When instrumentation is off, the overhead is one global test per phase.
+Returns the previous state.
+"""
+    global _INSTRUMENT
+    previous = _INSTRUMENT
+    _INSTRUMENT = bool(enable)
+    return previous
+
+
+def add_hook(fn):
+    """Register a function to be called with each instrumentation measurement
+    add_hook(fn)
+    fn(conf, phase, sample)
+    
+CONF is the LConf object, PHASE is the name of the phase, and SAMPLE is a
+dictionary with the 'seconds', 'rows', 'bytes', and 'outbytes' of the 
+single measurement.  See help(instrument).  Hooks are only called while 
+instrumentation is on.
+"""
+    _HOOKS.append(fn)
+
+
+def remove_hook(fn):
+    """Remove a function registered by add_hook()"""
+    _HOOKS.remove(fn)
+
+
+def __getattr__(name):
+    # The module attribute lconfig.plt imports matplotlib on first access
+    if name == 'plt':
+        return _pyplot()
+    raise AttributeError('module %r has no attribute %r'%(__name__, name))
+
+
 
 
 
@@ -82,6 +149,94 @@ def _filter_value(value, default):
     return value
 
 
+def _parse_rows(text):
+    """Parse whitespace separated rows of numbers into a 2-D array
+    data = _parse_rows(text)
+    
+TEXT may be a str or bytes containing complete lines.  The number of 
+columns is determined from the first non-empty line.
+"""
+    if isinstance(text, bytes):
+        text = text.decode()
+    values = text.split()
+    if not values:
+        return np.zeros((0,0))
+    # Use the first line with values to establish the column count
+    ncol = len(re.match(r'\s*([^\n]*)', text).group(1).split())
+    if len(values) % ncol:
+        raise Exception('LCONF: Data rows do not all have %d columns'%ncol)
+    return np.array(values, dtype=float).reshape(-1, ncol)
+
+
+
+# Content hashes of files keyed by (filename, size, mtime)
+_HASHES = {}
+
+def _file_hash(filename):
+    """Return the SHA1 hex digest of a file's contents
+    h = _file_hash(filename)
+    
+Digests are remembered for as long as the file's size and modification 
+time do not change, so repeated calls do not re-read the file.
+"""
+    filename = os.path.abspath(filename)
+    st = os.stat(filename)
+    key = (filename, st.st_size, st.st_mtime_ns)
+    if key not in _HASHES:
+        hh = hashlib.sha1()
+        with open(filename, 'rb') as ff:
+            chunk = ff.read(1048576)
+            while chunk:
+                hh.update(chunk)
+                chunk = ff.read(1048576)
+        _HASHES[key] = hh.hexdigest()
+    return _HASHES[key]
+
+
+def _window(window, N):
+    """Return a periodic window array of length N by name
+    w = _window(window, N)
+    
+WINDOW may be 'hann', 'hamming', 'boxcar', or an array of length N.
+"""
+    if not isinstance(window, str):
+        w = np.asarray(window, dtype=float)
+        if w.shape != (N,):
+            raise Exception('LCONF: The window array must have length %d'%N)
+        return w
+    k = np.arange(N)
+    if window == 'hann':
+        return 0.5 - 0.5*np.cos(2*np.pi*k/N)
+    elif window == 'hamming':
+        return 0.54 - 0.46*np.cos(2*np.pi*k/N)
+    elif window == 'boxcar':
+        return np.ones(N)
+    raise Exception('LCONF: Unrecognized window: %s'%repr(window))
+
+
+# Executor jobs started by the asynchronous readers at any one time
+ASYNC_WORKERS = os.cpu_count() or 1
+_SEMAPHORES = {}
+
+async def _arun(fn, *args):
+    """Run FN(*ARGS) in the event loop's default executor
+    
+The number of jobs running at once, across all files being read, is 
+bounded by ASYNC_WORKERS so that loading many files does not 
+oversubscribe the cores or starve other work on the event loop.
+"""
+    import asyncio
+    loop = asyncio.get_running_loop()
+    # Semaphores belong to one event loop
+    sem = _SEMAPHORES.get(loop)
+    if sem is None:
+        for other in [this for this in _SEMAPHORES if this.is_closed()]:
+            del _SEMAPHORES[other]
+        sem = _SEMAPHORES[loop] = asyncio.Semaphore(ASYNC_WORKERS)
+    async with sem:
+        return await loop.run_in_executor(None, fn, *args)
+
+
 class LEnum:
     """Enumerated value class
     
@@ -206,6 +361,618 @@ LE2 = LEnum(LE)
             return
         raise Exception('LE setstate: State is out-of-range: %d'%ind)
 
+class LCache:
+    """Bounded least-recently-used cache
+    C = LCache(maxsize=128)
+    
+    C[key] = value
+    value = C.get(key, default=None)
+    key in C
+    C.clear()
+    C.info()
+
+When the cache holds MAXSIZE entries, adding a new entry discards the
+least recently used one.  If MAXSIZE is None, the cache is unbounded.  
+Every get() is counted as a hit or a miss, and info() returns a 
+dictionary with the 'hits', 'misses', 'size', and 'maxsize'.  Testing 
+membership with "in" is not counted and does not mark the entry as used.
+"""
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        
+    def __len__(self):
+        return len(self._entries)
+        
+    def __contains__(self, key):
+        return key in self._entries
+        
+    def __setitem__(self, key, value):
+        self._entries.pop(key, None)
+        self._entries[key] = value
+        while self.maxsize is not None and len(self._entries) > self.maxsize:
+            del self._entries[next(iter(self._entries))]
+            
+    def get(self, key, default=None):
+        """Return the value for KEY and mark it as most recently used"""
+        if key in self._entries:
+            self.hits += 1
+            # Move the entry to the end of the ordering
+            value = self._entries.pop(key)
+            self._entries[key] = value
+            return value
+        self.misses += 1
+        return default
+        
+    def clear(self):
+        """Discard all entries; the hit and miss counts are kept"""
+        self._entries.clear()
+        
+    def info(self):
+        """Return a dictionary of the cache statistics"""
+        return {'hits':self.hits, 'misses':self.misses, 
+                'size':len(self._entries), 'maxsize':self.maxsize}
+
+class LCompact:
+    """Quantized integer storage for a 2-D array of samples
+    C = LCompact(raw, scale, offset=None)
+    
+RAW is an (nsample, nchannel) integer array, and the values it 
+represents are raw*scale + offset, where SCALE and OFFSET are arrays with
+one element per channel.  When an LConf object is loaded with the 
+compact keyword, its data member is an LCompact instance instead of a 
+float64 array, which reduces the memory needed for the channel data by 
+a factor of 4 (int16) or 2 (int32).
+
+LCompact objects are indexed like 2-D arrays, and the result is always 
+a new float64 array scaled on the fly, so only the requested samples are 
+ever expanded.  np.asarray(C) expands the entire array.
+    C[1000:2000, 0]
+    C.shape
+    
+The error() method returns the quantization error bound of each channel,
+which is half of its scale.  The scale and offset arrays may be changed
+in-place to rescale the data; LConf.set_cal() does this.
+"""
+    def __init__(self, raw, scale, offset=None):
+        self.raw = raw
+        self.scale = np.array(scale, dtype=float)
+        if offset is None:
+            self.offset = np.zeros(self.scale.shape)
+        else:
+            self.offset = np.array(offset, dtype=float)
+        # Zero-stride views that index like the raw array
+        self._scale = np.broadcast_to(self.scale, raw.shape)
+        self._offset = np.broadcast_to(self.offset, raw.shape)
+        self.shape = raw.shape
+        self.ndim = raw.ndim
+        self.dtype = np.dtype(float)
+        
+    def __len__(self):
+        return self.shape[0]
+        
+    def __getitem__(self, index):
+        return self.raw[index] * self._scale[index] + self._offset[index]
+        
+    def __setitem__(self, index, value):
+        raise Exception('LCOMPACT: Compact data are read-only.')
+        
+    def __array__(self, dtype=None, copy=None):
+        out = self[...]
+        return out if dtype is None else out.astype(dtype)
+        
+    @property
+    def nbytes(self):
+        return self.raw.nbytes
+        
+    def error(self):
+        """Return the maximum quantization error of each channel"""
+        return np.abs(self.scale) / 2.
+
+
+class LSegments:
+    """Read-only 2-D array of consecutive segments that are loaded on demand
+    S = LSegments(fetch, bounds, ncol, dtype=float)
+
+FETCH(k) returns the 2-D array of segment k, and BOUNDS is the array of 
+the first row of each segment with the total number of rows appended.  
+LSegments objects are indexed like 2-D arrays (by integers, slices, and
+integer or boolean arrays of rows), and only the segments that contain 
+the requested rows are fetched.  The result is always a new array.  
+LConcat uses LSegments for its data and didata members.
+"""
+    def __init__(self, fetch, bounds, ncol, dtype=float):
+        self.fetch = fetch
+        self.bounds = np.asarray(bounds, dtype=int)
+        self.shape = (int(self.bounds[-1]), ncol)
+        self.ndim = 2
+        self.dtype = np.dtype(dtype)
+        
+    def __len__(self):
+        return self.shape[0]
+        
+    def __setitem__(self, index, value):
+        raise Exception('LSEGMENTS: Segmented data are read-only.')
+        
+    def __array__(self, dtype=None, copy=None):
+        out = self[:]
+        return out if dtype is None else out.astype(dtype)
+        
+    def _segment(self, rows):
+        """Return the segment number of each row"""
+        return np.searchsorted(self.bounds, rows, side='right') - 1
+        
+    def __getitem__(self, index):
+        if not isinstance(index, tuple):
+            index = (index,)
+        if len(index) > 2:
+            raise Exception('LSEGMENTS: Too many indices.')
+        rows = index[0]
+        cols = index[1] if len(index) > 1 else slice(None)
+        N = self.shape[0]
+        # The shape and type of an empty selection
+        empty = np.empty((0, self.shape[1]), dtype=self.dtype)[:,cols]
+        
+        if isinstance(rows, (int, np.integer)):
+            row = rows + N if rows < 0 else rows
+            if not 0 <= row < N:
+                raise IndexError('LSEGMENTS: Row %d is out of range.'%rows)
+            k = self._segment(row)
+            return self.fetch(k)[row - self.bounds[k], cols]
+        elif isinstance(rows, slice):
+            start, stop, step = rows.indices(N)
+            if step > 0:
+                pieces = []
+                for k in range(max(self._segment(start), 0), len(self.bounds)-1):
+                    s0, s1 = self.bounds[k], self.bounds[k+1]
+                    if s0 >= stop:
+                        break
+                    # The first selected row in this segment
+                    first = max(start, s0)
+                    first += (start - first) % step
+                    if first < min(stop, s1):
+                        pieces.append(self.fetch(k)[first-s0:min(stop, s1)-s0:step, cols])
+                if len(pieces) == 1:
+                    return pieces[0].copy()
+                return np.concatenate(pieces) if pieces else empty
+            rows = np.arange(start, stop, step)
+            
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        flat = rows.reshape(-1).astype(int)
+        flat = np.where(flat < 0, flat + N, flat)
+        if flat.size and (flat.min() < 0 or flat.max() >= N):
+            raise IndexError('LSEGMENTS: Row index out of range.')
+        segment = self._segment(flat)
+        order = np.argsort(segment, kind='stable')
+        pieces = []
+        for k in np.unique(segment):
+            these = flat[segment == k] - self.bounds[k]
+            pieces.append(self.fetch(k)[these][:,cols])
+        out = np.concatenate(pieces) if pieces else empty
+        result = np.empty_like(out)
+        result[order] = out
+        return result.reshape(rows.shape + out.shape[1:])
+
+
+class LTransitions:
+    """Run-length encoded digital input stream
+    T = LTransitions(starts, values, n, dibits=False)
+    T = LTransitions.encode(raw, dibits=False)
+
+The 16-bit digital input stream is stored as the index of the first 
+sample of each run of identical values (STARTS, beginning with 0) and 
+the value of each run (VALUES).  N is the total number of samples.  
+Since the stream changes rarely, this takes a tiny fraction of the 
+memory of one integer (or 16 booleans) per sample.  When an LConf object 
+is loaded with the dicompact keyword, its didata member is an 
+LTransitions instance.
+
+LTransitions objects are indexed like the didata arrays they replace: 
+(n, 16) booleans if DIBITS is True, or an (n, 1) integer array 
+otherwise.  The result is a new array expanded only for the requested 
+samples.  Queries are answered from the runs directly.
+    T.value(index)              The 16-bit value at sample(s) INDEX
+    T.state(dich, index)        Bit DICH at sample(s) INDEX
+    T.changes(dich, level=0)    The indices where a bit (or a level 
+                                test) changes and its new states
+    T.intervals(dich)           [start, stop) sample pairs where it is high
+Point queries take O(log nrun) time, and the others O(nrun).
+"""
+    def __init__(self, starts, values, n, dibits=False):
+        self.starts = np.asarray(starts, dtype=np.int64)
+        values = np.asarray(values)
+        self.values = values.astype(np.uint16) if values.size and \
+                values.min() >= 0 and values.max() < 65536 else values.astype(int)
+        self.n = int(n)
+        self.dibits = bool(dibits)
+        self.shape = (self.n, 16 if dibits else 1)
+        self.ndim = 2
+        self.dtype = np.dtype(bool if dibits else int)
+        
+    @classmethod
+    def encode(cls, raw, dibits=False):
+        """Run-length encode an array of 16-bit stream values in one pass"""
+        raw = np.asarray(raw).reshape(-1)
+        if raw.size:
+            starts = np.flatnonzero(np.concatenate(([True], raw[1:] != raw[:-1])))
+        else:
+            starts = np.zeros(0, dtype=int)
+        return cls(starts, raw[starts], raw.size, dibits=dibits)
+        
+    @classmethod
+    def concatenate(cls, parts, dibits=False):
+        """Join LTransitions objects end to end, merging runs at the seams"""
+        starts = []
+        values = []
+        n = 0
+        for this in parts:
+            if not this.n:
+                continue
+            s, v = this.starts + n, this.values
+            if values and values[-1][-1] == v[0]:
+                s, v = s[1:], v[1:]
+            starts.append(s)
+            values.append(v)
+            n += this.n
+        if not starts:
+            return cls([], [], 0, dibits=dibits)
+        return cls(np.concatenate(starts), np.concatenate(values), n, dibits=dibits)
+        
+    def __len__(self):
+        return self.n
+        
+    def __setitem__(self, index, value):
+        raise Exception('LTRANSITIONS: The digital input stream is read-only.')
+        
+    def __array__(self, dtype=None, copy=None):
+        out = self[:]
+        return out if dtype is None else out.astype(dtype)
+        
+    @property
+    def nbytes(self):
+        return self.starts.nbytes + self.values.nbytes
+        
+    def _run(self, index):
+        """Return the run number containing each sample index"""
+        return np.searchsorted(self.starts, index, side='right') - 1
+        
+    def value(self, index):
+        """Return the 16-bit stream value at sample index (or array of indices)"""
+        index = np.asarray(index)
+        if np.any((index < 0) | (index >= self.n)):
+            raise IndexError('LTRANSITIONS: Sample index out of range.')
+        return self.values[self._run(index)].astype(int)
+        
+    def state(self, dich, index):
+        """Return the boolean state of bit DICH at sample index (or indices)"""
+        return (self.value(index) >> dich) & 1 == 1
+        
+    def __getitem__(self, index):
+        if not isinstance(index, tuple):
+            index = (index,)
+        rows = index[0]
+        cols = index[1] if len(index) > 1 else slice(None)
+        if isinstance(rows, slice):
+            start, stop, step = rows.indices(self.n)
+            if step == 1:
+                # Expand the overlapping runs without a search per sample
+                r0, r1 = self._run(start), self._run(max(stop-1, start))
+                edges = np.clip(np.append(self.starts[r0+1:r1+1], stop), start, None)
+                lengths = np.diff(np.concatenate(([start], edges)))
+                v = np.repeat(self.values[r0:r1+1], lengths) if stop > start \
+                        else self.values[:0]
+            else:
+                v = self.values[self._run(np.arange(start, stop, step))]
+        else:
+            rows = np.asarray(rows)
+            if rows.dtype == bool:
+                rows = np.flatnonzero(rows)
+            rows = np.where(rows < 0, rows + self.n, rows)
+            v = self.value(rows)
+        v = v.astype(int)
+        if self.dibits:
+            out = (v[...,None] >> np.arange(16)) & 1 == 1
+        else:
+            out = v[...,None]
+        return out[...,cols]
+        
+    def changes(self, dich=0, level=None):
+        """Return the indices where a test of the stream changes
+    index, state = changes(dich=0, level=None)
+
+If LEVEL is None, the test is bit DICH of the stream.  Otherwise, the 
+test is value >= LEVEL.  INDEX is the first sample of each run where the
+test differs from the previous sample, and STATE is the new value of the
+test.  The initial state is T.state(dich, 0) (or the level test).
+"""
+        if level is None:
+            test = (self.values.astype(int) >> dich) & 1 == 1
+        else:
+            test = self.values >= level
+        k = np.flatnonzero(test[1:] != test[:-1]) + 1
+        return self.starts[k], test[k]
+        
+    def intervals(self, dich=0, state=True, level=None):
+        """Return the [start, stop) sample pairs where a test is STATE
+    pairs = intervals(dich=0, state=True, level=None)
+
+PAIRS is a (nint, 2) integer array.  See changes() for DICH and LEVEL.
+"""
+        if not self.n:
+            return np.zeros((0,2), dtype=int)
+        index, new = self.changes(dich, level)
+        if level is None:
+            first = bool((int(self.values[0]) >> dich) & 1)
+        else:
+            first = bool(self.values[0] >= level)
+        bounds = np.concatenate(([0], index, [self.n]))
+        states = np.concatenate(([first], new))
+        keep = states == bool(state)
+        return np.stack((bounds[:-1][keep], bounds[1:][keep]), axis=1)
+
+
+###
+# Persistent results
+###
+
+# The LStore used by memoized LConf methods or None; see set_store()
+_STORE = None
+
+def _key_default(value):
+    """JSON encoder for arguments that are not plain values"""
+    if isinstance(value, np.ndarray):
+        value = np.ascontiguousarray(value)
+        return ['ndarray', value.dtype.str, value.shape,
+                hashlib.sha1(value.tobytes()).hexdigest()]
+    elif isinstance(value, np.generic):
+        return value.item()
+    elif isinstance(value, LEnum):
+        return ['LEnum', value.get()]
+    raise TypeError('Cannot key %s'%repr(value))
+
+
+class LStore:
+    """Size-bounded on-disk store of analysis results
+    ST = LStore(directory=None, maxbytes=268435456)
+
+Results are saved as NumPy .npz files (without pickling) named by the
+SHA1 of their key, so they survive interpreter restarts.  Keys are built
+by key() from the content hash of the source file, the calibration and
+storage settings, the function name, and the arguments.  Renaming or
+copying a file does not invalidate its results, and changing its
+contents does.  DIRECTORY defaults to the LCONFIG_STORE environment
+variable or ~/.cache/lconfig.
+
+Every hit refreshes the file's modification time, and after each put()
+the least recently used entries are removed until the store is no larger
+than MAXBYTES.  Several processes may share a store.
+    ST.info()           Entry count, total bytes, hits, and misses
+    ST.entries()        A list of dictionaries describing each entry
+    ST.clear()          Remove all entries, or only those matching a
+                        function and/or source file
+
+Once a store is selected with set_store(), the LConf methods get_events,
+get_dievents, get_binned, get_folded, get_psd, get_spectrogram, and 
+get_spikes use it transparently.  Results that are not arrays, lists, or tuples of
+arrays are not stored.
+"""
+    def __init__(self, directory=None, maxbytes=268435456):
+        if directory is None:
+            directory = os.environ.get('LCONFIG_STORE',
+                    os.path.join(os.path.expanduser('~'), '.cache', 'lconfig'))
+        self.directory = os.path.abspath(directory)
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __repr__(self):
+        return '<LStore %s>'%self.directory
+
+    @staticmethod
+    def key(*args):
+        """Return the hex digest key of a JSON-serializable argument list"""
+        text = json.dumps(args, default=_key_default, sort_keys=True)
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def get(self, key, default=None):
+        """Return a stored result or DEFAULT if there is none"""
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as src:
+                kind = str(src['kind'])
+                values = [src['a%d'%index] for index in range(int(src['n']))]
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return default
+        self.hits += 1
+        if kind == 'array':
+            return values[0]
+        elif kind == 'list':
+            return values[0].tolist()
+        return tuple([value[()] if value.ndim == 0 else value
+                for value in values])
+
+    def put(self, key, value, **meta):
+        """Store a result and evict old entries if the store is too large
+    stored = put(key, value, function=..., filename=...)
+
+VALUE is an array, a list of numbers, or a tuple of arrays and numbers.
+The keyword arguments are saved with the entry and reported by
+entries().  Returns False if the value cannot be stored.
+"""
+        if isinstance(value, np.ndarray):
+            kind, values = 'array', [value]
+        elif isinstance(value, list):
+            kind, values = 'list', [np.asarray(value)]
+        elif isinstance(value, tuple):
+            kind, values = 'tuple', [np.asarray(this) for this in value]
+        else:
+            return False
+        if any([this.dtype.hasobject for this in values]):
+            return False
+        out = {'a%d'%index:this for index,this in enumerate(values)}
+        out.update({'kind':kind, 'n':len(values),
+                'meta':json.dumps(meta, default=repr)})
+        path = self._path(key)
+        # Write and rename so that readers never see a partial file
+        temp = '%s.%d.tmp'%(path, os.getpid())
+        try:
+            with open(temp, 'wb') as ff:
+                np.savez(ff, **out)
+            os.replace(temp, path)
+        except OSError:
+            if os.path.exists(temp):
+                os.remove(temp)
+            return False
+        self.evict()
+        return True
+
+    def _scan(self):
+        """Return (mtime, size, path) for every entry, oldest first"""
+        out = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npz'):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                out.append((st.st_mtime, st.st_size, entry.path))
+        out.sort()
+        return out
+
+    def evict(self, maxbytes=None):
+        """Remove the least recently used entries until the store fits
+    nremoved = evict(maxbytes=None)
+"""
+        if maxbytes is None:
+            maxbytes = self.maxbytes
+        entries = self._scan()
+        total = sum([size for mtime, size, path in entries])
+        count = 0
+        for mtime, size, path in entries:
+            if total <= maxbytes:
+                break
+            try:
+                os.remove(path)
+                count += 1
+            except OSError:
+                pass
+            total -= size
+        return count
+
+    def entries(self):
+        """Return a list of dictionaries describing each entry, oldest first
+
+Each dictionary has the 'key', 'size', and 'atime' (the time of the last
+use in seconds since the epoch) of the entry and the keyword arguments
+that were passed to put().
+"""
+        out = []
+        for mtime, size, path in self._scan():
+            try:
+                with np.load(path, allow_pickle=False) as src:
+                    meta = json.loads(str(src['meta']))
+            except (OSError, ValueError, KeyError):
+                continue
+            meta.update({'key':os.path.basename(path)[:-4], 'size':size,
+                    'atime':mtime})
+            out.append(meta)
+        return out
+
+    def info(self):
+        """Return the entry count, total bytes, hits, and misses of the store"""
+        entries = self._scan()
+        return {'entries':len(entries),
+                'bytes':sum([size for mtime, size, path in entries]),
+                'maxbytes':self.maxbytes, 'hits':self.hits, 'misses':self.misses}
+
+    def clear(self, function=None, filename=None):
+        """Remove entries from the store
+    nremoved = clear(function=None, filename=None)
+
+With no arguments, every entry is removed.  Otherwise, only the entries
+created by the named FUNCTION and/or from the source FILENAME are removed.
+"""
+        if function is None and filename is None:
+            paths = [path for mtime, size, path in self._scan()]
+        else:
+            if filename is not None:
+                filename = os.path.abspath(filename)
+            paths = [os.path.join(self.directory, this['key'] + '.npz')
+                    for this in self.entries()
+                    if (function is None or this.get('function') == function) and
+                    (filename is None or this.get('filename') == filename)]
+        count = 0
+        for path in paths:
+            try:
+                os.remove(path)
+                count += 1
+            except OSError:
+                pass
+        return count
+
+
+def set_store(store=True, maxbytes=268435456):
+    """Select the persistent store used by memoized LConf methods
+    previous = set_store(store=True)
+
+STORE is an LStore object, a directory name, True for the default
+directory, or None (or False) to stop using a store.  Memoization is off
+until set_store() is called.  Returns the previous store.
+"""
+    global _STORE
+    previous = _STORE
+    if store is True:
+        store = LStore(maxbytes=maxbytes)
+    elif isinstance(store, str):
+        store = LStore(store, maxbytes=maxbytes)
+    elif not store:
+        store = None
+    _STORE = store
+    return previous
+
+
+def get_store():
+    """Return the LStore used by memoized LConf methods or None"""
+    return _STORE
+
+
+def _memoize(method):
+    """Decorate an LConf analysis method to use the persistent store
+
+The arguments are bound to the method's signature with the defaults
+applied, so equivalent calls share an entry.  Objects without a source
+file hash (LFollow) and arguments that cannot be serialized bypass the
+store.
+"""
+    import inspect, functools
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwarg):
+        store = _STORE
+        key = None
+        if store is not None:
+            key = self._store_key(method.__name__, signature, args, kwarg)
+        if key is None:
+            return method(self, *args, **kwarg)
+        value = store.get(key)
+        if value is None:
+            value = method(self, *args, **kwarg)
+            store.put(key, value, function=method.__name__,
+                    filename=self.filename)
+        return value
+    return wrapper
+
 ###
 # Default dictionaries
 ###
@@ -304,6 +1071,14 @@ If digital input streaming is active, there is an additional optional keyword
 sixteen individual one-bit channels or a single 16-bit channel.
     LC = LConf( 'path/to/data.dat', data=True, dbits=True ) # 16 1-bit channels
     LC = LConf( 'path/to/data.dat', data=True, dbits=False) # 1 16-bit channel
+
+The digital input stream changes rarely, so it can be stored as runs of
+identical values instead of one value per sample with the 'dicompact'
+keyword.  Bit states at any time, the intervals in which a bit is high,
+and edges are found from the runs directly.  See help(LTransitions).
+    LC = LConf( 'path/to/data.dat', data=True, dicompact=True)
+    LC.get_distate(3, t=1.25)
+    LC.get_diintervals(5)
     
 Once loaded, the data can be accessed individually by channel index or
 by channel label.  The corresponding time vector is also available.
@@ -312,10 +1087,93 @@ by channel label.  The corresponding time vector is also available.
     LC.get_dichannel(0)
     LC.get_time()
 
+Large files can be read block-by-block without loading the entire data 
+set, and files that are still being written can be followed with the
+LFollow class.  Consecutive files can be read as one record with the
+LConcat class.  See help(LC.iter_blocks), help(LFollow), and 
+help(LConcat).
+    for index, data, didata in LC.iter_blocks():
+        ...
+
+In asyncio code, files are loaded and read block-by-block without
+blocking the event loop.  See help(LConf.aopen).
+    LC = await LConf.aopen('path/to/data.dat', data=True)
+    async for index, data, didata in LC.aiter_blocks():
+        ...
+
+Loaded data can be handed to worker processes without pickling the
+arrays; the workers attach zero-copy views of shared memory or of a
+memory-mapped file.  See help(LShared).
+    handle = LC.share()
+    LC2 = handle.attach()       # In the worker
+
+Signal conditioning pipelines (filters, notches, detrending, decimation)
+can be applied to all channels at once.  See help(LPipeline).
+    P = LPipeline(LNotch(60.), LButter(40.), LDecimate(10))
+    LC.filter_data(P)
+    LC.get_filtered(0, P)
+
+Long multi-channel captures can be stored as quantized integers scaled on
+the fly, which reduces memory for the channel data by 2-4 times.  See 
+help(LCompact) and help(LC._load_compact) for the quantization error.
+    LC = LConf( 'path/to/data.dat', data=True, compact=True)
+
+Processes on the same workstation can share loaded files through a local
+server, which answers requests for decimated windows from its cache.  
+See help(LServer) and help(LClient).
+    python -m lconfig serve -p 8765
+    t, ymin, ymax, ymean = LClient(8765).window('data.dat', 0, npoints=1000)
+
+Calculations over records too large to load are written as lazy 
+expressions of the channels, which are evaluated chunk by chunk (in 
+parallel threads if requested) when a result is needed.  See 
+help(LExpr).
+    P = (LC.lazy('Ch0 Current') - I0) * LC.lazy('Ch0 Voltage')
+    P.mean().compute()
+
+Power spectral densities and spectrograms are computed from the 
+configured sample rate.  See also batch_psd() for many files at once.
+    f, P = LC.get_psd(0)
+    f, t, S = LC.get_spectrogram(0)
+
+Records with a periodic analog output excitation can be averaged 
+synchronously with the excitation period.  See also batch_fold().
+    phase, mean, std, count = LC.get_folded('Ch0 Current')
+
+Fixed windows around events are cut into an (event, sample, channel)
+array, or averaged while streaming from the file.  See help(LEpochMean).
+    t, E, index = LC.epochs('Ch0 Voltage', pre=0.05, post=0.15, edge='rising')
+    t, mean, std, count = LC.get_epoch_mean(index, pre=0.05, post=0.15)
+
+Spikes and glitches are found with a rolling median and median absolute
+deviation, and the mask that is returned can be passed to get_binned(),
+get_folded(), and show_channel().  See help(LSpikeDetector).
+    index, mask = LC.get_spikes('Ch0 Current', pad=2)
+    v, i, std, count = LC.get_binned('Ch0 Current', mask=mask)
+
+Range statistics and decimated plots of long records are answered from 
+a multi-resolution pyramid of block summaries.  See help(LPyramid).
+    LC.get_stats(0, start=3., stop=7.)
+    LC.get_envelope(0, npoints=1000)
+    LC.show_channel(0, npoints=1000)
+
+Event lists, spikes, binned curves, folds, and spectra can be saved on 
+disk and reused across sessions as long as the source file is unchanged.
+See help(LStore).
+    set_store()                 # Use ~/.cache/lconfig
+    LC.get_events(0)            # Computed once, then loaded
+
 There are also method for plotting the data
     LC.show_channel(0)
     LC.show_dichannel(0)
 
+Derived arrays are kept in a bounded least-recently-used cache.  Its size
+is set by the optional 'cache' keyword (None for no limit), and it is
+cleared when the calibrations are applied or removed with set_cal().
+    LC = LConf( 'path/to/data.dat', data=True, cache=256)
+    LC.cache_info()
+    LC.set_cal(False)
+
 There are methods to determine some information on what was configured
     LC.ndev()           Number of configured devices
     LC.ndata()          Number of data points loaded
@@ -332,13 +1190,64 @@ There are a number of static members that contain useful information:
     LC.data         An array of data loaded from the data file or None
     LC.didata       A separate array of the digital input stream data
     LC.filename     The global path to the source file
+    LC.stats        Instrumentation measurements by phase (see instrument())
     LC.time         The array returned by get_time() or None
     LC.timestamp    The timestamp string loaded from the data file
     
 The above members are intended for public access, but the _devconf list
 is not intended for direct access.  Instead, use the get() function.
 """
-    def __init__(self, filename, data=False, dibits=False, cal=True):
+    def __init__(self, filename, data=False, dibits=False, cal=True, 
+            pyramid=False, cache=128, compact=False, dicompact=False):
+        self._init_members(filename, dibits=dibits, cal=cal, cache=cache)
+
+        with open(filename,'r') as ff:
+            t0 = time.perf_counter() if _INSTRUMENT else None
+            param = self._read_config(ff)
+            
+            # Read in the ##
+            if param == '##':
+                ff.readline()
+                # Read in the date/timestamp
+                self.timestamp = ff.readline()
+                self._offset = ff.tell()
+            if t0 is not None:
+                self._record('header', t0, nbyte=ff.tell())
+            
+            if not data:
+                return
+            
+            if not param == '##':
+                self.data = []
+                sys.stderr.write('LCONF expected ## before data\n')
+                return
+                
+            # Read in the data
+            if dicompact:
+                # The stream is encoded from its 16-bit values
+                self.dibits = False
+            try:
+                if compact:
+                    self._load_compact(compact)
+                else:
+                    self.data, self.didata = self._convert_block(
+                            self._parse(ff.read()))
+            finally:
+                self.dibits = dibits
+            if dicompact and self.didata is not None:
+                self.didata = LTransitions.encode(self.didata, dibits=dibits)
+            self._update_time()
+            
+        if pyramid:
+            self.build_pyramid()
+
+    def _init_members(self, filename, dibits=False, cal=True, cache=128):
+        """Set every member of an LConf object that has not read its file
+    
+This is used by __init__() and by the other ways of making LConf 
+objects (LShared.attach(), LConcat) so that they all have the same 
+members.
+"""
         self._devconf = []
         self.time = None
         # Externals
@@ -346,177 +1255,544 @@ is not intended for direct access.  Instead, use the get() function.
         self.data = None
         self.didata = None
         self.cal = cal
+        self.dibits = dibits
         self.filename = os.path.abspath(filename)
+        # Byte offset to the first row of data in the file
+        self._offset = None
+        # Derived arrays; see cache_info()
+        self._cache = LCache(maxsize=cache)
+        # Resolved channel labels, which are few and never change
+        self._index = {}
+        # Instrumentation measurements by phase
+        self.stats = {}
+        # Multi-resolution summaries; see build_pyramid()
+        self.pyramid = None
 
-        with open(filename,'r') as ff:
+    def _record(self, phase, t0, rows=0, nbyte=0, outbytes=0):
+        """Add an instrumentation measurement to the stats record
+    _record(phase, t0, rows=0, nbyte=0, outbytes=0)
+    
+T0 is the time.perf_counter() value at the start of the phase.  ROWS is 
+the number of data rows processed, NBYTE is the number of bytes read 
+from the file, and OUTBYTES is the size in bytes of the arrays the phase
+returned.  OUTBYTES is not a measurement of the memory allocated along 
+the way, which is not tracked because tracing allocations would slow 
+every phase; use tracemalloc (as lcbench.py does) for that.  The stats 
+record accumulates 'outbytes' and keeps the largest single value in 
+'max_outbytes'.  The registered hooks are called with the measurement.
+"""
+        sample = {'seconds':time.perf_counter() - t0, 'rows':rows,
+                'bytes':nbyte, 'outbytes':outbytes}
+        if phase not in self.stats:
+            self.stats[phase] = {'calls':0, 'seconds':0., 'rows':0, 
+                    'bytes':0, 'outbytes':0, 'max_outbytes':0}
+        this = self.stats[phase]
+        this['calls'] += 1
+        this['seconds'] += sample['seconds']
+        this['rows'] += rows
+        this['bytes'] += nbyte
+        this['outbytes'] += outbytes
+        this['max_outbytes'] = max(this['max_outbytes'], outbytes)
+        for fn in _HOOKS:
+            fn(self, phase, sample)
+            
+    def reset_stats(self):
+        """Discard all instrumentation measurements"""
+        self.stats = {}
+        
+    def _parse(self, text):
+        """Parse rows of text with instrumentation.  See _parse_rows()."""
+        t0 = time.perf_counter() if _INSTRUMENT else None
+        data = _parse_rows(text)
+        if t0 is not None:
+            self._record('parse', t0, rows=data.shape[0], nbyte=len(text),
+                    outbytes=data.nbytes)
+        return data
+
+    def _read_config(self, ff):
+        """Parse the configuration header from an open file
+    param = _read_config(ff)
+    
+Returns the last parameter read; '##' indicates that the end of the 
+configuration was found and that data may follow.
+"""
+        
+        # start the parse
+        # Read in the new
+        param = _read_param(ff)
+        value = ''
+        if param and param!='##':
+            value = _read_param(ff)
+
+        # Initialize the meta type
+        metatype = 'n'
+
+        while param and value:
+            
+            #####
+            # First, if the parameter indicates the need for a new
+            # device connection or channel, create the new element.
+            #####
+            # Detect a new connection configuration
+            if param == 'connection':
+                # Appending a minimal dictionary
+                # The nested configurations are the only ones that
+                # need to be defined explicitly.  All other 
+                # parameters are defined by their defaults in 
+                # DEF_DEV
+                self._devconf.append({
+                        'aich':[], 'aoch':[], 'efch':[], 'meta':{}, 'comch':[], 'domask':0, 'dovalue':0})
+            # Detect a new analog input channel        
+            elif param == 'aichannel':
+                # Append a minimal dictionary
+                self._devconf[-1]['aich'].append({})
+            # Detect a new analog output channel
+            elif param == 'aochannel':
+                # Append a minimal dictionary
+                self._devconf[-1]['aoch'].append({})
+            # Detect a new analog output channel
+            elif param == 'efchannel':
+                # Append a minimal dictionary
+                self._devconf[-1]['efch'].append({})
+            # Detect a new com channel; older files used comsignal
+            elif param in ('comchannel', 'comsignal'):
+                param = 'comchannel'
+                self._devconf[-1]['comch'].append({})
+
+            #####
+            # Deal with the parameter
+            #####
+            # IF this is a global parameter
+            if param in DEF_DEV:
+                self._devconf[-1][param] = \
+                        _filter_value(value, DEF_DEV[param])
+            elif param in DEF_AICH:
+                self._devconf[-1]['aich'][-1][param] = \
+                        _filter_value(value, DEF_AICH[param])
+            elif param in DEF_AOCH:
+                self._devconf[-1]['aoch'][-1][param] = \
+                        _filter_value(value, DEF_AOCH[param])
+            elif param in DEF_EFCH:
+                self._devconf[-1]['efch'][-1][param] = \
+                        _filter_value(value, DEF_EFCH[param])
+            elif param in DEF_COMCH:
+                self._devconf[-1]['comch'][-1][param] = \
+                        _filter_value(value, DEF_COMCH[param])
+            # Deal with the special case of doXX parameters
+            elif param.startswith('do') and param[2:].isnumeric():
+                channel = int(param[2:])
+                value = int(value)
+                self._devconf[-1]['domask'] |= 1<<channel
+                if value:
+                    self._devconf[-1]['domask'] |= 1<<channel
+                else:
+                    self._devconf[-1]['domask'] &= ~(1<<channel)
+            # Check for meta parameters
+            elif param == 'meta':
+                if value == 'str' or value == 'string':
+                    metatype = 's'
+                elif value == 'int' or value == 'integer':
+                    metatype = 'i'
+                elif value == 'flt' or value == 'float':
+                    metatype = 'f'
+                elif value == 'none' or value == 'end' or value == 'stop':
+                    metatype = 'n'
+                else:
+                    raise Exception('Unrecognized meta flag {:s}.'.format(param))
+            elif param.startswith('int:'):
+                self._devconf[-1]['meta'][param[4:]] = int(value)
+            elif param.startswith('flt:'):
+                self._devconf[-1]['meta'][param[4:]] = float(value)
+            elif param.startswith('str:'):
+                self._devconf[-1]['meta'][param[4:]] = value
+            elif metatype == 'i':
+                self._devconf[-1]['meta'][param] = int(value)
+            elif metatype == 'f':
+                self._devconf[-1]['meta'][param] = float(value)
+            elif metatype == 's':
+                self._devconf[-1]['meta'][param] = value
+            else:
+                raise Exception('Unrecognized parameter: {:s}.'.format(param))
             
-            # start the parse
-            # Read in the new
             param = _read_param(ff)
             value = ''
             if param and param!='##':
                 value = _read_param(ff)
+        return param
 
-            # Initialize the meta type
-            metatype = 'n'
+    def _convert_block(self, data):
+        """Split the digital input stream and apply calibrations to raw data
+    data, didata = _convert_block(data)
 
-            while param and value:
-                
-                #####
-                # First, if the parameter indicates the need for a new
-                # device connection or channel, create the new element.
-                #####
-                # Detect a new connection configuration
-                if param == 'connection':
-                    # Appending a minimal dictionary
-                    # The nested configurations are the only ones that
-                    # need to be defined explicitly.  All other 
-                    # parameters are defined by their defaults in 
-                    # DEF_DEV
-                    self._devconf.append({
-                            'aich':[], 'aoch':[], 'efch':[], 'meta':{}, 'comch':[], 'domask':0, 'dovalue':0})
-                # Detect a new analog input channel        
-                elif param == 'aichannel':
-                    # Append a minimal dictionary
-                    self._devconf[-1]['aich'].append({})
-                # Detect a new analog output channel
-                elif param == 'aochannel':
-                    # Append a minimal dictionary
-                    self._devconf[-1]['aoch'].append({})
-                # Detect a new analog output channel
-                elif param == 'efchannel':
-                    # Append a minimal dictionary
-                    self._devconf[-1]['efch'].append({})
-                elif param == 'comsignal':
-                    self._devconf[-1]['comch'].append({})
-
-                #####
-                # Deal with the parameter
-                #####
-                # IF this is a global parameter
-                if param in DEF_DEV:
-                    self._devconf[-1][param] = \
-                            _filter_value(value, DEF_DEV[param])
-                elif param in DEF_AICH:
-                    self._devconf[-1]['aich'][-1][param] = \
-                            _filter_value(value, DEF_AICH[param])
-                elif param in DEF_AOCH:
-                    self._devconf[-1]['aoch'][-1][param] = \
-                            _filter_value(value, DEF_AOCH[param])
-                elif param in DEF_EFCH:
-                    self._devconf[-1]['efch'][-1][param] = \
-                            _filter_value(value, DEF_EFCH[param])
-                elif param in DEF_COMCH:
-                    self._devconf[-1]['comch'][-1][param] = \
-                            _filter_value(value, DEF_COMCH[param])
-                # Deal with the special case of doXX parameters
-                elif param.startswith('do') and param[2:].isnumeric():
-                    channel = int(param[2:])
-                    value = int(value)
-                    self._devconf[-1]['domask'] |= 1<<channel
-                    if value:
-                        self._devconf[-1]['domask'] |= 1<<channel
-                    else:
-                        self._devconf[-1]['domask'] &= ~(1<<channel)
-                # Check for meta parameters
-                elif param == 'meta':
-                    if value == 'str' or value == 'string':
-                        metatype = 's'
-                    elif value == 'int' or value == 'integer':
-                        metatype = 'i'
-                    elif value == 'flt' or value == 'float':
-                        metatype = 'f'
-                    elif value == 'none' or value == 'end' or value == 'stop':
-                        metatype = 'n'
-                    else:
-                        raise Exception('Unrecognized meta flag {:s}.'.format(param))
-                elif param.startswith('int:'):
-                    self._devconf[-1]['meta'][param[4:]] = int(value)
-                elif param.startswith('flt:'):
-                    self._devconf[-1]['meta'][param[4:]] = float(value)
-                elif param.startswith('str:'):
-                    self._devconf[-1]['meta'][param[4:]] = value
-                elif metatype == 'i':
-                    self._devconf[-1]['meta'][param] = int(value)
-                elif metatype == 'f':
-                    self._devconf[-1]['meta'][param] = float(value)
-                elif metatype == 's':
-                    self._devconf[-1]['meta'][param] = value
-                else:
-                    raise Exception('Unrecognized parameter: {:s}.'.format(param))
+DATA is a 2-D array of raw values exactly as they appear in the data file.
+The calibrations are applied in-place, so the returned DATA may be a view
+of the original.  DIDATA is None unless digital input streaming was active.
+"""
+        t0 = time.perf_counter() if _INSTRUMENT else None
+        didata = None
+        if not data.size:
+            data = np.zeros((0, self.naich(0) + 
+                    (1 if self.get(0,'distream') else 0)))
+        # Was digital input streaming active?
+        if self.get(0,'distream'):
+            # Convert the data to an integer and remove the distream from data
+            temp = np.asarray(data[:,-1], dtype=int)
+            data = data[:,:-1]
+            # If the load is configured to isolate bits
+            if self.dibits:
+                didata = np.ndarray((data.shape[0],16), dtype=bool)
+                for index in range(0,16):
+                    didata[:,index] = temp & (1<<index)
+            else:
+                didata = temp.reshape(data.shape[0],1)
                 
-                param = _read_param(ff)
-                value = ''
-                if param and param!='##':
-                    value = _read_param(ff)
-            
-            if not data:
-                return
-            
-            self.data = []
-            
-            # Read in the ##
-            if not param == '##':
-                sys.stderr.write('LCONF expected ## before data\n')
-                return
-            ff.readline()
+        # Apply the calibrations?
+        if self.cal:
+            # Calculate the calibrated data
+            for aich in range(len(self._devconf[0]['aich'])):
+                temp = self.get(0, 'aicalzero', aich=aich)
+                if temp != 0.:
+                    data[:,aich] -= temp
                 
-            # Read in the date/timestamp
-            self.timestamp = ff.readline()
-            
-            # Read in the data
-            thisline = ff.readline()
-            while thisline:
-                self.data.append([float(this) for this in thisline.split()])
-                thisline = ff.readline()
-            self.data = np.array(self.data)
-            
-            # Was digital input streaming active?
-            if self.get(0,'distream'):
-                # Convert the data to an integer and remove the distream from data
-                temp = np.asarray(self.data[:,-1], dtype=int)
-                self.data = self.data[:,:-1]
-                # If the load is configured to isolate bits
-                if dibits:
-                    self.didata = np.ndarray((self.data.shape[0],16), dtype=bool)
-                    for index in range(0,16):
-                        self.didata[:,index] = temp & (1<<index)
+                temp = self.get(0,'aicalslope', aich=aich)
+                if temp != 1.:
+                    data[:,aich] *= temp
+        if t0 is not None:
+            self._record('calibrate', t0, rows=data.shape[0], 
+                    outbytes=0 if didata is None else didata.nbytes)
+        return data, didata
+        
+    def _load_compact(self, compact):
+        """Load the data block-by-block into quantized integer storage
+    _load_compact(compact)
+    
+COMPACT is 'int16', 'int32', or True to choose 'int32' if any channel is
+configured for the high-resolution converter (airesolution > 8) and 
+'int16' otherwise.  The quantization step of each channel is the 
+configured airange with 10% headroom divided into 2**16 counts for int16 
+or 2**24 counts for int32, scaled by aicalslope if the calibrations are
+applied.  If a channel exceeds the int16 range, the storage is widened 
+to int32 with the same step.  See help(LCompact).
+"""
+        step, dtype = self._compact_step(compact)
+        raw = []
+        didata = []
+        for index, data, di in self.iter_blocks():
+            q = np.round(data / step)
+            if dtype == np.int16 and np.abs(q).max(initial=0) > 32767:
+                dtype = np.dtype(np.int32)
+            raw.append(q.astype(dtype))
+            if di is not None:
+                didata.append(di)
+        raw = np.concatenate(raw).astype(dtype, copy=False) if raw \
+                else np.zeros((0, self.naich(0)), dtype=dtype)
+        self.data = LCompact(raw, step)
+        if self.get(0, 'distream'):
+            self.didata = np.concatenate(didata) if didata else \
+                    np.zeros((0, 16 if self.dibits else 1), 
+                    dtype=bool if self.dibits else int)
+
+    def _compact_step(self, compact):
+        """Return the quantization step of each channel and the storage type
+    step, dtype = _compact_step(compact)
+    
+See help(LC._load_compact).
+"""
+        if compact is True:
+            compact = 'int16'
+            for aich in range(self.naich(0)):
+                if self.get(0, 'airesolution', aich=aich) > 8:
+                    compact = 'int32'
+        if compact not in ('int16', 'int32'):
+            raise Exception('LCONF: Unrecognized compact storage type: %s'%repr(compact))
+        bits = 16 if compact == 'int16' else 24
+        step = np.array([2.2*self.get(0, 'airange', aich=aich)/2**bits
+                for aich in range(self.naich(0))])
+        if self.cal:
+            step *= np.abs([self.get(0, 'aicalslope', aich=aich) 
+                    for aich in range(self.naich(0))])
+        return step, np.dtype(compact)
+
+    def _update_time(self):
+        """Rebuild the time vector to match the data array"""
+        T = 1./self.get(0, 'samplehz')
+        N = self.data.shape[0]
+        self.time = np.arange(0., (N-0.5)*T, T) 
+        
+    def cache_info(self):
+        """Return the hit and miss statistics of the derived data cache
+    info = cache_info()
+    
+Derived arrays (derivatives used by get_events(), filtered data, and 
+the like) are kept in a bounded least-recently-used cache.  The size is
+set by the CACHE keyword when the LConf object is created, and None 
+means no limit.  Returns a dictionary with the 'hits', 'misses', 'size',
+and 'maxsize' of the cache.  Resolved channel labels are kept 
+separately and are not counted.
+"""
+        return self._cache.info()
+        
+    def clear_cache(self):
+        """Discard all cached derived data, including the pyramid"""
+        self._cache.clear()
+        self._index.clear()
+        self.pyramid = None
+        
+    def set_cal(self, cal=True):
+        """Apply or remove the channel calibrations in-place
+    set_cal(cal=True)
+    
+The data are converted between raw voltages and calibrated values, and 
+everything derived from the data is discarded from the cache.
+"""
+        cal = bool(cal)
+        if isinstance(self.data, np.ndarray) and not self.data.flags.writeable \
+                and cal != bool(self.cal):
+            raise Exception('SET_CAL: The data are read-only (see help(LShared)), so the calibrations cannot be changed in-place.')
+        if isinstance(self.data, LCompact) and cal != bool(self.cal):
+            # Only the scale and offset of compact data need to change
+            for aich in range(self.naich(0)):
+                zero = self.get(0, 'aicalzero', aich=aich)
+                slope = self.get(0, 'aicalslope', aich=aich)
+                if cal:
+                    self.data.offset[aich] = (self.data.offset[aich] - zero)*slope
+                    self.data.scale[aich] *= slope
                 else:
-                    self.didata = temp.reshape(self.data.shape[0],1)
-                    
-            # Apply the calibrations?
-            if cal:
-                # Calculate the calibrated data
-                for aich in range(len(self._devconf[0]['aich'])):
-                    temp = self.get(0, 'aicalzero', aich=aich)
-                    if temp != 0.:
-                        self.data[:,aich] -= temp
-                    
-                    temp = self.get(0,'aicalslope', aich=aich)
-                    if temp != 1.:
-                        self.data[:,aich] *= temp
-                
-            T = 1./self.get(0, 'samplehz')
-            N = self.data.shape[0]
-            self.time = np.arange(0., (N-0.5)*T, T) 
+                    self.data.scale[aich] /= slope
+                    self.data.offset[aich] = self.data.offset[aich]/slope + zero
+            self.clear_cache()
+        elif self.data is not None and cal != bool(self.cal):
+            for aich in range(self.naich(0)):
+                zero = self.get(0, 'aicalzero', aich=aich)
+                slope = self.get(0, 'aicalslope', aich=aich)
+                if cal:
+                    self.data[:,aich] -= zero
+                    self.data[:,aich] *= slope
+                else:
+                    self.data[:,aich] /= slope
+                    self.data[:,aich] += zero
+            self.clear_cache()
+        self.cal = cal
+        
+    def _get_slice(self, downsample, start, stop):
+        """Return the slice corresponding to DOWNSAMPLE, START, and STOP"""
+        # Initialize slice indices
+        I0 = 0
+        I1 = -1
+        I2 = 1
+        if start is not None:
+            I0 = self._get_index(start)
+        if stop is not None:
+            I1 = self._get_index(stop)
+        if downsample is not None:
+            I2 = int(downsample+1)
+        return slice(I0, I1, I2)
+        
+    def _get_diff(self, aich, diff):
+        """Return the read-only DIFF-th derivative of a channel"""
+        key = ('diff', aich, diff)
+        y = self._cache.get(key)
+        if y is None:
+            y = np.diff(self.get_channel(aich), diff)
+            y *= self.get(0, 'samplehz')**diff
+            y.flags.writeable = False
+            self._cache[key] = y
+        return y
 
+    def iter_blocks(self, nbyte=1048576):
+        """Iterate over the data in blocks without loading the whole file
+    for index, data, didata in LC.iter_blocks():
+        ...
 
-    def __str__(self, width=80):
-        out = ''
-        for devnum in range(len(self._devconf)):
-            out += '*** Device ' + str(devnum) + ' ***\n'
-            device = self._devconf[devnum]
-            for this in DEF_DEV:
-                out += '  %14s : %-14s\n'%(this, repr(self.get(devnum, this)))
-            out += '  * Analog Inputs\n'
-            for aich in range(len(self._devconf[devnum]['aich'])):
-                out += '    * AICH %d\n'%aich
-                for this in DEF_AICH:
-                    out += '    %14s : %-14s\n'%(this, repr(self.get(devnum, this, aich=aich)))
-            out += '  * Analog Outputs\n'
-            for aoch in range(len(self._devconf[devnum]['aoch'])):
-                out += '    * AOCH %d\n'%aoch
-                for this in DEF_AOCH:
+The configuration is taken from the LConf object, so it need not have 
+been loaded with data.  Each block is read from the source file and is
+converted with the same digital input stream and calibration settings
+used by the LConf object.  INDEX is the sample index of the first row 
+in the block.  DIDATA is None unless digital input streaming was active.
+
+NBYTE
+The approximate number of bytes of text to read from the file per block.
+"""
+        if self._offset is None:
+            raise Exception('ITER_BLOCKS: The file does not appear to contain data.')
+        index = 0
+        tail = b''
+        with open(self.filename, 'rb') as ff:
+            ff.seek(self._offset)
+            chunk = ff.read(nbyte)
+            while chunk:
+                chunk = tail + chunk
+                # Only parse complete lines
+                last = chunk.rfind(b'\n') + 1
+                tail = chunk[last:]
+                if last:
+                    data, didata = self._convert_block(
+                            self._parse(chunk[:last]))
+                    yield index, data, didata
+                    index += data.shape[0]
+                chunk = ff.read(nbyte)
+        if tail.strip():
+            data, didata = self._convert_block(self._parse(tail))
+            yield index, data, didata
+
+    async def aiter_blocks(self, nbyte=1048576):
+        """Asynchronous version of iter_blocks()
+    async for index, data, didata in LC.aiter_blocks():
+        ...
+
+Reading and parsing are done in the event loop's executor, and the next
+block is read while the current one is parsed, so neither blocks the
+event loop.  See iter_blocks() and ASYNC_WORKERS.
+"""
+        if self._offset is None:
+            raise Exception('AITER_BLOCKS: The file does not appear to contain data.')
+        import asyncio
+        index = 0
+        tail = b''
+        ff = open(self.filename, 'rb')
+        try:
+            ff.seek(self._offset)
+            chunk = await _arun(ff.read, nbyte)
+            while chunk:
+                # Start reading the next block before parsing this one
+                pending = asyncio.ensure_future(_arun(ff.read, nbyte))
+                try:
+                    chunk = tail + chunk
+                    last = chunk.rfind(b'\n') + 1
+                    tail = chunk[last:]
+                    if last:
+                        data, didata = await _arun(self._parse_block, chunk[:last])
+                        yield index, data, didata
+                        index += data.shape[0]
+                finally:
+                    chunk = await pending
+            if tail.strip():
+                data, didata = await _arun(self._parse_block, tail)
+                yield index, data, didata
+        finally:
+            ff.close()
+
+    def _parse_block(self, text):
+        """Parse and convert rows of text.  See _parse() and _convert_block()."""
+        return self._convert_block(self._parse(text))
+
+    @classmethod
+    async def aopen(cls, filename, data=False, dibits=False, cal=True,
+            pyramid=False, cache=128, compact=False, dicompact=False, 
+            nbyte=4194304):
+        """Load an LConf object without blocking the event loop
+    LC = await LConf.aopen(filename, data=False, dibits=False, cal=True)
+
+The keywords are the same as for LConf().  The header is parsed in the
+executor, and the data are read with aiter_blocks() in blocks of NBYTE
+bytes, so reading overlaps parsing.  Many files can be opened at once
+with asyncio.gather(); the executor jobs across all of them are bounded
+by ASYNC_WORKERS.  With COMPACT, each block is quantized as it arrives,
+as in LConf(), so the floating point data are never held whole.  With
+DICOMPACT, the digital input stream of each block is run-length encoded
+as it arrives.  The result is always a plain LConf object, even through
+a subclass.
+    runs = await asyncio.gather(*[LConf.aopen(f, data=True) for f in files])
+"""
+        self = await _arun(lambda: LConf(filename, dibits=dibits, cal=cal,
+                cache=cache))
+        if not data:
+            return self
+        if self._offset is None:
+            self.data = []
+            sys.stderr.write('LCONF expected ## before data\n')
+            return self
+        if compact:
+            step, dtype = self._compact_step(compact)
+        if dicompact:
+            # The stream is encoded from its 16-bit values
+            self.dibits = False
+        blocks = []
+        diblocks = []
+        async for index, block, diblock in self.aiter_blocks(nbyte=nbyte):
+            if dicompact and diblock is not None:
+                diblock = LTransitions.encode(diblock, dibits=dibits)
+            if compact:
+                block = np.round(block / step)
+                if dtype == np.int16 and np.abs(block).max(initial=0) > 32767:
+                    dtype = np.dtype(np.int32)
+                block = block.astype(dtype)
+            blocks.append(block)
+            if diblock is not None:
+                diblocks.append(diblock)
+        if compact:
+            self.data = LCompact(np.concatenate(blocks).astype(dtype, copy=False)
+                    if blocks else np.zeros((0, self.naich(0)), dtype=dtype), step)
+        elif len(blocks) == 1:
+            self.data = blocks[0]
+        elif blocks:
+            self.data = np.concatenate(blocks)
+        else:
+            self.data = self._convert_block(np.zeros((0,0)))[0]
+        self.dibits = dibits
+        if self.get(0, 'distream'):
+            if dicompact:
+                self.didata = LTransitions.concatenate(diblocks, dibits=dibits)
+            else:
+                self.didata = np.concatenate(diblocks) if diblocks else \
+                        np.zeros((0, 16 if dibits else 1), dtype=bool if dibits else int)
+        self._update_time()
+        if pyramid:
+            await _arun(self.build_pyramid)
+        return self
+
+    def share(self, filename=None):
+        """Export the data to shared memory for other processes
+    handle = share(filename=None)
+
+The data, time, and didata arrays are copied once into a single
+multiprocessing.shared_memory segment, or into a memory-mapped file if
+FILENAME is given, and the configuration is serialized to JSON.  The
+returned LShared handle is small and cheap to pickle, so it can be
+passed to worker processes, where handle.attach() rebuilds an LConf
+object whose arrays are zero-copy, read-only views.  Compact data and 
+digital input streams stay compact.  The files of an LConcat are copied
+one at a time, so the whole record is never held in this process.  See 
+help(LShared).
+"""
+        if self.data is None:
+            raise Exception('SHARE: This LConf object does not have channel data.')
+        arrays = {}
+        attrs = {'filename':self.filename, 'timestamp':self.timestamp,
+                'cal':self.cal, 'dibits':self.dibits, 'offset':self._offset}
+        if isinstance(self.data, LCompact):
+            arrays['data'] = self.data.raw
+            attrs['scale'] = self.data.scale.tolist()
+            attrs['zero'] = self.data.offset.tolist()
+        else:
+            arrays['data'] = self.data
+        if self.time is not None:
+            arrays['time'] = self.time
+        if isinstance(self.didata, LTransitions):
+            arrays['distarts'] = self.didata.starts
+            arrays['divalues'] = self.didata.values
+            attrs['din'] = int(self.didata.n)
+        elif self.didata is not None:
+            arrays['didata'] = self.didata
+        return LShared._create(_encode_config(self._devconf), arrays, attrs,
+                filename)
+
+    def __str__(self, width=80):
+        out = ''
+        for devnum in range(len(self._devconf)):
+            out += '*** Device ' + str(devnum) + ' ***\n'
+            device = self._devconf[devnum]
+            for this in DEF_DEV:
+                out += '  %14s : %-14s\n'%(this, repr(self.get(devnum, this)))
+            out += '  * Analog Inputs\n'
+            for aich in range(len(self._devconf[devnum]['aich'])):
+                out += '    * AICH %d\n'%aich
+                for this in DEF_AICH:
+                    out += '    %14s : %-14s\n'%(this, repr(self.get(devnum, this, aich=aich)))
+            out += '  * Analog Outputs\n'
+            for aoch in range(len(self._devconf[devnum]['aoch'])):
+                out += '    * AOCH %d\n'%aoch
+                for this in DEF_AOCH:
                     out += '    %14s : %-14s\n'%(this, repr(self.get(devnum, this, aoch=aoch)))
             out += '  * Flexible Digital IO\n'
             for efch in range(len(self._devconf[devnum]['efch'])):
@@ -531,10 +1807,16 @@ is not intended for direct access.  Instead, use the get() function.
     def _get_label(self, devnum, source, label):
         """Return the index of the aich, aoch, or efch member with the label matching label.
     """
-        lkey = {'aich':'ailabel', 'aoch':'aolabel', 'efch':'eflabel'}[source]
+        key = ('label', devnum, source, label)
+        index = self._index.get(key)
+        if index is not None:
+            return index
+        lkey = {'aich':'ailabel', 'aoch':'aolabel', 'efch':'eflabel', 
+                'comch':'comlabel'}[source]
         for index in range(len(self._devconf[devnum][source])):
             this = self._devconf[devnum][source][index]
             if lkey in this and this[lkey] == label:
+                self._index[key] = index
                 return index
         raise Exception('Failed to find key %s with value %s'%(lkey, repr(label)))
         
@@ -544,6 +1826,12 @@ is not intended for direct access.  Instead, use the get() function.
         # Clamp the values based on the data size
         return min(max(index, 0), self.ndata()-1)
 
+    def _get_bound(self, time):
+        """Get the exclusive upper index for the time specified"""
+        index = int(np.round(time*self.get(0,'samplehz')))
+        # A stop past the end includes the last sample
+        return min(max(index, 0), self.ndata())
+
     def ndev(self):
         """Return the number of device configurations loaded"""
         return len(self._devconf)
@@ -586,7 +1874,8 @@ data are available, ndata() raises an exception"""
 The default source is 'aich', but the labels for 'aoch' and 'efch' can
 also be retrieved.
 """
-        lkey = {'aich':'ailabel', 'aoch':'aolabel', 'efch':'eflabel'}[source]
+        lkey = {'aich':'ailabel', 'aoch':'aolabel', 'efch':'eflabel', 
+                'comch':'comlabel'}[source]
         out = []
         for this in self._devconf[devnum][source]:
             if lkey in this:
@@ -661,7 +1950,7 @@ The same rules apply for the analog output, com, and ef channels.
             flag = False
             if isinstance(comch,str):
                 comch = self._get_label(devnum, 'comch', comch)
-            source = source['comch'][efch]
+            source = source['comch'][comch]
             default = DEF_COMCH
             
         # If the recall is multiple    
@@ -750,17 +2039,7 @@ neither, one, or both of these parameters.
             aich = self._get_label(0, 'aich', aich)
         
         if downsample or start or stop:
-            # Initialize slice indices
-            I0 = 0
-            I1 = -1
-            I2 = 1
-            if start is not None:
-                I0 = self._get_index(start)
-            if stop is not None:
-                I1 = self._get_index(stop)
-            if downsample is not None:
-                I2 = int(downsample+1)
-            return self.data[I0:I1:I2, aich]
+            return self.data[self._get_slice(downsample, start, stop), aich]
             
         return self.data[:,aich]
         
@@ -800,17 +2079,7 @@ neither, one, or both of these parameters.
             raise Exception('GET_DICHANNEL: The DICH channel number is mandatory when data are loaded bit-wise.')
             
         if downsample or start or stop:
-            # Initialize slice indices
-            I0 = 0
-            I1 = -1
-            I2 = 1
-            if start is not None:
-                I0 = self._get_index(start)
-            if stop is not None:
-                I1 = self._get_index(stop)
-            if downsample is not None:
-                I2 = int(downsample+1)
-            return self.didata[I0:I1:I2, dich]
+            return self.didata[self._get_slice(downsample, start, stop), dich]
         return self.didata[:,dich]
 
     def get_time(self, downsample=None, start=None, stop=None):
@@ -825,23 +2094,702 @@ an exception
             raise Exception('GET_TIME: This LConf object does not have channel data.')
             
         if downsample or start or stop:
-            # Initialize slice indices
-            I0 = 0
-            I1 = -1
-            I2 = 1
-            if start is not None:
-                I0 = self._get_index(start)
-            if stop is not None:
-                I1 = self._get_index(stop)
-            if downsample is not None:
-                I2 = int(downsample+1)
-            return self.time[I0:I1:I2]
+            return self.time[self._get_slice(downsample, start, stop)]
         return self.time
 
 
-    def show_channel(self, aich, ax=None, fig=None, downsample=None, 
+    def filter_data(self, pipeline):
+        """Apply a signal conditioning pipeline to all analog input channels
+    y = filter_data(pipeline)
+    
+PIPELINE is an LPipeline instance.  All channels are processed together 
+as a single 2-D array, and the result is a 2-D array with one column per
+channel.  If the pipeline decimates the data, the corresponding time 
+vector is get_time()[::pipeline.decimation()].  See help(LPipeline).
+
+Results are kept in the LConf object's cache (see cache_info()), so 
+repeated calls with an equivalent pipeline return the same read-only 
+array.
+"""
+        if self.data is None:
+            raise Exception('FILTER_DATA: This LConf object does not have channel data.')
+        key = ('filter', None, pipeline.key())
+        y = self._cache.get(key)
+        if y is None:
+            y = pipeline.apply(self.data, self.get(0, 'samplehz'))
+            y.flags.writeable = False
+            self._cache[key] = y
+        return y
+        
+    def get_filtered(self, aich, pipeline):
+        """Retrieve data from channel aich after a signal conditioning pipeline
+    y = get_filtered(aich, pipeline)
+    
+AICH is the same index or string used by get_channel(), and PIPELINE is 
+an LPipeline instance.  If filter_data() has already been called with 
+the same pipeline, the result is a column of its result.  Otherwise, 
+only the requested channel is processed.  Results are cached per 
+(channel, pipeline) and are read-only.  See cache_info().
+"""
+        if self.data is None:
+            raise Exception('GET_FILTERED: This LConf object does not have channel data.')
+        if isinstance(aich,str):
+            aich = self._get_label(0, 'aich', aich)
+        pkey = pipeline.key()
+        y = self._cache.get(('filter', aich, pkey))
+        if y is None:
+            if ('filter', None, pkey) in self._cache:
+                y = self._cache.get(('filter', None, pkey))[:,aich]
+            else:
+                y = pipeline.apply(self.data[:,aich], self.get(0, 'samplehz'))
+                y.flags.writeable = False
+            self._cache['filter', aich, pkey] = y
+        return y
+        
+    def iter_filtered(self, pipeline, nbyte=1048576):
+        """Apply a signal conditioning pipeline to the file block-by-block
+    for index, y in iter_filtered(pipeline):
+        ...
+
+The data are read from the source file with iter_blocks(), so the entire
+data set is never loaded.  The filter states are carried from one block 
+to the next, so the concatenated blocks are identical to the result of 
+filter_data().  INDEX is the index of the first filtered sample in Y.  
+Pipelines with an LDetrend stage raise an exception at the second block,
+since detrending needs the whole record.
+"""
+        state = None
+        index = 0
+        samplehz = self.get(0, 'samplehz')
+        for _, data, _ in self.iter_blocks(nbyte=nbyte):
+            if state is None:
+                if not data.shape[0]:
+                    continue
+                state = pipeline.init(samplehz, data[0])
+            y = pipeline.process(data, state)
+            yield index, y
+            index += y.shape[0]
+
+    def lazy(self, aich):
+        """Return a lazy expression for an analog input channel
+    I = lazy(aich)
+    
+AICH is the same index or string used by get_channel().  Nothing is read
+or computed until a result of an expression built from I is requested.
+See help(LExpr).
+"""
+        if isinstance(aich,str):
+            aich = self._get_label(0, 'aich', aich)
+        if not 0 <= aich < self.naich(0):
+            raise Exception('LAZY: There is no analog input channel %s.'%repr(aich))
+        return LExpr(self, 'channel', param=aich)
+        
+    def lazy_index(self):
+        """Return a lazy expression for the sample index.  See help(LExpr)."""
+        return LExpr(self, 'index')
+        
+    def lazy_time(self):
+        """Return a lazy expression for the sample time in seconds.  See help(LExpr)."""
+        return LExpr(self, 'time')
+        
+    def lazy_di(self, dich=None):
+        """Return a lazy expression for the digital input stream
+    D = lazy_di(dich=None)
+    
+If DICH is None, the expression is the 16-bit stream value; otherwise 
+it is the boolean state of bit DICH.  See help(LExpr).
+"""
+        if not self.get(0, 'distream'):
+            raise Exception('LAZY_DI: The data do not include a digital input stream.')
+        return LExpr(self, 'di', param=dich)
+        
+    def _segment_batches(self, aich, nperseg, step, nbatch=256):
+        """Yield batches of overlapping segments for spectral analysis
+    for seg in _segment_batches(aich, nperseg, step):
+        ...
+
+SEG is a strided (nseg, nchannel, nperseg) view of at most NBATCH 
+segments.  If the LConf object has no data loaded, the data are read
+from the file block-by-block, so only the current block and a partial
+segment are ever held in memory.
+"""
+        if self.data is not None:
+            blocks = (self.data[I0:I0+65536] 
+                    for I0 in range(0, self.ndata(), 65536))
+        else:
+            blocks = (data for _,data,_ in self.iter_blocks())
+        carry = None
+        for data in blocks:
+            if aich is not None:
+                data = data[:,aich:aich+1]
+            x = data if carry is None else np.concatenate((carry, data))
+            nseg = 0
+            if x.shape[0] >= nperseg:
+                nseg = (x.shape[0]-nperseg)//step + 1
+                windows = np.lib.stride_tricks.sliding_window_view(x, nperseg, axis=0)
+                for I0 in range(0, nseg, nbatch):
+                    I1 = min(nseg, I0+nbatch)
+                    yield windows[I0*step:(I1-1)*step+1:step]
+            carry = x[nseg*step:]
+            
+    def _spectra(self, aich, nperseg, overlap, window, detrend):
+        """Generate the one-sided power spectral density of each segment
+    for P in _spectra(aich, nperseg, overlap, window, detrend):
+        ...
+        
+P is an (nseg, nchannel, nfreq) array scaled as a density in units^2/Hz.
+"""
+        step = nperseg - int(np.round(overlap*nperseg))
+        if nperseg < 2 or step < 1:
+            raise Exception('LCONF: NPERSEG must be at least 2, and OVERLAP must be in [0,1)')
+        w = _window(window, nperseg)
+        scale = 1. / (self.get(0, 'samplehz') * (w*w).sum())
+        for seg in self._segment_batches(aich, nperseg, step):
+            if detrend == 'constant':
+                seg = seg - seg.mean(axis=-1, keepdims=True)
+            elif detrend:
+                raise Exception('LCONF: Unrecognized detrend: %s'%repr(detrend))
+            P = np.fft.rfft(seg*w, axis=-1)
+            P = (P.real**2 + P.imag**2) * scale
+            # Fold the negative frequencies into the one-sided spectrum
+            if nperseg % 2:
+                P[...,1:] *= 2
+            else:
+                P[...,1:-1] *= 2
+            yield P
+            
+    def _source_hash(self):
+        """Return the content hash of the source data or None if it can change"""
+        if isinstance(self, LFollow) or not os.path.isfile(self.filename):
+            return None
+        return _file_hash(self.filename)
+
+    def _spectral_key(self, *args):
+        """Return a key into the spectral cache for this file and ARGS"""
+        source = self._source_hash()
+        if source is None:
+            return None
+        return (source, self.cal, self._storage()) + args
+
+    def _storage(self):
+        """Return the type of compact storage or None for floating point data
+    
+Compact data are quantized, so the results computed from them are kept 
+apart from those of the same file loaded as floating point.
+"""
+        return self.data.raw.dtype.str if isinstance(self.data, LCompact) else None
+
+    def _store_key(self, name, signature, args, kwarg):
+        """Return the persistent store key of a method call or None"""
+        source = self._source_hash()
+        if source is None:
+            return None
+        bound = signature.bind(self, *args, **kwarg)
+        bound.apply_defaults()
+        params = dict(bound.arguments)
+        del params['self']
+        try:
+            return LStore.key(source, self.cal, 
+                    self.dibits, self._storage(), name, params)
+        except TypeError:
+            return None
+
+    @_memoize
+    def get_psd(self, aich=None, nperseg=1024, overlap=0.5, window='hann', 
+            detrend='constant'):
+        """Estimate the power spectral density by Welch's method
+    f, P = get_psd()
+    f, P = get_psd(aich)
+
+F is the array of frequencies in Hz, determined from the configured
+sample rate.  If AICH is None, P is an (nfreq, naich) array with one 
+column per channel.  Otherwise, AICH is the same index or string used 
+by get_channel(), and P is a 1-D array.  P is a one-sided density in 
+units^2/Hz, where units are the calibrated units of the channel.
+
+NPERSEG
+The integer number of samples in each segment.  The frequency resolution
+is samplehz/NPERSEG.
+
+OVERLAP
+The fraction of each segment that overlaps with the next.
+
+WINDOW
+The window applied to each segment: 'hann', 'hamming', 'boxcar', or an
+array of length NPERSEG.
+
+DETREND
+'constant' removes the mean of each segment.  None or False disables it.
+
+Segments are processed in batches, so the full record is never 
+transformed at once.  If the LConf object was loaded without data, the
+file is read block-by-block.  Results are cached by the file's content
+hash and the analysis parameters, so repeated calls on the same file 
+from any LConf object are free.
+"""
+        if isinstance(aich, str):
+            aich = self._get_label(0, 'aich', aich)
+        key = self._spectral_key('psd', aich, nperseg, overlap, 
+                repr(window), detrend)
+        if key is not None and key in _SPECTRA:
+            return _SPECTRA[key]
+            
+        total = 0.
+        count = 0
+        for P in self._spectra(aich, nperseg, overlap, window, detrend):
+            total = total + P.sum(axis=0)
+            count += P.shape[0]
+        if not count:
+            raise Exception('GET_PSD: There are fewer than NPERSEG=%d samples.'%nperseg)
+        P = (total / count).T
+        if aich is not None:
+            P = P[:,0]
+        f = np.fft.rfftfreq(nperseg, 1./self.get(0, 'samplehz'))
+        f.flags.writeable = False
+        P.flags.writeable = False
+        if key is not None:
+            _cache_spectrum(key, (f, P))
+        return f, P
+        
+    @_memoize
+    def get_spectrogram(self, aich=None, nperseg=256, overlap=0.5, 
+            window='hann', detrend='constant'):
+        """Compute a short-time Fourier transform power spectrogram
+    f, t, S = get_spectrogram()
+    f, t, S = get_spectrogram(aich)
+
+F is the array of frequencies in Hz, and T is the array of times at the
+center of each segment.  If AICH is None, S is an (nfreq, nseg, naich) 
+array.  Otherwise, S is an (nfreq, nseg) array for the single channel.
+The parameters and the density scaling are the same as get_psd(), and
+the results are cached the same way.
+"""
+        if isinstance(aich, str):
+            aich = self._get_label(0, 'aich', aich)
+        key = self._spectral_key('spectrogram', aich, nperseg, overlap, 
+                repr(window), detrend)
+        if key is not None and key in _SPECTRA:
+            return _SPECTRA[key]
+            
+        S = [P for P in self._spectra(aich, nperseg, overlap, window, detrend)]
+        if not S:
+            raise Exception('GET_SPECTROGRAM: There are fewer than NPERSEG=%d samples.'%nperseg)
+        S = np.concatenate(S, axis=0).transpose((2,0,1))
+        if aich is not None:
+            S = S[:,:,0]
+        samplehz = self.get(0, 'samplehz')
+        step = nperseg - int(np.round(overlap*nperseg))
+        f = np.fft.rfftfreq(nperseg, 1./samplehz)
+        t = (np.arange(S.shape[1])*step + nperseg/2.) / samplehz
+        for this in (f, t, S):
+            this.flags.writeable = False
+        if key is not None:
+            _cache_spectrum(key, (f, t, S))
+        return f, t, S
+
+    def get_phase(self, vaich=1, aoch=0):
+        """Estimate the phase of the periodic analog output excitation
+    i0, period = get_phase(vaich=1, aoch=0)
+    
+PERIOD is the (possibly non-integer) number of samples per period of 
+analog output channel AOCH, calculated from its aofrequency and the 
+sample rate.  I0 is the (possibly non-integer) index of the first sample
+at zero phase.  Zero phase is defined as the minimum of the fundamental
+component of the signal in channel VAICH, which is usually a measurement
+of the excitation voltage.  For a triangle wave, this is the start of 
+the rising sweep.  The fundamental is computed over a whole number of 
+periods.
+"""
+        if self.data is None:
+            raise Exception('GET_PHASE: This LConf object does not have channel data.')
+        if isinstance(vaich,str):
+            vaich = self._get_label(0, 'aich', vaich)
+        freq = self.get(0, 'aofrequency', aoch=aoch)
+        if freq <= 0:
+            raise Exception('GET_PHASE: AOCH %s does not have a valid aofrequency.'%repr(aoch))
+        period = self.get(0, 'samplehz') / freq
+        N = int(np.floor(self.ndata() / period) * period)
+        if N < 1:
+            raise Exception('GET_PHASE: The data contain less than one period.')
+        n = np.arange(N)
+        c = self.data[:N,vaich] @ np.exp(-2j*np.pi*n/period)
+        # v ~ cos(2 pi n / period + phi) is minimum where the argument is pi
+        i0 = ((np.pi - np.angle(c)) / (2*np.pi) * period) % period
+        return i0, period
+        
+    @_memoize
+    def get_folded(self, aich=None, nbin=None, vaich=1, aoch=0, mask=None):
+        """Average the data synchronously with the periodic excitation
+    phase, mean, std, count = get_folded()
+    phase, mean, std, count = get_folded(aich, nbin=None, vaich=1, aoch=0)
+    
+The record is folded on the period of the analog output channel AOCH so 
+that the samples at the same phase of each of the repeated periods are
+grouped together.  The phase is estimated from channel VAICH.  See 
+help(get_phase).  Only complete periods are used.
+
+PHASE is an array of NBIN bin centers in the interval [0,1).  MEAN and
+STD are (nbin, naich) arrays of the mean and standard deviation of each 
+channel in each phase bin, or 1-D arrays if AICH is specified.  COUNT is
+the number of samples in each bin.
+
+NBIN defaults to the number of samples per period.  When the period is 
+an integer number of samples, the alignment is rounded to the nearest
+sample, and NBIN divides the period, the record is reshaped with a 
+strided view rather than copied.  Otherwise, each sample is assigned to 
+a bin by its phase.
+
+MASK is an optional boolean array with one element per sample, like the
+one returned by get_spikes().  Samples where it is True are left out by
+giving them zero weight, and COUNT is the number of samples that were 
+kept.
+"""
+        i0, period = self.get_phase(vaich=vaich, aoch=aoch)
+        if isinstance(aich,str):
+            aich = self._get_label(0, 'aich', aich)
+        data = np.asarray(self.data) if aich is None else self.data[:,aich:aich+1]
+        P = int(np.round(period))
+        if nbin is None:
+            nbin = P
+        if mask is not None:
+            mask = self._get_mask(mask)
+            
+        if abs(period - P) < 1e-9 and P % nbin == 0:
+            I0 = int(np.round(i0)) % P
+            nper = (data.shape[0] - I0) // P
+            # A (nper, nbin, P//nbin, nchannel) view of the whole periods
+            s0, s1 = data.strides
+            view = np.lib.stride_tricks.as_strided(data[I0:], 
+                    shape=(nper, nbin, P//nbin, data.shape[1]),
+                    strides=(P*s0, (P//nbin)*s0, s0, s1), writeable=False)
+            if mask is None:
+                mean = view.mean(axis=(0,2))
+                std = view.std(axis=(0,2))
+                count = np.full(nbin, nper*(P//nbin))
+            else:
+                keep = ~mask[I0:]
+                weight = np.lib.stride_tricks.as_strided(keep, 
+                        shape=(nper, nbin, P//nbin, 1),
+                        strides=(P, P//nbin, 1, 0), writeable=False)
+                count = weight.sum(axis=(0,2))
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    mean = (view*weight).sum(axis=(0,2)) / count
+                    std = np.sqrt((((view - mean[:,None,:])**2)*weight).sum(
+                            axis=(0,2)) / count)
+                count = count[:,0]
+        else:
+            nper = int(np.floor((data.shape[0] - i0) / period))
+            I0 = int(np.ceil(i0))
+            I1 = int(np.floor(i0 + nper*period))
+            n = np.arange(I0, I1)
+            index = np.floor(((n - i0) / period % 1.) * nbin).astype(int)
+            index = np.minimum(index, nbin-1)
+            weight = None if mask is None else ~mask[I0:I1]
+            count = np.bincount(index, weight, minlength=nbin).astype(int)
+            mean = np.empty((nbin, data.shape[1]))
+            std = np.empty((nbin, data.shape[1]))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                for col in range(data.shape[1]):
+                    x = data[I0:I1,col]
+                    mean[:,col] = np.bincount(index, x if weight is None 
+                            else x*weight, minlength=nbin) / count
+                    sq = (x - mean[index,col])**2
+                    if weight is not None:
+                        sq *= weight
+                    std[:,col] = np.bincount(index, sq, minlength=nbin) / count
+            std = np.sqrt(std)
+        phase = (np.arange(nbin) + 0.5) / nbin
+        if aich is not None:
+            mean = mean[:,0]
+            std = std[:,0]
+        return phase, mean, std, count
+
+    def build_pyramid(self, base=64, cache=False):
+        """Build the multi-resolution summaries of all channels
+    PY = build_pyramid(base=64, cache=False)
+    
+The LPyramid is stored in the pyramid member and is used by get_stats(),
+get_envelope(), and show_channel() to answer range queries in O(log N).
+See help(LPyramid).  It is built automatically when the LConf object is 
+created with pyramid=True, or on the first call to get_stats() or 
+get_envelope().
+
+If CACHE is True, the pyramid is loaded from a sidecar file next to the 
+data file (filename + '.pyramid.npz') if one exists that matches the
+file's contents, calibration, storage type (see the compact keyword of 
+LConf()), and BASE.  Otherwise, the pyramid is built and the sidecar 
+file is written.
+"""
+        if self.data is None:
+            raise Exception('BUILD_PYRAMID: This LConf object does not have channel data.')
+        sidecar = self.filename + '.pyramid.npz'
+        meta = {'hash':_file_hash(self.filename), 'cal':self.cal, 
+                'storage':self._storage()}
+        if cache and os.path.isfile(sidecar):
+            try:
+                pyramid = LPyramid.load(sidecar, data=self.data)
+            except Exception:
+                pyramid = None
+            if pyramid is not None and pyramid.meta == meta and \
+                    pyramid.base == base and pyramid.n == self.ndata():
+                self.pyramid = pyramid
+                return pyramid
+        self.pyramid = LPyramid(self.data, base=base)
+        if cache:
+            self.pyramid.save(sidecar, **meta)
+        return self.pyramid
+        
+    def _window(self, start, stop):
+        """Return the (i0, i1) index range for START and STOP times"""
+        i0 = 0 if start is None else self._get_index(start)
+        i1 = self.ndata() if stop is None else self._get_bound(stop)
+        return i0, i1
+        
+    def get_stats(self, aich=None, start=None, stop=None):
+        """Summary statistics over a time window from the pyramid
+    s = get_stats(aich=None, start=None, stop=None)
+    
+Returns a dictionary with the 'min', 'max', 'mean', 'std', 'sum', and 
+'count' of the samples between the START and STOP times.  If AICH is
+None, each value is an array with one element per channel.  Otherwise, 
+AICH is the same index or string used by get_channel(), and the values
+are scalars.  The results are computed from the multi-resolution pyramid
+in O(log N) time.  See build_pyramid().
+"""
+        if self.pyramid is None:
+            self.build_pyramid()
+        out = self.pyramid.stats(*self._window(start, stop))
+        if aich is not None:
+            if isinstance(aich,str):
+                aich = self._get_label(0, 'aich', aich)
+            for key in ('min', 'max', 'mean', 'std', 'sum'):
+                out[key] = out[key][aich]
+        return out
+        
+    def get_envelope(self, aich, npoints=1000, start=None, stop=None):
+        """Decimated min/max/mean envelope of a channel for plotting
+    t, ymin, ymax, ymean = get_envelope(aich, npoints=1000)
+    
+Between NPOINTS and 2*NPOINTS blocks of samples between the START and 
+STOP times are summarized.  T is the time at the center of each block.  
+The blocks are read directly from the pyramid.  See build_pyramid().
+"""
+        if self.pyramid is None:
+            self.build_pyramid()
+        if isinstance(aich,str):
+            aich = self._get_label(0, 'aich', aich)
+        index, ymin, ymax, ymean = self.pyramid.envelope(
+                *self._window(start, stop), npoints=npoints)
+        t = self.time[0] + (index - 0.5) / self.get(0, 'samplehz')
+        return t, ymin[:,aich], ymax[:,aich], ymean[:,aich]
+
+    @_memoize
+    def get_binned(self, aich, xaich=1, bins=100, start=None, stop=None,
+            mask=None):
+        """Average a channel in bins of another channel
+    x, mean, std, count = get_binned(aich, xaich=1, bins=100, mask=None)
+    
+This is the recommended way to filter noisy IV characteristics; the 
+current in channel AICH is averaged in bins of the voltage in XAICH.  
+AICH and XAICH are the same indices or strings used by get_channel().
+
+BINS is either the integer number of uniform bins spanning the range of 
+XAICH or an array of bin edges.  X is the array of bin centers.  MEAN, 
+STD, and COUNT are the mean, standard deviation, and number of samples 
+in each bin.  Empty bins have NaN mean and std.  START and STOP limit 
+the data to a time window as they do for get_channel().  MASK is an 
+optional boolean array with one element per sample, like the one 
+returned by get_spikes(), and samples where it is True are left out.
+"""
+        y = self.get_channel(aich, start=start, stop=stop)
+        x = self.get_channel(xaich, start=start, stop=stop)
+        if mask is not None:
+            mask = self._get_mask(mask, start=start, stop=stop)
+        if np.ndim(bins) == 0:
+            bins = np.linspace(x.min(), x.max(), int(bins)+1) if mask is None \
+                    else np.linspace(x[~mask].min(), x[~mask].max(), int(bins)+1)
+        edges = np.asarray(bins, dtype=float)
+        nbin = edges.size-1
+        index = np.clip(np.searchsorted(edges, x, side='right')-1, 0, nbin-1)
+        # Exclude samples outside of the bin edges
+        keep = (x >= edges[0]) & (x <= edges[-1])
+        if mask is not None:
+            keep &= ~mask
+        count = np.bincount(index[keep], minlength=nbin)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.bincount(index[keep], y[keep], minlength=nbin) / count
+            std = np.bincount(index[keep], (y[keep] - mean[index[keep]])**2, 
+                    minlength=nbin) / count
+        return (edges[:-1] + edges[1:])/2., mean, np.sqrt(std), count
+
+    def _epoch_args(self, pre, post, channels):
+        """Convert epoch window times to sample counts and resolve channels
+    npre, npost, cols, squeeze = _epoch_args(pre, post, channels)
+"""
+        samplehz = self.get(0, 'samplehz')
+        npre = int(np.round(pre * samplehz))
+        npost = int(np.round(post * samplehz))
+        if npre + npost < 1:
+            raise Exception('EPOCHS: The window must contain at least one sample.')
+        squeeze = False
+        if channels is None:
+            cols = slice(None)
+        elif isinstance(channels, (int, np.integer, str)):
+            if isinstance(channels, str):
+                channels = self._get_label(0, 'aich', channels)
+            cols = slice(channels, channels+1)
+            squeeze = True
+        else:
+            cols = [self._get_label(0, 'aich', this) if isinstance(this, str)
+                    else int(this) for this in channels]
+            # Evenly spaced channels can still be a view
+            step = np.diff(cols)
+            if len(cols) and (len(cols) == 1 or (step[0] > 0 and np.all(step == step[0]))):
+                cols = slice(cols[0], cols[-1]+1,
+                        int(step[0]) if len(cols) > 1 else 1)
+        return npre, npost, cols, squeeze
+
+    def epochs(self, events, pre=0., post=0., channels=None, clip='drop',
+            **kwarg):
+        """Cut fixed windows of data around events
+    t, E, index = epochs(events, pre, post, channels=None, clip='drop')
+
+EVENTS is a sequence of sample indices like those returned by
+get_events(), or it is an analog input channel (index or label), in
+which case the events are found with get_events() and any additional
+keyword arguments (level, edge, debounce, ...) are passed to it.
+
+PRE and POST are the times in seconds to include before and after each
+event.  The window for an event at sample i spans samples i-npre through
+i+npost-1, and T is the array of times of those samples relative to the
+event.  CHANNELS is None for all analog inputs, a single channel index
+or label, or a list of them.
+
+E is an (n_events, n_samples, n_channels) array, or (n_events,
+n_samples) if CHANNELS is a single channel.  INDEX is the array of the
+event indices included in E.  Windows that extend past either end of the
+data are excluded when CLIP is 'drop', and the missing samples are
+filled with NaN when CLIP is 'nan'.
+
+When the events are evenly spaced (e.g. periodic sweeps) and the
+channels are a single channel or evenly spaced, E is a read-only strided
+view of the data with no copies at all.  Otherwise, the windows are
+gathered in a single operation from a sliding window view.
+"""
+        if self.data is None:
+            raise Exception('EPOCHS: This LConf object does not have channel data.')
+        if clip not in ('drop', 'nan'):
+            raise Exception('EPOCHS: CLIP must be "drop" or "nan": %s'%repr(clip))
+        if isinstance(events, (int, np.integer, str)):
+            events = self.get_events(events, **kwarg)
+        events = np.asarray(events, dtype=int).reshape(-1)
+        npre, npost, cols, squeeze = self._epoch_args(pre, post, channels)
+        L = npre + npost
+        t = np.arange(-npre, npost) * (1. / self.get(0, 'samplehz'))
+
+        N = self.ndata()
+        starts = events - npre
+        valid = (starts >= 0) & (starts + L <= N)
+        if clip == 'drop':
+            events = events[valid]
+            starts = starts[valid]
+            valid = valid[valid]
+
+        data = self.data
+        step = np.diff(starts)
+        if isinstance(data, np.ndarray) and isinstance(cols, slice) and \
+                valid.all() and (starts.size < 2 or (step[0] > 0 and np.all(step == step[0]))):
+            # Evenly spaced events are a strided view of the data
+            src = data[starts[0] if starts.size else 0:, cols]
+            s0, s1 = src.strides
+            E = np.lib.stride_tricks.as_strided(src,
+                    shape=(starts.size, L, src.shape[1]),
+                    strides=((int(step[0]) if starts.size > 1 else 0)*s0, s0, s1),
+                    writeable=False)
+        else:
+            nch = len(range(*cols.indices(data.shape[1]))) \
+                    if isinstance(cols, slice) else len(cols)
+            E = np.full((starts.size, L, nch), np.nan) if clip == 'nan' \
+                    else np.empty((starts.size, L, nch))
+            if isinstance(data, np.ndarray):
+                if N >= L:
+                    # (N-L+1, nch, L) view with one window per start sample
+                    windows = np.lib.stride_tricks.sliding_window_view(
+                            data[:,cols], L, axis=0)
+                    E[valid] = windows[starts[valid]].transpose(0,2,1)
+            elif valid.any():
+                # Compact data are scaled only for the requested samples
+                index = starts[valid].reshape(-1,1) + np.arange(L)
+                E[valid] = data[index, cols] if isinstance(cols, slice) \
+                        else data[index][:,:,cols]
+            # Only the events at the edges of the data are clipped
+            for k in np.flatnonzero(~valid):
+                i0 = max(starts[k], 0)
+                i1 = min(starts[k] + L, N)
+                if i1 > i0:
+                    E[k, i0-starts[k]:i1-starts[k]] = data[i0:i1, cols]
+        if squeeze:
+            E = E[:,:,0]
+        return t, E, events
+
+    def get_epoch_mean(self, events, pre=0., post=0., channels=None,
+            level=0., edge='rising', nbyte=1048576):
+        """Average windows around events while streaming from the file
+    t, mean, std, count = get_epoch_mean(events, pre, post, channels=None)
+
+This is the out-of-core equivalent of averaging the result of epochs()
+over the events, and it does not require the data to be loaded.  The
+file is read in blocks with iter_blocks(), and windows are accumulated
+by an LEpochMean as they are completed.  See help(LEpochMean).
+
+EVENTS is a sorted sequence of sample indices, or it is an analog input
+channel (index or label) that is scanned for crossings of LEVEL with
+EDGE 'rising', 'falling', or 'any' as the blocks are read.  Crossings
+are marked at the last sample before the level is crossed as they are
+by get_events(), but there is no debounce filter.
+
+T is the array of times relative to the event.  MEAN and STD are
+(n_samples, n_channels) arrays, or 1-D arrays if CHANNELS is a single
+channel.  COUNT is the number of complete windows that were averaged;
+windows that extend past either end of the data are dropped.
+"""
+        npre, npost, cols, squeeze = self._epoch_args(pre, post, channels)
+        t = np.arange(-npre, npost) * (1. / self.get(0, 'samplehz'))
+        detect = isinstance(events, (int, np.integer, str))
+        if detect:
+            aich = self._get_label(0, 'aich', events) \
+                    if isinstance(events, str) else events
+            edge = edge.lower()
+            last = None
+        else:
+            events = np.asarray(events, dtype=int).reshape(-1)
+
+        acc = LEpochMean(npre, npost)
+        for index, data, didata in self.iter_blocks(nbyte=nbyte):
+            if detect:
+                test = data[:,aich] > level
+                prev = np.concatenate((test[:1] if last is None else [last], test[:-1]))
+                if edge == 'rising':
+                    found = ~prev & test
+                elif edge == 'falling':
+                    found = prev & ~test
+                else:
+                    found = prev != test
+                these = np.flatnonzero(found) + index - 1
+                if test.size:
+                    last = test[-1]
+            else:
+                these = events[(events >= index) & (events < index + data.shape[0])]
+            acc.add(index, data[:,cols], these)
+        mean, std, count = acc.result()
+        if squeeze:
+            mean = mean[:,0]
+            std = std[:,0]
+        return t, mean, std, count
+
+    def show_channel(self, aich, ax=None, fig=None, downsample=None,
             show=True, ylabel=None, xlabel=None, fs=16,
-            start=None, stop=None,
+            start=None, stop=None, npoints=None, mask=None,
             plot_param={}):
         """Plot the data from a channel
     mpll = show_channel(aich)
@@ -865,6 +2813,18 @@ DOWNSAMPLE
 This parameter is passed to get_time() and get_channel() to reduce the 
 size of the dataset shown.
 
+NPOINTS
+If NPOINTS is specified, the channel is plotted as the mean of between
+NPOINTS and 2*NPOINTS blocks of samples with the min/max envelope shaded.
+The blocks are read from the multi-resolution pyramid, so long records 
+are plotted quickly.  See get_envelope().  DOWNSAMPLE is ignored.
+
+MASK
+An optional boolean array with one element per sample, like the one 
+returned by get_spikes().  Samples where it is True are left out of the 
+line.  The data are wrapped in a masked array, not copied.  MASK cannot 
+be used with NPOINTS.
+
 SHOW
 If True, then a non-blocking show() command will be called after 
 plotting to prompt matplotlib to display the plot.  In some interfaces,
@@ -883,6 +2843,8 @@ A dictionar of keyword, value pairs that will be passed to the plot
 command to configure the line object.
 """
 
+        t0 = time.perf_counter() if _INSTRUMENT else None
+        plt = _pyplot()
         # Initialize the figure and the axes
         if ax is not None:
             fig = ax.get_figure()
@@ -911,10 +2873,21 @@ command to configure the line object.
             aicalunits = 'V'
             
         # Get data and time
-        t = self.get_time(downsample=downsample, start=start, stop=stop)
-        y = self.get_channel(aich, downsample=downsample, start=start, stop=stop)
+        if npoints:
+            if mask is not None:
+                raise Exception('SHOW_CHANNEL: MASK cannot be used with NPOINTS.')
+            t, ymin, ymax, y = self.get_envelope(aich, npoints=npoints, 
+                    start=start, stop=stop)
+        else:
+            t = self.get_time(downsample=downsample, start=start, stop=stop)
+            y = self.get_channel(aich, downsample=downsample, start=start, stop=stop)
+            if mask is not None:
+                y = np.ma.masked_array(y, mask=self._get_mask(mask, 
+                        downsample=downsample, start=start, stop=stop), copy=False)
         
         ll = ax.plot(t, y, label=ailabel, **plot_param)
+        if npoints:
+            ax.fill_between(t, ymin, ymax, color=ll[0].get_color(), alpha=0.3)
         
         if xlabel:
             ax.set_xlabel(xlabel, fontsize=fs)
@@ -928,6 +2901,8 @@ command to configure the line object.
         if show:
             plt.show(block=False)
 
+        if t0 is not None:
+            self._record('plot', t0, rows=y.shape[0])
         return ll
         
     def show_dichannel(self, dich=None, ax=None, fig=None, downsample=None, 
@@ -974,6 +2949,8 @@ A dictionar of keyword, value pairs that will be passed to the plot
 command to configure the line object.
 """
 
+        t0 = time.perf_counter() if _INSTRUMENT else None
+        plt = _pyplot()
         # Initialize the figure and the axes
         if ax is not None:
             fig = ax.get_figure()
@@ -1015,8 +2992,11 @@ command to configure the line object.
         if show:
             plt.show(block=False)
 
+        if t0 is not None:
+            self._record('plot', t0, rows=y.shape[0])
         return ll
 
+    @_memoize
     def get_events(self, aich, level=0., edge='any', start=None, 
             stop=None, count=None, debounce=1, diff=0):
         """Detect edge crossings returns a list of indexes corresponding to data 
@@ -1065,6 +3045,7 @@ Specifies the number of derivatives to take prior to scanning for events
 This is done by y.
 """
 
+        t0 = time.perf_counter() if _INSTRUMENT else None
         edge = edge.lower()
         edge_mode = 0
         if edge == 'rising':
@@ -1082,10 +3063,12 @@ This is done by y.
         indices = []
         
         # Get the channel data
-        y = self.get_channel(aich)
+        if isinstance(aich,str):
+            aich = self._get_label(0, 'aich', aich)
         if diff:
-            y = np.diff(y, diff)
-            y *= self.get(0, 'samplehz')**diff
+            y = self._get_diff(aich, diff)
+        else:
+            y = self.get_channel(aich)
         
         # State machine variables
         rising_index = None
@@ -1121,9 +3104,12 @@ This is done by y.
                 break
                 
             test_last = test
+        if t0 is not None:
+            self._record('events', t0, rows=i1-i0, outbytes=y.nbytes if diff else 0)
         return indices
         
 
+    @_memoize
     def get_dievents(self, dich=None, level=0., edge='any', start=None, 
             stop=None, count=None, debounce=1):
         """Detect edges on the digital input stream.  When the data were loaded with the DIBITS
@@ -1171,6 +3157,7 @@ determined by the debounce integer.  If none is specified, then debounce
 is 1 (no filter).
 """
 
+        t0 = time.perf_counter() if _INSTRUMENT else None
         edge = edge.lower()
         edge_mode = 0
         if edge == 'rising':
@@ -1185,6 +3172,26 @@ is 1 (no filter).
         if stop:
             i1 = self._get_index(stop)
             
+        if isinstance(self.didata, LTransitions) and debounce <= 1:
+            # Without debouncing, the edges come straight from the runs
+            if self.didata.dibits:
+                index, state = self.didata.changes(dich)
+            else:
+                index, state = self.didata.changes(level=level)
+            # The sample loop reports the last sample before each change,
+            # and only changes at i0+2 through i1-1
+            keep = (index >= i0+2) & (index < i1)
+            if edge_mode > 0:
+                keep &= state
+            elif edge_mode < 0:
+                keep &= ~state
+            indices = (index[keep] - 1).tolist()
+            if count:
+                indices = indices[:count]
+            if t0 is not None:
+                self._record('dievents', t0, rows=i1-i0)
+            return indices
+            
         indices = []
         
         # Get the channel data
@@ -1227,5 +3234,3123 @@ is 1 (no filter).
                 break
                 
             test_last = test
+        if t0 is not None:
+            self._record('dievents', t0, rows=i1-i0)
         return indices
         
+    @_memoize
+    def get_spikes(self, aich, nwin=51, threshold=6., pad=0, start=None, 
+            stop=None, nbyte=1048576):
+        """Find spikes and glitches in a channel
+    index, mask = get_spikes(aich, nwin=51, threshold=6., pad=0)
+    
+Samples that differ from the rolling median of the NWIN samples around 
+them by more than THRESHOLD times the scaled rolling median absolute 
+deviation are spikes.  See help(LSpikeDetector).  AICH is the same 
+index or string used by get_channel(), and START and STOP are times in
+seconds that limit the search.
+
+INDEX is an array of the sample indices of the spikes.  MASK is a 
+boolean array with one element per sample that is True at each spike and
+at the PAD samples on either side of it.  It can be passed as the MASK 
+keyword to get_binned(), get_folded(), and show_channel(), which then 
+leave out the masked samples without copying the channel data.
+    index, mask = LC.get_spikes('Ch0 Current', pad=2)
+    v, i, std, count = LC.get_binned('Ch0 Current', mask=mask)
+    
+If the LConf object was created without data, the channel is read from 
+the file with iter_blocks(), reading NBYTE bytes at a time.
+"""
+        if isinstance(aich,str):
+            aich = self._get_label(0, 'aich', aich)
+        samplehz = self.get(0, 'samplehz')
+        i0 = int(np.round(start*samplehz)) if start else 0
+        i1 = int(np.round(stop*samplehz)) if stop else None
+        detector = LSpikeDetector(nwin=nwin, threshold=threshold)
+        spikes = []
+        if self.data is not None:
+            N = self.ndata()
+            i1 = N if i1 is None else min(i1, N)
+            for index in range(i0, i1, 65536):
+                spikes.append(detector.add(index, 
+                        self.data[index:min(index+65536, i1), aich]))
+        else:
+            N = 0
+            for index, data, _ in self.iter_blocks(nbyte=nbyte):
+                N = index + data.shape[0]
+                a = max(i0 - index, 0)
+                b = data.shape[0] if i1 is None else min(i1 - index, data.shape[0])
+                if b > a:
+                    spikes.append(detector.add(index+a, data[a:b,aich]))
+        spikes.append(detector.finish())
+        index = np.concatenate(spikes).astype(int)
+        mask = np.zeros(N, dtype=bool)
+        for shift in range(-int(pad), int(pad)+1):
+            mask[np.clip(index + shift, 0, max(N-1, 0))] = True
+        return index, mask
+        
+    def _get_mask(self, mask, downsample=None, start=None, stop=None):
+        """Return the part of a per-sample mask that matches get_channel()"""
+        mask = np.asarray(mask, dtype=bool)
+        if mask.shape != (self.ndata(),):
+            raise Exception('MASK: The mask must have one element per sample (%d), but has shape %s.'%(
+                    self.ndata(), repr(mask.shape)))
+        if downsample or start or stop:
+            return mask[self._get_slice(downsample, start, stop)]
+        return mask
+        
+    def _transitions(self):
+        """Return the digital input stream as an LTransitions object"""
+        if isinstance(self.didata, LTransitions):
+            return self.didata
+        if self.didata is None:
+            raise Exception('LCONF: The data do not include a digital input stream.')
+        key = ('transitions',)
+        T = self._cache.get(key)
+        if T is None:
+            if self.didata.shape[1] == 1:
+                raw = self.didata[:,0]
+            else:
+                raw = (self.didata.astype(int) << np.arange(16)).sum(axis=1)
+            T = LTransitions.encode(raw, dibits=self.didata.shape[1] > 1)
+            self._cache[key] = T
+        return T
+        
+    def get_distate(self, dich, t):
+        """Return the state of a digital input bit at one or more times
+    state = get_distate(dich, t)
+    
+T is a time or an array of times in seconds, which are rounded to the 
+nearest sample.  STATE is the boolean state of bit DICH, or the 16-bit 
+stream value if DICH is None.  The state is looked up in the runs of the
+stream in O(log n) time; see help(LTransitions).  Data that were not 
+loaded with the dicompact keyword are encoded on the first call.
+"""
+        T = self._transitions()
+        index = np.round(np.asarray(t, dtype=float) * self.get(0, 'samplehz'))
+        index = np.clip(index.astype(int) - getattr(self, 'offset', 0), 0, T.n-1)
+        if dich is None:
+            return T.value(index)
+        return T.state(dich, index)
+        
+    def get_diintervals(self, dich, state=True, level=None):
+        """Return the time intervals where a digital input bit is high
+    intervals = get_diintervals(dich, state=True, level=None)
+    
+INTERVALS is an (n, 2) array of the start and stop times in seconds of 
+each interval in which bit DICH is STATE.  Each start time is that of 
+the first sample in the interval, and each stop time is that of the 
+first sample after it.  If LEVEL is given, DICH is ignored, and the 
+intervals are those in which the 16-bit stream value >= LEVEL is STATE.
+See help(LTransitions).
+"""
+        T = self._transitions()
+        pairs = T.intervals(dich, state=state, level=level)
+        return (pairs + getattr(self, 'offset', 0)) * (1. / self.get(0, 'samplehz'))
+        
+
+###
+# Batch analysis
+###
+
+# Spectral results keyed by file hash, calibration, and parameters
+_SPECTRA = {}
+# The total size of the arrays in _SPECTRA is kept below this many bytes
+_SPECTRA_MAXBYTES = 67108864
+_SPECTRA_NBYTES = 0
+
+def _cache_spectrum(key, value):
+    """Add a result to the spectral cache, discarding the oldest until it fits"""
+    global _SPECTRA_NBYTES
+    nbytes = sum([this.nbytes for this in value])
+    if nbytes > _SPECTRA_MAXBYTES:
+        return
+    old = _SPECTRA.pop(key, None)
+    if old is not None:
+        _SPECTRA_NBYTES -= sum([this.nbytes for this in old])
+    while _SPECTRA and _SPECTRA_NBYTES + nbytes > _SPECTRA_MAXBYTES:
+        _SPECTRA_NBYTES -= sum([this.nbytes for this in 
+                _SPECTRA.pop(next(iter(_SPECTRA)))])
+    _SPECTRA[key] = value
+    _SPECTRA_NBYTES += nbytes
+
+
+def batch_psd(filenames, aich=None, cal=True, **kwarg):
+    """Estimate power spectral densities for many files
+    f, P = batch_psd(filenames)
+    f, P = batch_psd(filenames, aich, nperseg=1024, ...)
+
+Only the configuration header of each file is parsed up front.  The data
+are streamed through LConf.get_psd() block-by-block, so files are never
+loaded in full, and results are cached by file hash, so files that were 
+already analyzed (even under a different name) are not read again.  All
+files must have the same sample rate.
+
+P is an (nfile, nfreq, naich) array, or (nfile, nfreq) if AICH is given.
+The keyword arguments are passed to LConf.get_psd().
+"""
+    f = None
+    out = []
+    for filename in filenames:
+        this = LConf(filename, data=False, cal=cal)
+        ff, P = this.get_psd(aich, **kwarg)
+        if f is not None and not np.array_equal(f, ff):
+            raise Exception('BATCH_PSD: The sample rate in %s does not match.'%filename)
+        f = ff
+        out.append(P)
+    if f is None:
+        raise Exception('BATCH_PSD: No files were specified.')
+    return f, np.stack(out)
+
+
+def batch_fold(filenames, aich=None, nbin=None, vaich=1, aoch=0, cal=True):
+    """Period-synchronous averages for many files
+    phase, mean, std, count = batch_fold(filenames)
+    
+Each file is loaded and folded with LConf.get_folded().  MEAN and STD are
+stacked into (nfile, nbin, naich) arrays, or (nfile, nbin) arrays if AICH
+is specified, and COUNT is an (nfile, nbin) array.  All files must yield 
+the same number of phase bins, so NBIN should be specified if the files
+have different sample rates or excitation frequencies.
+"""
+    out = []
+    for filename in filenames:
+        this = LConf(filename, data=True, cal=cal)
+        out.append(this.get_folded(aich=aich, nbin=nbin, vaich=vaich, aoch=aoch))
+    if not out:
+        raise Exception('BATCH_FOLD: No files were specified.')
+    if len(set([len(this[0]) for this in out])) > 1:
+        raise Exception('BATCH_FOLD: The files do not have the same number of phase bins; specify NBIN.')
+    return (out[0][0], np.stack([this[1] for this in out]),
+            np.stack([this[2] for this in out]), np.stack([this[3] for this in out]))
+
+
+###
+# Collections of runs
+###
+
+class LConfSet:
+    """A collection of LConf objects for vectorized comparisons of runs
+    LS = LConfSet(['10.dat', '15.dat', '20.dat', '25.dat'], data=True)
+    LS = LConfSet([LC1, LC2, ...])
+    
+Filenames are loaded with LConf(filename, **kwarg), and existing LConf 
+objects are used as they are.  Individual runs are retrieved by index, 
+and indexing by a slice, an integer array, or a boolean mask returns a 
+new LConfSet sharing the same LConf objects.
+    LS[0]               The first LConf object
+    LS[LS.meta['fg_scfh'] > 6.]
+
+** Meta Parameters **
+The meta member is a dictionary of NumPy arrays with one element per run
+for every meta parameter found in device 0 of any run.  Numeric 
+parameters that are missing from a run are NaN.
+    LS.meta['fg_scfh'] + LS.meta['o2_scfh']
+    LS.get_meta('fg_scfh')
+
+** Channel Data **
+Matching channels from all runs can be stacked into a single padded 
+array or a ragged (values, offsets) pair.
+    y, n = LS.get_stack('Ch0 Current')
+    values, offsets = LS.get_stack('Ch0 Current', ragged=True)
+
+** Filter, group, and reduce **
+    LS.filter(lambda LC: LC.ndata() > 5000)
+    groups = LS.groupby('fg_scfh')
+    LS.reduce('Ch0 Current', 'std')
+
+** Binning **
+The IV characteristic of every run is binned in a single batched call
+    x, mean, std, count = LS.get_binned('Ch0 Current', 'Ch0 Voltage', bins=100)
+
+** Surfaces **
+The binned channel of every run can be interpolated at any voltage and
+total flow rate.  See help(LSurface).
+    LSF = LS.get_surface('Ch0 Current', 'Ch0 Voltage', bins=100)
+    i, ierr = LSF(v, flow)
+"""
+    def __init__(self, runs, **kwarg):
+        self.runs = []
+        for this in runs:
+            if isinstance(this, LConf):
+                self.runs.append(this)
+            else:
+                self.runs.append(LConf(this, **kwarg))
+        self._update_meta()
+        
+    def _update_meta(self):
+        """Build the meta dictionary of arrays"""
+        self.meta = {}
+        names = []
+        for this in self.runs:
+            for name in this.get_meta(0):
+                if name not in names:
+                    names.append(name)
+        for name in names:
+            values = [this.get_meta(0).get(name) for this in self.runs]
+            if all([isinstance(value, (int, float)) or value is None 
+                    for value in values]):
+                self.meta[name] = np.array([np.nan if value is None else value 
+                        for value in values], dtype=float)
+            else:
+                self.meta[name] = np.array(values, dtype=object)
+
+    def __len__(self):
+        return len(self.runs)
+        
+    def __iter__(self):
+        return iter(self.runs)
+        
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return self.runs[index]
+        elif isinstance(index, slice):
+            return LConfSet(self.runs[index])
+        index = np.asarray(index)
+        if index.dtype == bool:
+            index = np.flatnonzero(index)
+        return LConfSet([self.runs[this] for this in index])
+        
+    def __repr__(self):
+        return 'LConfSet([' + ', '.join([repr(os.path.basename(this.filename)) 
+                for this in self.runs]) + '])'
+                
+    def get_filenames(self):
+        """Return a list of the source file names"""
+        return [this.filename for this in self.runs]
+
+    def get_meta(self, param, default=np.nan):
+        """Return an array of a meta parameter from each run
+    values = get_meta(param, default=np.nan)
+    
+Runs without the parameter are given the DEFAULT value.
+"""
+        return np.array([this.get_meta(0).get(param, default) 
+                for this in self.runs])
+                
+    def get(self, param, **kwarg):
+        """Return an array of a configuration parameter from each run
+    values = get(param, aich=None, ...)
+    
+The keyword arguments are passed to LConf.get() for device 0.
+"""
+        return np.array([this.get(0, param, **kwarg) for this in self.runs])
+        
+    def get_stack(self, aich, ragged=False, fill=np.nan, **kwarg):
+        """Stack a channel from every run
+    y, n = get_stack(aich, fill=np.nan, downsample=None, start=None, stop=None)
+    values, offsets = get_stack(aich, ragged=True, ...)
+    
+Y is an (nrun, nmax) array padded with FILL, and N is the array of the
+number of samples from each run.  When RAGGED is True, VALUES is the 
+concatenation of every run's samples, and run k occupies 
+values[offsets[k]:offsets[k+1]].  The keyword arguments are passed to 
+LConf.get_channel().
+"""
+        chunks = [this.get_channel(aich, **kwarg) for this in self.runs]
+        n = np.array([this.shape[0] for this in chunks], dtype=int)
+        if ragged:
+            offsets = np.concatenate(([0], np.cumsum(n)))
+            return np.concatenate(chunks), offsets
+        y = np.full((len(chunks), n.max() if n.size else 0), fill, dtype=float)
+        # Scatter the samples into the padded array in one operation
+        mask = np.arange(y.shape[1]) < n.reshape(-1,1)
+        if chunks:
+            y[mask] = np.concatenate(chunks)
+        return y, n
+        
+    def filter(self, test):
+        """Return an LConfSet of the runs that pass a test
+    LS2 = filter(test)
+    
+TEST is either a boolean array with one element per run or a function 
+that accepts an LConf object and returns True or False.
+"""
+        if callable(test):
+            test = [bool(test(this)) for this in self.runs]
+        return self[np.asarray(test, dtype=bool)]
+        
+    def groupby(self, key):
+        """Group the runs by a meta parameter or by an array of keys
+    groups = groupby(key)
+    
+KEY is the name of a meta parameter or an array with one element per run.
+GROUPS is a dictionary of LConfSet objects keyed by the unique values.
+"""
+        if isinstance(key, str):
+            key = self.meta[key]
+        key = np.asarray(key)
+        values, inverse = np.unique(key, return_inverse=True)
+        return {value:self[inverse == index] 
+                for index,value in enumerate(values.tolist())}
+                
+    def reduce(self, aich, op='mean', **kwarg):
+        """Reduce a channel of every run to one value per run
+    values = reduce(aich, op='mean', start=None, stop=None, ...)
+
+OP is 'mean', 'std', 'min', 'max', 'sum', 'median', or a function that 
+accepts a padded (nrun, nmax) array (NaN-padded) and an axis keyword.
+All runs are reduced together from the output of get_stack().  The 
+keyword arguments are passed to LConf.get_channel().
+"""
+        y, n = self.get_stack(aich, **kwarg)
+        if not callable(op):
+            op = {'mean':np.nanmean, 'std':np.nanstd, 'min':np.nanmin, 
+                    'max':np.nanmax, 'sum':np.nansum, 'median':np.nanmedian}[op]
+        return op(y, axis=1)
+        
+    def get_binned(self, aich, xaich=1, bins=100, start=None, stop=None):
+        """Bin a channel by another channel for every run in one batched call
+    x, mean, std, count = get_binned(aich, xaich=1, bins=100)
+    
+This is the batched equivalent of LConf.get_binned().  BINS is the 
+number of uniform bins spanning the range of XAICH over all runs or an 
+array of bin edges, so every run shares the same bins.  MEAN, STD, and 
+COUNT are (nrun, nbin) arrays.
+"""
+        y, offsets = self.get_stack(aich, ragged=True, start=start, stop=stop)
+        x, _ = self.get_stack(xaich, ragged=True, start=start, stop=stop)
+        if np.ndim(bins) == 0:
+            bins = np.linspace(x.min(), x.max(), int(bins)+1)
+        edges = np.asarray(bins, dtype=float)
+        nbin = edges.size-1
+        nrun = len(self.runs)
+        # One flat bin index for every (run, bin) pair
+        run = np.repeat(np.arange(nrun), np.diff(offsets))
+        index = np.clip(np.searchsorted(edges, x, side='right')-1, 0, nbin-1)
+        index += run*nbin
+        keep = (x >= edges[0]) & (x <= edges[-1])
+        index = index[keep]
+        y = y[keep]
+        count = np.bincount(index, minlength=nrun*nbin)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.bincount(index, y, minlength=nrun*nbin) / count
+            std = np.bincount(index, (y - mean[index])**2, 
+                    minlength=nrun*nbin) / count
+        return ((edges[:-1] + edges[1:])/2., mean.reshape(nrun, nbin), 
+                np.sqrt(std).reshape(nrun, nbin), count.reshape(nrun, nbin))
+
+    def get_surface(self, aich, xaich=1, bins=100, flow=('fg_scfh', 'o2_scfh'),
+            start=None, stop=None):
+        """Build an interpolated surface of a channel over voltage and flow rate
+    LSF = get_surface(aich, xaich=1, bins=100, flow=('fg_scfh', 'o2_scfh'))
+
+Channel AICH of every run is binned by channel XAICH with get_binned(),
+and the bin means are arranged on a grid of bin centers by the total 
+flow rate of each run.  FLOW is a list of meta parameter names that are 
+summed to give the flow rate of each run, or an array with one value per 
+run.  Runs with the same flow rate are pooled, and runs without a flow 
+rate are ignored.  Returns an LSurface.  See help(LSurface).
+"""
+        if isinstance(flow, str):
+            flow = (flow,)
+        if len(flow) and isinstance(flow[0], str):
+            flow = np.sum([self.get_meta(param) for param in flow], axis=0)
+        flow = np.asarray(flow, dtype=float)
+        if flow.shape != (len(self.runs),):
+            raise Exception('GET_SURFACE: FLOW must have one value per run.')
+        keep = np.isfinite(flow)
+        x, mean, std, count = self[keep].get_binned(aich, xaich, bins=bins,
+                start=start, stop=stop)
+        flow = flow[keep]
+        # Pool the runs with the same flow rate
+        values, inverse = np.unique(flow, return_inverse=True)
+        nf = values.size
+        n = np.zeros((nf, x.size))
+        s1 = np.zeros((nf, x.size))
+        s2 = np.zeros((nf, x.size))
+        mean = np.where(count > 0, mean, 0.)
+        std = np.where(count > 0, std, 0.)
+        np.add.at(n, inverse, count)
+        np.add.at(s1, inverse, count*mean)
+        np.add.at(s2, inverse, count*(std*std + mean*mean))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = s1 / n
+            var = np.maximum(s2 / n - mean*mean, 0.)
+            # The uncertainty of each grid value is the standard error
+            err = np.sqrt(var / n)
+        return LSurface(x, values, mean, err, n.astype(int))
+
+
+class LSurface:
+    """Interpolated surface of a channel over voltage and total flow rate
+    LSF = LConfSet(['10.dat', '15.dat', '20.dat', '25.dat'], data=True
+            ).get_surface('Ch0 Current', 'Ch0 Voltage', bins=100)
+    LSF = LSurface(v, flow, mean, err, count=None)
+
+MEAN and ERR are (nflow, nv) arrays of the bin means and their standard
+errors on the grid of increasing voltages V and flow rates FLOW.  Grid
+points without data are NaN.  Surfaces are evaluated by bilinear 
+interpolation at any number of points at once; V and FLOW are broadcast
+together.
+    i, ierr = LSF(v, flow)
+    i, ierr = LSF(np.linspace(-5, 5, 1000), 17.5)
+
+The uncertainty IERR is propagated from the four surrounding grid 
+points, which are assumed to be independent, as the square root of the
+sum of the squared interpolation weights times their squared errors.
+Points outside of the grid are NaN unless extrapolate=True is passed, 
+in which case the nearest grid cell is extended linearly.
+
+Surfaces are saved to and loaded from NumPy .npz files.
+    LSF.save('surface.npz', aich='Ch0 Current')
+    LSF = LSurface.load('surface.npz')
+"""
+    def __init__(self, v, flow, mean, err, count=None):
+        self.v = np.asarray(v, dtype=float)
+        self.flow = np.asarray(flow, dtype=float)
+        self.mean = np.asarray(mean, dtype=float)
+        self.err = np.asarray(err, dtype=float)
+        shape = (self.flow.size, self.v.size)
+        if self.mean.shape != shape or self.err.shape != shape:
+            raise Exception('LSURFACE: MEAN and ERR must be (nflow, nv) arrays.')
+        if self.v.size < 2 or self.flow.size < 2:
+            raise Exception('LSURFACE: At least two voltages and two flow rates are required.')
+        if np.any(np.diff(self.v) <= 0) or np.any(np.diff(self.flow) <= 0):
+            raise Exception('LSURFACE: The grid must be strictly increasing.')
+        self.count = None if count is None else np.asarray(count)
+        self.meta = {}
+        # Flat copies for gathering the cell corners
+        self._mean = self.mean.ravel()
+        self._var = (self.err*self.err).ravel()
+        
+    def __repr__(self):
+        return '<LSurface %d voltages x %d flow rates>'%(self.v.size, self.flow.size)
+        
+    def __call__(self, v, flow, extrapolate=False):
+        v, flow = np.broadcast_arrays(np.asarray(v, dtype=float), 
+                np.asarray(flow, dtype=float))
+        shape = v.shape
+        v = v.ravel()
+        flow = flow.ravel()
+        nv = self.v.size
+        i = np.clip(np.searchsorted(self.v, v, side='right')-1, 0, nv-2)
+        j = np.clip(np.searchsorted(self.flow, flow, side='right')-1, 
+                0, self.flow.size-2)
+        tv = (v - self.v[i]) / (self.v[i+1] - self.v[i])
+        tf = (flow - self.flow[j]) / (self.flow[j+1] - self.flow[j])
+        k = j*nv + i
+        w00 = (1.-tv)*(1.-tf)
+        w01 = tv*(1.-tf)
+        w10 = (1.-tv)*tf
+        w11 = tv*tf
+        m = self._mean
+        out = w00*m[k] + w01*m[k+1] + w10*m[k+nv] + w11*m[k+nv+1]
+        s = self._var
+        err = np.sqrt(w00*w00*s[k] + w01*w01*s[k+1] + 
+                w10*w10*s[k+nv] + w11*w11*s[k+nv+1])
+        if not extrapolate:
+            outside = (tv < 0.) | (tv > 1.) | (tf < 0.) | (tf > 1.)
+            out[outside] = np.nan
+            err[outside] = np.nan
+        return out.reshape(shape), err.reshape(shape)
+        
+    def save(self, filename, **meta):
+        """Save the surface to a numpy .npz file"""
+        out = {'v':self.v, 'flow':self.flow, 'mean':self.mean, 'err':self.err,
+                'meta':json.dumps(meta)}
+        if self.count is not None:
+            out['count'] = self.count
+        with open(filename, 'wb') as ff:
+            np.savez(ff, **out)
+            
+    @classmethod
+    def load(cls, filename):
+        """Load a surface saved by save()
+    LSF = LSurface.load(filename)
+    
+The keyword arguments passed to save() are restored to the meta member.
+"""
+        with np.load(filename, allow_pickle=False) as src:
+            self = cls(src['v'], src['flow'], src['mean'], src['err'],
+                    src['count'] if 'count' in src else None)
+            self.meta = json.loads(str(src['meta']))
+        return self
+
+
+###
+# Multi-resolution summaries
+###
+
+class LPyramid:
+    """Multi-resolution min/max/sum summaries of a 2-D data array
+    PY = LPyramid(data, base=64)
+    
+DATA is an (nsample, nchannel) array.  Level k of the pyramid summarizes 
+blocks of BASE*2**k samples with the minimum, maximum, sum, sum of 
+squares, and count of each block in each channel.  The levels are built
+in a single vectorized pass, and together they occupy about 10/BASE times
+the memory of the data.
+
+    s = PY.stats(i0, i1)
+Returns a dictionary of the 'min', 'max', 'mean', 'std', 'sum', and 
+'count' of the samples with indices i0 <= i < i1.  Each is a 1-D array 
+with one element per channel (except 'count').  The range is decomposed
+into O(log N) aligned blocks.  Partial blocks at the ends of the range 
+are computed from the raw data when the pyramid has a reference to it, 
+so the results are exact.  Pyramids loaded from a file without the data
+include the whole partial blocks, so results are only exact when I0 and
+I1 fall on block boundaries.
+
+    index, ymin, ymax, ymean = PY.envelope(i0, i1, npoints)
+Returns block summaries between NPOINTS and 2*NPOINTS blocks covering 
+the range for plotting.  INDEX is the index at the center of each block.
+
+    PY.save(filename)
+    PY = LPyramid.load(filename, data=None)
+The pyramid is saved with numpy.savez.  Extra keyword arguments to save()
+are stored with it and are available in the meta dictionary when loaded.
+"""
+    def __init__(self, data=None, base=64):
+        self.base = int(base)
+        if self.base < 1 or self.base & (self.base-1):
+            raise Exception('LPYRAMID: The base block size must be a power of two.')
+        self.data = data
+        self.meta = {}
+        self.min = []
+        self.max = []
+        self.sum = []
+        self.sumsq = []
+        self.count = []
+        if data is None:
+            return
+        # Compact and segmented data are kept as they are and are read in 
+        # blocks, so they are never expanded all at once
+        if not isinstance(data, (LCompact, LSegments)):
+            data = np.asarray(data, dtype=float)
+            if data.ndim == 1:
+                data = data.reshape(-1,1)
+            self.data = data
+        self.n = data.shape[0]
+        
+        # The first level is built from the complete base blocks...
+        nb = self.n // self.base
+        step = self.base * max(1, 65536 // self.base)
+        ymin, ymax, ysum, ysumsq = [], [], [], []
+        for I0 in range(0, nb*self.base, step):
+            I1 = min(I0 + step, nb*self.base)
+            x = np.asarray(data[I0:I1], dtype=float)
+            blocks = x.reshape(-1, self.base, x.shape[1])
+            ymin.append(blocks.min(axis=1))
+            ymax.append(blocks.max(axis=1))
+            ysum.append(blocks.sum(axis=1))
+            ysumsq.append((blocks*blocks).sum(axis=1))
+        if not nb:
+            nch = data.shape[1]
+            ymin, ymax, ysum, ysumsq = [[np.zeros((0, nch))] for k in range(4)]
+        count = [np.full(nb, self.base)]
+        # ...and a partial block at the end
+        if self.n > nb*self.base:
+            tail = np.asarray(data[nb*self.base:], dtype=float)
+            ymin.append(tail.min(axis=0, keepdims=True))
+            ymax.append(tail.max(axis=0, keepdims=True))
+            ysum.append(tail.sum(axis=0, keepdims=True))
+            ysumsq.append((tail*tail).sum(axis=0, keepdims=True))
+            count.append(np.array([tail.shape[0]]))
+        self._add_level(np.concatenate(ymin), np.concatenate(ymax), 
+                np.concatenate(ysum), np.concatenate(ysumsq), 
+                np.concatenate(count))
+        # Each level is built from pairs of blocks in the one below
+        while self.count[-1].shape[0] > 1:
+            ymin, ymax, ysum, ysumsq, count = [self._pad(this[-1], value) 
+                    for this,value in ((self.min, np.inf), (self.max, -np.inf),
+                    (self.sum, 0.), (self.sumsq, 0.), (self.count, 0))]
+            self._add_level(np.minimum(ymin[0::2], ymin[1::2]),
+                    np.maximum(ymax[0::2], ymax[1::2]),
+                    ysum[0::2] + ysum[1::2], ysumsq[0::2] + ysumsq[1::2],
+                    count[0::2] + count[1::2])
+            
+    @staticmethod
+    def _pad(x, value):
+        """Pad an odd-length level with one neutral element"""
+        if x.shape[0] % 2:
+            return np.concatenate((x, np.full((1,)+x.shape[1:], value, dtype=x.dtype)))
+        return x
+        
+    def _add_level(self, ymin, ymax, ysum, ysumsq, count):
+        self.min.append(ymin)
+        self.max.append(ymax)
+        self.sum.append(ysum)
+        self.sumsq.append(ysumsq)
+        self.count.append(count)
+        
+    def nlevel(self):
+        """Return the number of levels in the pyramid"""
+        return len(self.count)
+        
+    def nbytes(self):
+        """Return the number of bytes occupied by the summaries"""
+        return sum([this.nbytes for level in (self.min, self.max, self.sum, 
+                self.sumsq, self.count) for this in level])
+        
+    def stats(self, i0=0, i1=None):
+        """Return the summary statistics for samples i0 <= i < i1"""
+        if i1 is None:
+            i1 = self.n
+        i0 = min(max(int(i0), 0), self.n)
+        i1 = min(max(int(i1), i0), self.n)
+        nch = self.min[0].shape[1]
+        ymin = np.full(nch, np.inf)
+        ymax = np.full(nch, -np.inf)
+        ysum = np.zeros(nch)
+        ysumsq = np.zeros(nch)
+        count = 0
+        
+        # The block range at the base level
+        if self.data is not None:
+            b0 = -(-i0 // self.base)
+            b1 = max(i1 // self.base, b0)
+            # Include the last partial block if the range covers it
+            if i1 == self.n and self.n % self.base:
+                b1 = self.count[0].shape[0]
+            # Partial blocks at the ends come from the raw data
+            edges = [(i0, min(b0*self.base, i1))]
+            if b1*self.base < i1:
+                edges.append((max(b1*self.base, b0*self.base, i0), i1))
+            for I0,I1 in edges:
+                if I1 > I0:
+                    x = self.data[I0:I1]
+                    ymin = np.minimum(ymin, x.min(axis=0))
+                    ymax = np.maximum(ymax, x.max(axis=0))
+                    ysum += x.sum(axis=0)
+                    ysumsq += (x*x).sum(axis=0)
+                    count += I1-I0
+        else:
+            b0 = i0 // self.base
+            b1 = -(-i1 // self.base)
+            
+        # Climb the pyramid, taking the unpaired blocks at each end
+        level = 0
+        while b0 < b1:
+            take = []
+            if b0 % 2:
+                take.append(b0)
+                b0 += 1
+            if b1 % 2 and b1 > b0:
+                take.append(b1-1)
+                b1 -= 1
+            if level == self.nlevel()-1 and b1 > b0:
+                take += list(range(b0, b1))
+                b1 = b0
+            for bb in take:
+                ymin = np.minimum(ymin, self.min[level][bb])
+                ymax = np.maximum(ymax, self.max[level][bb])
+                ysum += self.sum[level][bb]
+                ysumsq += self.sumsq[level][bb]
+                count += self.count[level][bb]
+            b0 //= 2
+            b1 //= 2
+            level += 1
+        
+        out = {'min':ymin, 'max':ymax, 'sum':ysum, 'count':count}
+        if count:
+            mean = ysum / count
+            out['mean'] = mean
+            out['std'] = np.sqrt(np.maximum(ysumsq/count - mean*mean, 0.))
+        else:
+            out['mean'] = np.full(nch, np.nan)
+            out['std'] = np.full(nch, np.nan)
+        return out
+        
+    def envelope(self, i0=0, i1=None, npoints=1000):
+        """Return block summaries for plotting the range i0 <= i < i1
+    index, ymin, ymax, ymean = envelope(i0, i1, npoints)
+"""
+        if i1 is None:
+            i1 = self.n
+        i0 = min(max(int(i0), 0), self.n)
+        i1 = min(max(int(i1), i0+1), self.n)
+        # The largest block size that still gives NPOINTS blocks
+        size = max((i1-i0) // max(int(npoints), 1), 1)
+        size = 1 << (size.bit_length()-1)
+        if size < self.base and self.data is not None:
+            # Use the raw data for blocks smaller than the base
+            starts = np.arange(i0 - i0 % size, i1, size)
+            x = self.data[starts[0]:i1]
+            rel = starts - starts[0]
+            ymin = np.minimum.reduceat(x, rel, axis=0)
+            ymax = np.maximum.reduceat(x, rel, axis=0)
+            count = np.diff(np.append(starts, i1))
+            ymean = np.add.reduceat(x, rel, axis=0) / count.reshape(-1,1)
+            return starts + count/2., ymin, ymax, ymean
+        level = min(max(size // self.base, 1).bit_length()-1, self.nlevel()-1)
+        size = self.base << level
+        j0 = i0 // size
+        j1 = -(-i1 // size)
+        count = self.count[level][j0:j1]
+        index = j0*size + np.arange(j1-j0)*size + count/2.
+        ymean = self.sum[level][j0:j1] / np.maximum(count, 1).reshape(-1,1)
+        return index, self.min[level][j0:j1], self.max[level][j0:j1], ymean
+        
+    def save(self, filename, **meta):
+        """Save the pyramid to a numpy .npz file"""
+        out = {'base':self.base, 'n':self.n, 'nlevel':self.nlevel(), 
+                'meta':json.dumps(meta)}
+        for level in range(self.nlevel()):
+            out['min%d'%level] = self.min[level]
+            out['max%d'%level] = self.max[level]
+            out['sum%d'%level] = self.sum[level]
+            out['sumsq%d'%level] = self.sumsq[level]
+            out['count%d'%level] = self.count[level]
+        with open(filename, 'wb') as ff:
+            np.savez(ff, **out)
+        
+    @classmethod
+    def load(cls, filename, data=None):
+        """Load a pyramid saved by save()
+    PY = LPyramid.load(filename, data=None)
+    
+If DATA is the array from which the pyramid was built, it is used to make
+range statistics exact.
+"""
+        with np.load(filename, allow_pickle=False) as src:
+            self = cls(base=int(src['base']))
+            self.n = int(src['n'])
+            self.meta = json.loads(str(src['meta']))
+            for level in range(int(src['nlevel'])):
+                self._add_level(src['min%d'%level], src['max%d'%level],
+                        src['sum%d'%level], src['sumsq%d'%level], 
+                        src['count%d'%level])
+        if data is not None:
+            # As in __init__, compact and segmented data are kept as they are
+            if not isinstance(data, (LCompact, LSegments)):
+                data = np.asarray(data)
+                if data.ndim == 1:
+                    data = data.reshape(-1,1)
+            self.data = data
+        return self
+
+
+###
+# Event-locked averaging
+###
+
+class LEpochMean:
+    """Streaming accumulator of the mean window around events
+    EM = LEpochMean(npre, npost)
+
+Blocks of data are added in order with the indices of the events they
+contain, and the window of samples i-npre through i+npost-1 around each
+event i is added to running sums as soon as it is complete.  Only the
+last npre+npost+1 rows are kept between blocks, so records of any length
+can be averaged.  LConf.get_epoch_mean() uses this class with
+iter_blocks(), and it may also be fed from an LFollow callback.
+    EM.add(index, data, events)
+    mean, std, count = EM.result()
+
+INDEX is the sample index of the first row of the 2-D DATA block, and
+EVENTS are sample indices.  Events may be added up to one sample late
+(in the block after the one that contains them).  Windows that begin
+before the first block or that are still incomplete when result() is
+called are not included; the dropped member counts the former.
+"""
+    def __init__(self, npre, npost):
+        self.npre = int(npre)
+        self.npost = int(npost)
+        self.sum = None
+        self.sumsq = None
+        self.count = 0
+        self.dropped = 0
+        self._tail = None
+        self._start = 0
+        self._pending = np.zeros(0, dtype=int)
+
+    def add(self, index, data, events=()):
+        """Add a block of data and the events it contains"""
+        data = np.asarray(data, dtype=float)
+        if data.ndim == 1:
+            data = data.reshape(-1,1)
+        L = self.npre + self.npost
+        if self.sum is None:
+            self.sum = np.zeros((L, data.shape[1]))
+            self.sumsq = np.zeros((L, data.shape[1]))
+        if self._tail is not None:
+            data = np.concatenate((self._tail, data))
+        else:
+            self._start = index
+        events = np.concatenate((self._pending,
+                np.asarray(events, dtype=int).reshape(-1)))
+        starts = events - self.npre - self._start
+        # Windows that begin before the retained rows can never be completed
+        early = starts < 0
+        self.dropped += int(early.sum())
+        done = ~early & (starts + L <= data.shape[0])
+        if done.any():
+            windows = np.lib.stride_tricks.sliding_window_view(data, L, axis=0)
+            # (nevent, nchannel, L) gathered in one step
+            these = windows[starts[done]]
+            self.sum += these.sum(axis=0).T
+            self.sumsq += (these*these).sum(axis=0).T
+            self.count += int(done.sum())
+        self._pending = events[~early & ~done]
+        # Keep enough rows for the pending windows and late events
+        keep = min(L + 1, data.shape[0])
+        self._tail = data[data.shape[0]-keep:].copy()
+        self._start += data.shape[0] - keep
+
+    def result(self):
+        """Return the mean, standard deviation, and count of the windows"""
+        if not self.count:
+            nch = 0 if self.sum is None else self.sum.shape[1]
+            nan = np.full((self.npre + self.npost, nch), np.nan)
+            return nan, nan.copy(), 0
+        mean = self.sum / self.count
+        var = np.maximum(self.sumsq / self.count - mean*mean, 0.)
+        return mean, np.sqrt(var), self.count
+
+
+###
+# Spike detection
+###
+
+class LSpikeDetector:
+    """Streaming spike detector with a rolling median and MAD
+    SD = LSpikeDetector(nwin=51, threshold=6.)
+    
+A sample is a spike when it differs from the median of the NWIN samples
+centered on it by more than THRESHOLD times the scaled median absolute 
+deviation (MAD) of those samples,
+    |x[i] - median| > threshold * 1.4826 * MAD
+For Gaussian noise, 1.4826 * MAD is the standard deviation, but unlike 
+the standard deviation, the median and MAD are not pulled toward the 
+spikes.  NWIN is rounded up to an odd number.  Samples within NWIN/2 of
+either end of the record are compared with the first or last full 
+window.
+
+Blocks of a channel are added in order.  The rolling statistics are 
+computed with sliding window views in vectorized batches, and the last 
+NWIN-1 samples are kept between blocks, so the result does not depend 
+on the block size.  LConf.get_spikes() uses this class, and it may also
+be fed from iter_blocks() or an LFollow callback.
+    spikes = SD.add(index, x)
+    ...
+    spikes = SD.finish()
+    
+INDEX is the sample index of the first element of the 1-D block X.  
+add() returns the indices of the spikes among the samples that can be 
+decided so far, and finish() returns those among the last NWIN/2 
+samples.
+"""
+    def __init__(self, nwin=51, threshold=6.):
+        self.nwin = int(nwin) | 1
+        self.threshold = threshold
+        self._half = self.nwin // 2
+        self._tail = np.zeros(0)
+        self._start = 0
+        self._last = None
+        
+    def _stats(self, x, nbatch=None):
+        """Return the rolling median and MAD of the full windows of X"""
+        N = x.size - self.nwin + 1
+        med = np.empty(N)
+        mad = np.empty(N)
+        windows = np.lib.stride_tricks.sliding_window_view(x, self.nwin)
+        # Limit the copies made by median() to a few megabytes
+        nbatch = max(1, 524288 // self.nwin) if nbatch is None else nbatch
+        for I0 in range(0, N, nbatch):
+            I1 = min(I0+nbatch, N)
+            these = windows[I0:I1]
+            med[I0:I1] = np.median(these, axis=1)
+            mad[I0:I1] = np.median(np.abs(these - med[I0:I1,None]), axis=1)
+        return med, mad
+        
+    def _test(self, x, med, mad):
+        """Return the indices of the spikes in X given the statistics of each sample"""
+        return np.flatnonzero(np.abs(x - med) > self.threshold * 1.4826 * mad)
+        
+    def add(self, index, x):
+        """Add a block of samples and return the indices of the spikes found"""
+        x = np.asarray(x, dtype=float).reshape(-1)
+        if not self._tail.size:
+            self._start = index
+        x = np.concatenate((self._tail, x))
+        h = self._half
+        if x.size < self.nwin:
+            self._tail = x
+            return np.zeros(0, dtype=int)
+        med, mad = self._stats(x)
+        # The first samples are compared with the first full window
+        lo = h
+        if self._last is None:
+            lo = 0
+            med = np.concatenate((np.full(h, med[0]), med))
+            mad = np.concatenate((np.full(h, mad[0]), mad))
+        hi = x.size - h
+        spikes = self._test(x[lo:hi], med, mad) + (lo + self._start)
+        self._last = (med[-1], mad[-1])
+        self._tail = x[x.size - 2*h:]
+        self._start += x.size - 2*h
+        return spikes
+        
+    def finish(self):
+        """Return the indices of the spikes among the last samples"""
+        x = self._tail
+        if not x.size:
+            return np.zeros(0, dtype=int)
+        if self._last is None:
+            # The record was shorter than one window
+            med = np.median(x)
+            mad = np.median(np.abs(x - med))
+            lo = 0
+        else:
+            med, mad = self._last
+            lo = self._half
+        spikes = self._test(x[lo:], med, mad) + (lo + self._start)
+        self._tail = np.zeros(0)
+        return spikes
+
+
+###
+# Sharing between processes
+###
+
+def _encode_config(devconf):
+    """Serialize a _devconf list to JSON with LEnum values as objects"""
+    def default(value):
+        if isinstance(value, LEnum):
+            return {'__lenum__':[value._strings, value._values, value._state]}
+        raise TypeError('Cannot serialize %s'%repr(value))
+    return json.dumps(devconf, default=default)
+
+
+def _decode_config(text):
+    """Rebuild a _devconf list from _encode_config() JSON"""
+    def hook(value):
+        if '__lenum__' in value:
+            strings, values, state = value['__lenum__']
+            return LEnum(strings, values=values, state=state)
+        return value
+    return json.loads(text, object_hook=hook)
+
+
+# Shared memory segments attached by this process, keyed by name.  Views
+# made with np.ndarray(buffer=...) do not keep a segment mapped, so each 
+# one stays open until the process exits.
+_SEGMENTS = {}
+
+class LShared:
+    """Handle to LConf data in shared memory or a memory-mapped file
+    handle = LC.share()
+    handle = LC.share('path/to/arrays.bin')
+
+The handle holds only the JSON configuration, the name of the shared
+memory segment (or the path of the file), and the layout of the arrays,
+so it pickles in microseconds regardless of the size of the data.
+Workers call attach() to get an LConf object whose data, time, and
+didata members are read-only views of the shared buffer; the arrays are
+never copied.
+    def work(handle, aich):
+        LC = handle.attach()
+        return LC.get_channel(aich).std()
+    with LC.share() as handle:
+        with ProcessPoolExecutor() as pool:
+            out = list(pool.map(work, [handle]*4, range(4)))
+
+The process that created the handle owns the segment and must release
+it with unlink() (or use the handle as a context manager) once the
+workers are finished.  Memory-mapped files are removed by unlink() too,
+but they otherwise remain on disk and can be attached by any process
+that has the handle.  A process that attaches a segment keeps it mapped
+until it exits, so views of the data remain valid after the attached 
+LConf object is gone.
+"""
+    def __init__(self, config, layout, attrs, name=None, filename=None):
+        self.config = config
+        self.layout = layout
+        self.attrs = attrs
+        self.name = name
+        self.filename = filename
+        # The process that created the segment
+        self.pid = os.getpid()
+        self._shm = None
+
+    @classmethod
+    def _create(cls, config, arrays, attrs, filename=None):
+        """Copy arrays into a new buffer and return its handle"""
+        layout = {}
+        size = 0
+        for key, value in arrays.items():
+            if not isinstance(value, LSegments):
+                value = np.asarray(value)
+            # Align each array to a cache line
+            size = (size + 63) // 64 * 64
+            layout[key] = (size, value.shape, np.dtype(value.dtype).str)
+            size += int(np.prod(value.shape)) * np.dtype(value.dtype).itemsize
+        size = max(size, 1)
+        if filename is None:
+            from multiprocessing import shared_memory
+            shm = shared_memory.SharedMemory(create=True, size=size)
+            self = cls(config, layout, attrs, name=shm.name)
+            self._shm = shm
+            buf = shm.buf
+        else:
+            filename = os.path.abspath(filename)
+            buf = np.memmap(filename, dtype=np.uint8, mode='w+', shape=(size,))
+            self = cls(config, layout, attrs, filename=filename)
+        for key, (offset, shape, dtype) in layout.items():
+            target = np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+            value = arrays[key]
+            if isinstance(value, LSegments):
+                # Concatenated records are copied one file at a time
+                bounds = value.bounds
+                for k in range(len(bounds)-1):
+                    target[bounds[k]:bounds[k+1]] = value[bounds[k]:bounds[k+1]]
+            else:
+                target[...] = value
+        if filename is not None:
+            buf.flush()
+            del buf
+        return self
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_shm'] = None
+        return state
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.unlink()
+
+    def __repr__(self):
+        return '<LShared %s>'%(self.name or self.filename)
+
+    def _buffer(self):
+        """Return a buffer on the shared data and the object that keeps it open"""
+        if self.filename is not None:
+            buf = np.memmap(self.filename, dtype=np.uint8, mode='r')
+            return buf, buf
+        shm = _SEGMENTS.get(self.name)
+        if shm is not None:
+            return shm.buf, shm
+        import multiprocessing
+        from multiprocessing import shared_memory, resource_tracker
+        try:
+            shm = shared_memory.SharedMemory(name=self.name, track=False)
+        except TypeError:
+            # Before Python 3.13, attaching registers the segment with the
+            # resource tracker, which unlinks it when the tracker exits.
+            # The owner and the processes it started share one tracker, 
+            # where the segment is already registered, but any other 
+            # process has a tracker of its own that must forget it.
+            parent = multiprocessing.parent_process()
+            shared = os.getpid() == self.pid or \
+                    (parent is not None and parent.pid == self.pid)
+            shm = shared_memory.SharedMemory(name=self.name)
+            if not shared:
+                resource_tracker.unregister(shm._name, 'shared_memory')
+        _SEGMENTS[self.name] = shm
+        return shm.buf, shm
+
+    def attach(self):
+        """Return an LConf object with views of the shared arrays"""
+        buf, keep = self._buffer()
+        arrays = {}
+        for key, (offset, shape, dtype) in self.layout.items():
+            value = np.ndarray(tuple(shape), dtype=dtype, buffer=buf, offset=offset)
+            value.flags.writeable = False
+            arrays[key] = value
+
+        conf = LConf.__new__(LConf)
+        conf._init_members(self.attrs['filename'], dibits=self.attrs['dibits'],
+                cal=self.attrs['cal'])
+        conf._devconf = _decode_config(self.config)
+        conf.timestamp = self.attrs['timestamp']
+        conf._offset = self.attrs['offset']
+        if 'scale' in self.attrs:
+            conf.data = LCompact(arrays['data'], self.attrs['scale'],
+                    self.attrs['zero'])
+        else:
+            conf.data = arrays['data']
+        conf.time = arrays.get('time')
+        if 'din' in self.attrs:
+            conf.didata = LTransitions(arrays['distarts'], arrays['divalues'],
+                    self.attrs['din'], dibits=self.attrs['dibits'])
+        else:
+            conf.didata = arrays.get('didata')
+        # The views are only valid while the buffer is open
+        conf._shared = keep
+        return conf
+
+    def unlink(self):
+        """Release the shared memory segment or remove the mapped file"""
+        if self.filename is not None:
+            if os.path.exists(self.filename):
+                os.remove(self.filename)
+            return
+        if self._shm is None:
+            raise Exception('LSHARED: Only the process that created the segment can unlink it.')
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+
+###
+# Signal conditioning
+###
+
+def _sosfilt(sos, x, zi):
+    """Apply a cascade of second-order sections along the first axis
+    y, zf = _sosfilt(sos, x, zi)
+
+SOS is an (nsection, 6) array of [b0, b1, b2, 1, a1, a2] coefficients, X
+is a 2-D (nsample, nchannel) array, and ZI is the (nsection, 2, nchannel)
+transposed direct form II state.  scipy.signal.sosfilt is used when it is
+available; otherwise, the filter is applied one sample at a time with all
+channels processed together.
+"""
+    try:
+        from scipy.signal import sosfilt
+    except ImportError:
+        sosfilt = None
+    if sosfilt is not None:
+        return sosfilt(sos, x, axis=0, zi=zi)
+    
+    y = np.array(x, dtype=float)
+    zi = np.array(zi, dtype=float)
+    for ss in range(sos.shape[0]):
+        b0, b1, b2, a0, a1, a2 = sos[ss]
+        z = zi[ss]
+        for index in range(y.shape[0]):
+            xx = y[index].copy()
+            y[index] = b0*xx + z[0]
+            z[0] = b1*xx - a1*y[index] + z[1]
+            z[1] = b2*xx - a2*y[index]
+    return y, zi
+
+
+def _sos_zi(sos, x0):
+    """Return the steady-state filter state for a constant input X0
+    zi = _sos_zi(sos, x0)
+    
+X0 is a 1-D array with one value per channel.  Starting from this state
+eliminates the transient that would result from an initial step.
+"""
+    zi = np.zeros((sos.shape[0], 2, x0.shape[0]))
+    x = np.asarray(x0, dtype=float)
+    for ss in range(sos.shape[0]):
+        b0, b1, b2, a0, a1, a2 = sos[ss]
+        y = x * (b0+b1+b2) / (1.+a1+a2)
+        zi[ss,1] = b2*x - a2*y
+        zi[ss,0] = b1*x - a1*y + zi[ss,1]
+        x = y
+    return zi
+
+
+def _fir_lowpass(fc, samplehz, ntaps):
+    """Design a Hamming-windowed sinc low-pass FIR filter with unity DC gain"""
+    if ntaps < 1 or not ntaps%2:
+        raise Exception('LCONF: The number of FIR taps must be a positive odd integer: %s'%repr(ntaps))
+    if fc <= 0 or fc >= samplehz/2.:
+        raise Exception('LCONF: The cutoff frequency must be between 0 and %f Hz'%(samplehz/2.))
+    n = np.arange(ntaps) - (ntaps-1)/2.
+    h = np.sinc(2.*fc/samplehz * n) * np.hamming(ntaps)
+    return h / h.sum()
+
+
+class LStage:
+    """Signal conditioning stage prototype
+
+Stages are the building blocks of an LPipeline.  Each stage operates on
+2-D (nsample, nchannel) arrays so that all channels are processed in a
+single vectorized operation.  Stages are defined by their parameters, so
+they may be shared between pipelines and LConf objects, while the filter 
+state is created by init() and is passed explicitly to apply().  This 
+allows a stage to process a long record in a series of blocks with the 
+result that would have been obtained by processing it all at once.
+
+    state = stage.init(samplehz, x0)
+    y, state = stage.apply(x, state)
+
+SAMPLEHZ is the sample rate of the data entering the stage, and X0 is a 
+1-D array of the first sample in each channel.  The rate() method returns
+the sample rate of the data leaving the stage.  The key() method returns 
+a hashable tuple that uniquely identifies the stage and its parameters.
+"""
+    def key(self):
+        return (self.__class__.__name__,)
+        
+    def rate(self, samplehz):
+        return samplehz
+        
+    def init(self, samplehz, x0):
+        return None
+        
+    def apply(self, x, state):
+        return x, state
+        
+    def __repr__(self):
+        return '%s%s'%(self.__class__.__name__, repr(self.key()[1:]))
+
+
+class LFIR(LStage):
+    """Finite impulse response filter stage
+    S = LFIR(h)
+
+H is the array of filter coefficients.  The first samples are handled as 
+if the first value had been constant for all time, so there is no start-
+up transient.  Like all causal filters, the output is delayed by 
+(len(h)-1)/2 samples for symmetric coefficients.
+"""
+    def __init__(self, h):
+        self.h = np.array(h, dtype=float)
+        
+    def key(self):
+        return (self.__class__.__name__, tuple(self.h))
+        
+    def taps(self, samplehz):
+        return self.h
+        
+    def init(self, samplehz, x0):
+        h = self.taps(samplehz)
+        # The history of the last len(h)-1 samples
+        return (h, np.repeat(np.reshape(x0, (1,-1)), h.size-1, axis=0))
+        
+    def apply(self, x, state):
+        h, history = state
+        xx = np.concatenate((history, x), axis=0)
+        # Windows are a strided view; the dot product is vectorized 
+        y = np.lib.stride_tricks.sliding_window_view(xx, h.size, axis=0) @ h[::-1]
+        return y, (h, xx[xx.shape[0]-h.size+1:])
+
+
+class LMovingAverage(LFIR):
+    """Moving average filter stage
+    S = LMovingAverage(n)
+    
+N is the integer number of samples to average.
+"""
+    def __init__(self, n):
+        self.n = int(n)
+        self.h = np.ones(self.n)/self.n
+        
+    def key(self):
+        return (self.__class__.__name__, self.n)
+
+
+class LLowpass(LFIR):
+    """Windowed-sinc FIR low-pass filter stage
+    S = LLowpass(fc, ntaps=101)
+    
+FC is the cutoff frequency in Hz.  NTAPS is the odd integer number of 
+filter coefficients.
+"""
+    def __init__(self, fc, ntaps=101):
+        self.fc = float(fc)
+        self.ntaps = int(ntaps)
+        
+    def key(self):
+        return (self.__class__.__name__, self.fc, self.ntaps)
+        
+    def taps(self, samplehz):
+        return _fir_lowpass(self.fc, samplehz, self.ntaps)
+
+
+class LIIR(LStage):
+    """Infinite impulse response filter stage built of second-order sections
+    S = LIIR(sos)
+    
+SOS is an (nsection, 6) array of [b0, b1, b2, a0, a1, a2] coefficients 
+with a0 = 1.  When SciPy is available, scipy.signal.sosfilt is used.
+"""
+    def __init__(self, sos):
+        self.sos = np.array(sos, dtype=float).reshape(-1,6)
+        
+    def key(self):
+        return (self.__class__.__name__, tuple(self.sos.ravel()))
+        
+    def design(self, samplehz):
+        return self.sos
+        
+    def init(self, samplehz, x0):
+        sos = self.design(samplehz)
+        return (sos, _sos_zi(sos, x0))
+        
+    def apply(self, x, state):
+        sos, zi = state
+        y, zi = _sosfilt(sos, x, zi)
+        return y, (sos, zi)
+
+
+class LButter(LIIR):
+    """Butterworth IIR low-pass filter stage
+    S = LButter(fc, order=2)
+    
+FC is the -3dB cutoff frequency in Hz, and ORDER is the integer filter
+order.  The filter is designed by the bilinear transform with the cutoff
+frequency pre-warped.
+"""
+    def __init__(self, fc, order=2):
+        self.fc = float(fc)
+        self.order = int(order)
+        
+    def key(self):
+        return (self.__class__.__name__, self.fc, self.order)
+        
+    def design(self, samplehz):
+        if self.fc <= 0 or self.fc >= samplehz/2.:
+            raise Exception('LBUTTER: The cutoff frequency must be between 0 and %f Hz'%(samplehz/2.))
+        w0 = 2*np.pi*self.fc/samplehz
+        sos = []
+        # One section per complex pole pair
+        for k in range(1, self.order//2+1):
+            Q = 1./(2.*np.cos((self.order-2*k+1)*np.pi/(2*self.order)))
+            alpha = np.sin(w0)/(2*Q)
+            c = np.cos(w0)
+            a0 = 1. + alpha
+            sos.append([(1-c)/2/a0, (1-c)/a0, (1-c)/2/a0, 1., -2*c/a0, (1-alpha)/a0])
+        # A first-order section for odd orders
+        if self.order%2:
+            K = np.tan(w0/2)
+            sos.append([K/(1+K), K/(1+K), 0., 1., (K-1)/(K+1), 0.])
+        return np.array(sos)
+
+
+class LNotch(LIIR):
+    """Notch filter stage for rejecting mains interference
+    S = LNotch(f0=60., q=30., harmonics=1)
+
+F0 is the frequency to reject in Hz, and Q is the quality factor (the 
+ratio of F0 to the rejected bandwidth).  If HARMONICS is greater than 1,
+a notch is also placed at each integer multiple of F0 up to HARMONICS*F0
+that is below the Nyquist frequency.
+"""
+    def __init__(self, f0=60., q=30., harmonics=1):
+        self.f0 = float(f0)
+        self.q = float(q)
+        self.harmonics = int(harmonics)
+        
+    def key(self):
+        return (self.__class__.__name__, self.f0, self.q, self.harmonics)
+        
+    def design(self, samplehz):
+        if self.f0 <= 0 or self.f0 >= samplehz/2.:
+            raise Exception('LNOTCH: The notch frequency must be between 0 and %f Hz'%(samplehz/2.))
+        sos = []
+        for k in range(1, self.harmonics+1):
+            if k*self.f0 >= samplehz/2.:
+                break
+            w0 = 2*np.pi*k*self.f0/samplehz
+            alpha = np.sin(w0)/(2*self.q)
+            c = np.cos(w0)
+            a0 = 1. + alpha
+            sos.append([1./a0, -2*c/a0, 1./a0, 1., -2*c/a0, (1-alpha)/a0])
+        return np.array(sos)
+
+
+class LDetrend(LStage):
+    """Detrend stage
+    S = LDetrend(kind='linear')
+    
+KIND is 'linear' to remove a least-squares line from each channel or 
+'constant' to remove the mean.  The trend is that of the whole record,
+so this stage cannot be applied block-by-block; an exception is raised
+if a second block is processed with the same state.
+"""
+    def __init__(self, kind='linear'):
+        if kind not in ('linear', 'constant'):
+            raise Exception('LDETREND: Unrecognized kind: %s'%repr(kind))
+        self.kind = kind
+        
+    def key(self):
+        return (self.__class__.__name__, self.kind)
+        
+    def init(self, samplehz, x0):
+        # Whether a block has already been processed
+        return False
+        
+    def apply(self, x, state):
+        if state:
+            raise Exception('LDETREND: The whole record is needed to detrend it, so it cannot be processed block-by-block.')
+        y = x - x.mean(axis=0)
+        if self.kind == 'linear' and x.shape[0] > 1:
+            t = np.arange(x.shape[0]) - (x.shape[0]-1)/2.
+            y -= np.outer(t, t @ y / (t @ t))
+        return y, True
+
+
+class LDecimate(LStage):
+    """Anti-aliased decimation stage
+    S = LDecimate(q, ntaps=None)
+    
+Q is the integer decimation factor.  The data are first passed through a
+windowed-sinc FIR low-pass filter with a cutoff at 80% of the new Nyquist
+frequency, and then every Qth sample is retained.  NTAPS defaults to 
+20*Q+1.  The retained samples are always those with indices 0, Q, 2Q, ... 
+in the original record, even when the data are processed in blocks.
+"""
+    def __init__(self, q, ntaps=None):
+        self.q = int(q)
+        if self.q < 1:
+            raise Exception('LDECIMATE: The decimation factor must be a positive integer.')
+        self.ntaps = int(ntaps) if ntaps else 20*self.q+1
+        
+    def key(self):
+        return (self.__class__.__name__, self.q, self.ntaps)
+        
+    def rate(self, samplehz):
+        return samplehz / self.q
+        
+    def init(self, samplehz, x0):
+        fir = LFIR(_fir_lowpass(0.4*samplehz/self.q, samplehz, self.ntaps))
+        return (fir, fir.init(samplehz, x0), 0)
+        
+    def apply(self, x, state):
+        fir, fstate, phase = state
+        y, fstate = fir.apply(x, fstate)
+        y = y[phase::self.q]
+        phase = (phase - x.shape[0]) % self.q
+        return y, (fir, fstate, phase)
+
+
+class LPipeline:
+    """A sequence of signal conditioning stages
+    P = LPipeline(stage1, stage2, ...)
+    
+For example, to remove 60Hz mains noise, low-pass filter, and decimate 
+from 1kHz to 100Hz,
+    P = LPipeline(LNotch(60.), LButter(40., order=4), LDecimate(10))
+    
+The pipeline can be applied to an entire 2-D (nsample, nchannel) array
+    y = P.apply(x, samplehz)
+    
+or it can be applied block-by-block with the filter states carried from
+one block to the next.  The result is the same as applying it all at once.
+The exception is LDetrend, which needs the whole record and raises an 
+exception when it is given a second block.
+    state = P.init(samplehz, x[0])
+    y0 = P.process(x[:1000], state)
+    y1 = P.process(x[1000:], state)
+    
+LConf.filter_data(), LConf.get_filtered(), and LConf.iter_filtered() 
+apply pipelines to the data in an LConf object.
+"""
+    def __init__(self, *stages):
+        for this in stages:
+            if not isinstance(this, LStage):
+                raise Exception('LPIPELINE: Stages must be LStage instances: %s'%repr(this))
+        self.stages = list(stages)
+        
+    def __repr__(self):
+        return 'LPipeline(' + ', '.join([repr(this) for this in self.stages]) + ')'
+        
+    def key(self):
+        """Return a hashable tuple that identifies the pipeline"""
+        return tuple([this.key() for this in self.stages])
+        
+    def decimation(self):
+        """Return the ratio of the input to output sample rates"""
+        q = 1
+        for this in self.stages:
+            if isinstance(this, LDecimate):
+                q *= this.q
+        return q
+        
+    def init(self, samplehz, x0):
+        """Create the filter state list for data starting with sample X0"""
+        state = []
+        x0 = np.asarray(x0, dtype=float)
+        for this in self.stages:
+            state.append(this.init(samplehz, x0))
+            # Each stage starts from the steady output of the one before it
+            y0, _ = this.apply(x0.reshape(1,-1), this.init(samplehz, x0))
+            if y0.shape[0]:
+                x0 = y0[0].reshape(x0.shape)
+            samplehz = this.rate(samplehz)
+        return state
+        
+    def process(self, x, state):
+        """Process a block of data and update the STATE list in-place"""
+        y = np.asarray(x, dtype=float)
+        if y.ndim == 1:
+            return self.process(y.reshape(-1,1), state)[:,0]
+        for index in range(len(self.stages)):
+            if y.shape[0] == 0:
+                break
+            y, state[index] = self.stages[index].apply(y, state[index])
+        return y
+        
+    def apply(self, x, samplehz):
+        """Apply the pipeline to an entire 1-D or 2-D array"""
+        x = np.asarray(x, dtype=float)
+        if x.shape[0] == 0:
+            return x.copy()
+        return self.process(x, self.init(samplehz, np.atleast_1d(x[0])))
+
+
+def _header_ready(filename):
+    """Test whether the configuration and timestamp have been written to a file"""
+    try:
+        with open(filename, 'rb') as ff:
+            head = ff.read(65536)
+    except FileNotFoundError:
+        return False
+    # The ## must be followed by the end of its line and the timestamp line
+    index = 0 if head.startswith(b'##') else head.find(b'\n##')
+    return index >= 0 and head.count(b'\n', index+1) >= 2
+
+
+class LFollow(LConf):
+    """Follow an LConfig data file while it is still being written
+    LF = LFollow('path/to/data.dat', dibits=False, cal=True)
+
+The configuration header is parsed once (waiting for it to be written if
+necessary), and afterward, each call to update() reads only the rows that
+have been appended to the file since the previous call.  Complete rows are
+converted and calibrated exactly as LConf would and are appended to a
+growable buffer.  The data, didata, and time members are views into that
+buffer, so all of the LConf methods (get_channel, show_channel, 
+get_events, ...) reflect everything that has been read so far.
+    n = LF.update()     # Returns the number of new samples
+
+Callbacks can be registered to be called with each new block of data
+    LF.add_callback(fn)
+    fn(LF, index, data, didata)
+INDEX is the sample index of the first row in the new block.  DATA and 
+DIDATA are views of the new rows.  DIDATA is None unless digital input 
+streaming was active.
+
+The follow() generator polls the file and yields the new blocks as 
+(index, data, didata) tuples.  The afollow() asynchronous generator does 
+the same from an asyncio event loop; file reads and parsing are done in 
+the loop's default executor, so the loop is never blocked.
+    for index, data, didata in LF.follow(interval=0.1, timeout=5.):
+        ...
+    async for index, data, didata in LF.afollow(interval=0.1, timeout=5.):
+        ...
+When used with afollow(), callbacks are called from the executor thread.
+
+MAXLEN
+If MAXLEN is an integer, only the most recent MAXLEN samples are retained.
+The offset member is the sample index of the first retained sample, so 
+time values are always measured from the start of the file, and the 
+START and STOP times passed to the get_ methods are still absolute.
+
+TIMEOUT, INTERVAL
+The time in seconds to wait for the configuration header to appear and 
+the interval between polls.  If TIMEOUT is None, wait forever.
+"""
+    def __init__(self, filename, dibits=False, cal=True, maxlen=None,
+            timeout=None, interval=0.1):
+        # Wait for the configuration and the timestamp to be written
+        t0 = time.time()
+        while not _header_ready(filename):
+            if timeout is not None and time.time()-t0 > timeout:
+                raise Exception('LFOLLOW: Timed out waiting for the configuration in %s'%filename)
+            time.sleep(interval)
+            
+        LConf.__init__(self, filename, data=False, dibits=dibits, cal=cal)
+        if self._offset is None:
+            raise Exception('LFOLLOW: Expected ## before data in %s'%filename)
+            
+        self.maxlen = maxlen
+        self.offset = 0
+        self._callbacks = []
+        # The buffers hold _n rows starting at row _start
+        self._start = 0
+        self._n = 0
+        self._buffer = np.zeros((0, self.naich(0)))
+        self._tbuffer = np.zeros((0,))
+        self._dibuffer = None
+        if self.get(0,'distream'):
+            if dibits:
+                self._dibuffer = np.zeros((0,16), dtype=bool)
+            else:
+                self._dibuffer = np.zeros((0,1), dtype=int)
+        self._set_views()
+        
+    def _set_views(self):
+        """Point the data, didata, and time members at the buffers"""
+        I0 = self._start
+        I1 = self._start + self._n
+        self.data = self._buffer[I0:I1]
+        self.time = self._tbuffer[I0:I1]
+        if self._dibuffer is not None:
+            self.didata = self._dibuffer[I0:I1]
+        
+    def _append(self, data, didata):
+        """Append converted rows to the buffers, growing them as needed
+    index = _append(data, didata)
+    
+Returns the sample index of the first row appended.
+"""
+        N = data.shape[0]
+        # Discard the oldest rows in ring mode
+        if self.maxlen is not None and self._n + N > self.maxlen:
+            drop = self._n + N - self.maxlen
+            old = min(drop, self._n)
+            self._start += old
+            self._n -= old
+            self.offset += old
+            # If the new block alone is longer than maxlen
+            if drop > old:
+                data = data[drop-old:]
+                if didata is not None:
+                    didata = didata[drop-old:]
+                self.offset += drop-old
+                N = data.shape[0]
+        
+        index = self.offset + self._n
+        # Is there room at the end of the buffers?
+        if self._start + self._n + N > self._buffer.shape[0]:
+            size = max(2*(self._n + N), 1024)
+            if self.maxlen is not None:
+                size = min(size, max(2*self.maxlen, 1024))
+            I0 = self._start
+            I1 = self._start + self._n
+            buffer = np.empty((size, self._buffer.shape[1]), dtype=self._buffer.dtype)
+            buffer[:self._n] = self._buffer[I0:I1]
+            self._buffer = buffer
+            buffer = np.empty((size,), dtype=self._tbuffer.dtype)
+            buffer[:self._n] = self._tbuffer[I0:I1]
+            self._tbuffer = buffer
+            if self._dibuffer is not None:
+                buffer = np.empty((size, self._dibuffer.shape[1]), dtype=self._dibuffer.dtype)
+                buffer[:self._n] = self._dibuffer[I0:I1]
+                self._dibuffer = buffer
+            self._start = 0
+        
+        I0 = self._start + self._n
+        I1 = I0 + N
+        self._buffer[I0:I1] = data
+        self._tbuffer[I0:I1] = np.arange(index, index+N) * (1./self.get(0, 'samplehz'))
+        if self._dibuffer is not None:
+            self._dibuffer[I0:I1] = didata
+        self._n += N
+        self._set_views()
+        # Windows and derived data depend on the length of the data
+        self.clear_cache()
+        return index
+        
+    def _get_index(self, time):
+        """Get the index closest to the time specified"""
+        index = int(np.round(time*self.get(0,'samplehz'))) - self.offset
+        # Clamp the values based on the data size
+        return min(max(index, 0), self.ndata()-1)
+
+    def _get_bound(self, time):
+        """Get the exclusive upper index for the time specified"""
+        index = int(np.round(time*self.get(0,'samplehz'))) - self.offset
+        return min(max(index, 0), self.ndata())
+
+    def add_callback(self, fn):
+        """Register a function to be called with each new block of data
+    add_callback(fn)
+    fn(LF, index, data, didata)
+"""
+        self._callbacks.append(fn)
+        
+    def remove_callback(self, fn):
+        """Remove a function registered with add_callback()"""
+        self._callbacks.remove(fn)
+
+    def update(self):
+        """Read the rows appended to the file since the last update
+    n = update()
+    
+Only complete lines are read; a partially written row is left for the 
+next update.  Returns the number of new samples, and calls each of the 
+registered callbacks if there were any.
+"""
+        with open(self.filename, 'rb') as ff:
+            ff.seek(self._offset)
+            chunk = ff.read()
+        last = chunk.rfind(b'\n') + 1
+        if not chunk[:last].strip():
+            self._offset += last
+            return 0
+        self._offset += last
+        
+        data, didata = self._convert_block(self._parse(chunk[:last]))
+        index = self._append(data, didata)
+        # The retained part of the new block
+        N = self.offset + self._n - index
+        didata = None if self.didata is None else self.didata[-N:]
+        for fn in self._callbacks:
+            fn(self, index, self.data[-N:], didata)
+        return N
+        
+    def _last_block(self, N):
+        """Return the (index, data, didata) tuple for the last N samples"""
+        didata = None if self.didata is None else self.didata[-N:]
+        return self.offset + self._n - N, self.data[-N:], didata
+
+    def follow(self, interval=0.1, timeout=None):
+        """Poll the file and yield new blocks of data as they are written
+    for index, data, didata in follow(interval=0.1, timeout=None):
+        ...
+        
+INTERVAL is the time in seconds between polls when no new data are found.
+The generator stops when no new data have been written for TIMEOUT 
+seconds.  If TIMEOUT is None, it never stops.
+"""
+        t0 = time.time()
+        while True:
+            N = self.update()
+            if N:
+                yield self._last_block(N)
+                t0 = time.time()
+            elif timeout is not None and time.time()-t0 > timeout:
+                return
+            else:
+                time.sleep(interval)
+
+    async def afollow(self, interval=0.1, timeout=None):
+        """Asynchronous version of follow()
+    async for index, data, didata in afollow(interval=0.1, timeout=None):
+        ...
+"""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        while True:
+            N = await loop.run_in_executor(None, self.update)
+            if N:
+                yield self._last_block(N)
+                t0 = loop.time()
+            elif timeout is not None and loop.time()-t0 > timeout:
+                return
+            else:
+                await asyncio.sleep(interval)
+
+
+###
+# Concatenated records
+###
+
+def _count_rows(filename, offset, nbyte=1048576):
+    """Count the data rows in a file from the byte offset of the first row
+    
+Blank lines are skipped, as they are by _parse_rows().
+"""
+    count = 0
+    tail = b''
+    with open(filename, 'rb') as ff:
+        ff.seek(offset)
+        chunk = ff.read(nbyte)
+        while chunk:
+            # Lines are only counted once they are complete
+            chunk = tail + chunk
+            cut = chunk.rfind(b'\n') + 1
+            tail = chunk[cut:]
+            count += sum([1 for line in chunk[:cut].split(b'\n') if line.strip()])
+            chunk = ff.read(nbyte)
+    # A final row without a line ending
+    if tail.strip():
+        count += 1
+    return count
+
+
+class LConcat(LConf):
+    """A continuous record made from several data files
+    LC = LConcat(['run_a.dat', 'run_b.dat', ...], dibits=False, cal=True,
+            maxfiles=4)
+
+Long captures that were split into consecutive files with identical 
+configurations are treated as one record.  Only the headers are parsed 
+when the LConcat object is created, and the rows in each file are 
+counted without being parsed.  The files must agree on the sample rate,
+the digital input stream, and the number, labels, ranges, and 
+calibrations of the analog inputs; otherwise an exception is raised.
+LConf objects may be given in place of file names, and their data are
+used without reading the file again if they are loaded.
+
+The data and didata members are LSegments objects, so get_channel(), 
+get_time(), get_events(), and the other LConf methods see one 
+continuous record, and events that span the boundaries between files 
+are found.  Each file is read only when some of its rows are requested,
+and up to MAXFILES loaded files are kept in a least-recently-used cache.
+    LC.get_channel(0, start=595., stop=605.)   # Reads at most two files
+    LC.get_events('Ch0 Voltage', edge='rising')
+    LC.files_info()
+
+The configuration, meta parameters, and timestamp are those of the first
+file.  iter_blocks() streams through the files in order.
+"""
+    def __init__(self, filenames, dibits=False, cal=True, cache=128,
+            maxfiles=4):
+        self.parts = []
+        for this in filenames:
+            if not isinstance(this, LConf):
+                this = LConf(this, dibits=dibits, cal=cal)
+            elif bool(this.cal) != bool(cal) or bool(this.dibits) != bool(dibits):
+                raise Exception('LCONCAT: %s was loaded with different cal or dibits settings.'%this.filename)
+            if this._offset is None:
+                raise Exception('LCONCAT: %s does not appear to contain data.'%this.filename)
+            self.parts.append(this)
+        if not self.parts:
+            raise Exception('LCONCAT: No files were specified.')
+        first = self.parts[0]
+        for this in self.parts[1:]:
+            problem = self._compare(first, this)
+            if problem:
+                raise Exception('LCONCAT: %s is not compatible with %s: %s differs.'%(
+                        this.filename, first.filename, problem))
+                        
+        self._init_members(first.filename, dibits=dibits, cal=cal, cache=cache)
+        self._devconf = first._devconf
+        self.timestamp = first.timestamp
+        self.filenames = [this.filename for this in self.parts]
+        self._offset = first._offset
+        self._files = LCache(maxsize=maxfiles)
+        self._time = None
+        
+        self.counts = np.array([this.ndata() if this.data is not None else 
+                _count_rows(this.filename, this._offset) 
+                for this in self.parts], dtype=int)
+        bounds = np.concatenate(([0], np.cumsum(self.counts)))
+        self.data = LSegments(lambda k: self._fetch(k)[0], bounds, 
+                first.naich(0))
+        self.didata = None
+        if first.get(0, 'distream'):
+            self.didata = LSegments(lambda k: self._fetch(k)[1], bounds, 
+                    16 if dibits else 1, dtype=bool if dibits else int)
+    
+    @staticmethod
+    def _compare(a, b):
+        """Return the name of the first incompatible setting or None"""
+        if a.get(0, 'samplehz') != b.get(0, 'samplehz'):
+            return 'samplehz'
+        if a.get(0, 'distream') != b.get(0, 'distream'):
+            return 'distream'
+        if a.naich(0) != b.naich(0):
+            return 'the number of analog inputs'
+        for aich in range(a.naich(0)):
+            for param in ('aichannel', 'ailabel', 'airange', 'aicalslope', 
+                    'aicalzero', 'aicalunits'):
+                if a.get(0, param, aich=aich) != b.get(0, param, aich=aich):
+                    return '%s of analog input %d'%(param, aich)
+        return None
+        
+    @property
+    def time(self):
+        """The time vector, which is built on first use"""
+        if self._time is None:
+            self._time = np.arange(self.data.shape[0]) * (1./self.get(0, 'samplehz'))
+        return self._time
+        
+    @time.setter
+    def time(self, value):
+        self._time = value
+        
+    def _fetch(self, k):
+        """Return the (data, didata) arrays of file k, reading it if necessary"""
+        out = self._files.get(k)
+        if out is None:
+            part = self.parts[k]
+            if part.data is not None:
+                out = (part.data, part.didata)
+            else:
+                with open(part.filename, 'rb') as ff:
+                    ff.seek(part._offset)
+                    out = part._convert_block(part._parse(ff.read()))
+                if out[0].shape[0] != self.counts[k]:
+                    raise Exception('LCONCAT: %s had %d rows but now has %d.'%(
+                            part.filename, self.counts[k], out[0].shape[0]))
+            self._files[k] = out
+        return out
+        
+    def files_info(self):
+        """Return a list of (filename, first index, number of rows) for each file"""
+        bounds = self.data.bounds
+        return [(this.filename, int(bounds[k]), int(self.counts[k])) 
+                for k, this in enumerate(self.parts)]
+                
+    def _source_hash(self):
+        """Return a hash of the contents of all of the files in order"""
+        hashes = [this._source_hash() for this in self.parts]
+        if None in hashes:
+            return None
+        return hashlib.sha1(' '.join(hashes).encode()).hexdigest()
+        
+    def iter_blocks(self, nbyte=1048576):
+        """Iterate over the data of every file in blocks
+    for index, data, didata in LC.iter_blocks():
+        ...
+
+INDEX is the sample index of the first row of the block in the 
+concatenated record.  See LConf.iter_blocks().
+"""
+        for k, part in enumerate(self.parts):
+            for index, data, didata in part.iter_blocks(nbyte=nbyte):
+                yield index + self.data.bounds[k], data, didata
+                
+    def set_cal(self, cal=True):
+        """Apply or remove the channel calibrations
+    set_cal(cal=True)
+    
+The files are converted again when their rows are next requested.
+"""
+        cal = bool(cal)
+        if cal != bool(self.cal):
+            for part in self.parts:
+                part.set_cal(cal)
+            self._files.clear()
+            self.clear_cache()
+        self.cal = cal
+        
+    def build_pyramid(self, base=64, cache=False):
+        """Build the multi-resolution summaries of all channels
+    PY = build_pyramid(base=64)
+    
+See LConf.build_pyramid().  Pyramids of concatenated records are not 
+saved to sidecar files, so CACHE is ignored.
+"""
+        return LConf.build_pyramid(self, base=base, cache=False)
+
+
+###
+# Lazy expressions
+###
+
+class LExpr:
+    """A lazy expression over the channels of an LConf object
+    I = LC.lazy('Ch0 Current')
+    V = LC.lazy('Ch0 Voltage')
+    P = (I - I0) * V
+
+Arithmetic, comparisons, the logical operators & | ~, and NumPy ufuncs
+(np.abs(), np.sqrt(), np.floor_divide(), ...) applied to LExpr objects 
+do not compute anything.  They build a graph of the calculation, which
+is executed chunk by chunk only when a result is requested, so the data
+never need to be in memory all at once.  Expressions may be combined 
+with scalars and with other expressions from the same LConf object.  
+The leaves of the graph are made by the LConf methods lazy(), 
+lazy_index(), lazy_time(), and lazy_di().
+
+If the LConf object was created without data, or if it is an LConcat, 
+the rows are read from the file(s) block-by-block as they are needed; 
+otherwise, the chunks are slices of the loaded data.
+
+Reductions return LReduce objects, which are also lazy.  Several 
+reductions can be computed in one pass over the data with compute(), 
+and sub-expressions that they share are evaluated once per chunk.
+    P.mean().compute()
+    pmean, pmax = lc.compute(P.mean(), P.max(), nthread=4)
+    
+The reductions are sum(), mean(), var(), std(), min(), max(), and 
+count().  Each may be grouped by an integer-valued expression BY, in 
+which case the result is an array indexed by the group number.  Samples
+with negative group numbers are ignored.  For example, the means over 
+each sweep of a triangle wave excitation are
+    i0, period = LC.get_phase()
+    sweep = np.floor_divide(LC.lazy_index() - i0, period/2.)
+    P.mean(by=sweep).compute()
+
+The other terminal operations are
+    idx = I.filter(LLowpass(50.)).crossings(0.5, edge='rising').compute()
+    x = P.evaluate()            # The whole result as an array
+    for index, y in P.iter_chunks():
+        ...
+    
+Within each chunk, the elementwise operations are fused; the arrays of 
+intermediate results that are no longer needed are reused as the 
+outputs of later operations, so a long expression costs a few chunk-
+sized buffers instead of one full-length array per operation.  Because 
+NumPy releases the GIL, chunks can be evaluated in parallel threads (see
+compute()).  Expressions with filter() stages carry the filter states 
+from one chunk to the next, so they are always evaluated in order.
+"""
+    # Make NumPy arrays defer to the LExpr operators
+    __array_priority__ = 1000
+    
+    def __init__(self, conf, op, args=(), param=None):
+        self.conf = conf
+        self.op = op
+        self.args = tuple(args)
+        self.param = param
+        self.stateful = op == 'filter' or any(
+                [isinstance(this, LExpr) and this.stateful for this in self.args])
+        
+    def __repr__(self):
+        if self.op == 'ufunc':
+            return '%s(%s)'%(self.param.__name__, 
+                    ', '.join([repr(this) for this in self.args]))
+        elif self.op == 'filter':
+            return 'filter(%s, %s)'%(repr(self.args[0]), repr(self.param))
+        elif self.param is None:
+            return self.op
+        return '%s(%s)'%(self.op, repr(self.param))
+        
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwarg):
+        if method != '__call__' or kwarg or ufunc.nout != 1:
+            return NotImplemented
+        for this in inputs:
+            if isinstance(this, LExpr):
+                if this.conf is not self.conf:
+                    raise Exception('LEXPR: Expressions from different LConf objects cannot be combined.')
+            elif np.ndim(this):
+                raise Exception('LEXPR: Only scalars and LExpr objects can be combined with an LExpr.')
+        return LExpr(self.conf, 'ufunc', inputs, ufunc)
+        
+    # The operators are all applied through __array_ufunc__
+    __hash__ = object.__hash__
+    def __add__(self, other): return np.add(self, other)
+    def __radd__(self, other): return np.add(other, self)
+    def __sub__(self, other): return np.subtract(self, other)
+    def __rsub__(self, other): return np.subtract(other, self)
+    def __mul__(self, other): return np.multiply(self, other)
+    def __rmul__(self, other): return np.multiply(other, self)
+    def __truediv__(self, other): return np.true_divide(self, other)
+    def __rtruediv__(self, other): return np.true_divide(other, self)
+    def __floordiv__(self, other): return np.floor_divide(self, other)
+    def __rfloordiv__(self, other): return np.floor_divide(other, self)
+    def __mod__(self, other): return np.remainder(self, other)
+    def __rmod__(self, other): return np.remainder(other, self)
+    def __pow__(self, other): return np.power(self, other)
+    def __rpow__(self, other): return np.power(other, self)
+    def __neg__(self): return np.negative(self)
+    def __pos__(self): return self
+    def __abs__(self): return np.absolute(self)
+    def __lt__(self, other): return np.less(self, other)
+    def __le__(self, other): return np.less_equal(self, other)
+    def __gt__(self, other): return np.greater(self, other)
+    def __ge__(self, other): return np.greater_equal(self, other)
+    def __eq__(self, other): return np.equal(self, other)
+    def __ne__(self, other): return np.not_equal(self, other)
+    def __and__(self, other): return np.logical_and(self, other)
+    def __rand__(self, other): return np.logical_and(other, self)
+    def __or__(self, other): return np.logical_or(self, other)
+    def __ror__(self, other): return np.logical_or(other, self)
+    def __invert__(self): return np.logical_not(self)
+        
+    def filter(self, pipeline):
+        """Apply a signal conditioning pipeline to the expression
+    y = x.filter(pipeline)
+    
+PIPELINE is an LPipeline instance.  The filter states are carried from 
+one chunk to the next, so the result is the same as LPipeline.apply() 
+on the whole record.  Decimating pipelines are not allowed, since the 
+result would not line up with the other channels, and neither is 
+LDetrend, which needs the whole record.
+"""
+        if pipeline.decimation() != 1:
+            raise Exception('FILTER: Pipelines in lazy expressions cannot decimate the data.')
+        if any([isinstance(this, LDetrend) for this in pipeline.stages]):
+            raise Exception('FILTER: Pipelines in lazy expressions cannot detrend the data.')
+        return LExpr(self.conf, 'filter', (self,), pipeline)
+        
+    def sum(self, by=None):
+        """Return an LReduce for the sum, optionally grouped BY an expression"""
+        return LReduce(self, 'sum', by)
+        
+    def mean(self, by=None):
+        """Return an LReduce for the mean, optionally grouped BY an expression"""
+        return LReduce(self, 'mean', by)
+        
+    def var(self, by=None):
+        """Return an LReduce for the variance (normalized by N), optionally grouped BY an expression"""
+        return LReduce(self, 'var', by)
+        
+    def std(self, by=None):
+        """Return an LReduce for the standard deviation (normalized by N), optionally grouped BY an expression"""
+        return LReduce(self, 'std', by)
+        
+    def min(self, by=None):
+        """Return an LReduce for the minimum, optionally grouped BY an expression"""
+        return LReduce(self, 'min', by)
+        
+    def max(self, by=None):
+        """Return an LReduce for the maximum, optionally grouped BY an expression"""
+        return LReduce(self, 'max', by)
+        
+    def count(self, by=None):
+        """Return an LReduce for the number of samples, optionally grouped BY an expression"""
+        return LReduce(self, 'count', by)
+        
+    def crossings(self, level=0., edge='any'):
+        """Return an LReduce for the indices where the expression crosses a level
+    idx = x.crossings(level=0., edge='any').compute()
+    
+IDX is an array of sample indices.  As in LConf.get_events(), each index
+is that of the last sample before the crossing, and a sample is above 
+the LEVEL when it is greater than it.  EDGE is 'rising', 'falling', or 
+'any'.  The result is the same as get_events() with debounce=1, except 
+that get_events() does not report a crossing between the first two 
+samples.
+"""
+        edge = edge.lower()
+        if edge not in ('rising', 'falling', 'any'):
+            raise Exception('CROSSINGS: Unrecognized edge: %s'%repr(edge))
+        return LReduce(self, 'crossings', param=(level, edge))
+        
+    def evaluate(self, chunk=65536, nthread=1, start=None, stop=None):
+        """Compute the whole expression and return it as an array
+    x = evaluate(chunk=65536, nthread=1, start=None, stop=None)
+    
+See compute() for the keyword arguments.
+"""
+        return compute(LReduce(self, 'collect'), chunk=chunk, 
+                nthread=nthread, start=start, stop=stop)
+        
+    def iter_chunks(self, chunk=65536, start=None, stop=None):
+        """Iterate over the expression chunk by chunk
+    for index, y in x.iter_chunks(chunk=65536, start=None, stop=None):
+        ...
+        
+INDEX is the sample index of the first value in Y.  See compute() for 
+the keyword arguments.
+"""
+        program = _LProgram([self])
+        states = {}
+        for index, data, didata in _lazy_source(self.conf, chunk, start, stop):
+            yield index, program.run(index, data, didata, states)[0]
+
+
+class LReduce:
+    """A lazy reduction of an LExpr
+    
+LReduce objects are returned by the reduction methods of LExpr, and 
+they are computed with compute().  See help(LExpr).
+"""
+    def __init__(self, expr, op, by=None, param=None):
+        if by is not None and (not isinstance(by, LExpr) or by.conf is not expr.conf):
+            raise Exception('LREDUCE: BY must be an LExpr from the same LConf object.')
+        self.expr = expr
+        self.op = op
+        self.by = by
+        self.param = param
+        
+    def __repr__(self):
+        by = '' if self.by is None else 'by=%s'%repr(self.by)
+        return '%s.%s(%s)'%(repr(self.expr), self.op, by)
+        
+    def compute(self, chunk=65536, nthread=1, start=None, stop=None):
+        """Compute the reduction.  See compute()."""
+        return compute(self, chunk=chunk, nthread=nthread, start=start, stop=stop)
+        
+    def _partial(self, index, x, g):
+        """Reduce one chunk"""
+        if self.op == 'collect':
+            return [x]
+        elif self.op == 'crossings':
+            level, edge = self.param
+            test = x > level
+            p = np.flatnonzero(test[1:] != test[:-1]) + 1
+            if edge == 'rising':
+                p = p[test[p]]
+            elif edge == 'falling':
+                p = p[~test[p]]
+            return (index, test[0], test[-1], p + (index-1))
+        if g is not None:
+            g = np.asarray(g).astype(int)
+            if g.size and g.min() < 0:
+                keep = g >= 0
+                x = x[keep]
+                g = g[keep]
+        if self.op in ('min', 'max'):
+            fn = np.minimum if self.op == 'min' else np.maximum
+            empty = np.inf if self.op == 'min' else -np.inf
+            if g is None:
+                return np.array([fn.reduce(x) if x.size else empty])
+            out = np.full(g.max()+1 if g.size else 0, empty)
+            fn.at(out, g, x)
+            return out
+        if g is None:
+            n = np.array([x.size])
+            s = np.array([x.sum()], dtype=float)
+        else:
+            n = np.bincount(g)
+            s = np.bincount(g, weights=x)
+        if self.op not in ('var', 'std'):
+            return n, s
+        mean = s / np.maximum(n, 1)
+        d = x - (mean[0] if g is None else mean[g])
+        m2 = np.array([(d*d).sum()]) if g is None else np.bincount(g, weights=d*d)
+        return n, mean, m2
+        
+    @staticmethod
+    def _pad(x, N, value=0):
+        """Pad a partial result array to length N"""
+        if x.shape[0] >= N:
+            return x
+        return np.concatenate((x, np.full(N-x.shape[0], value, dtype=x.dtype)))
+        
+    def _merge(self, a, b):
+        """Combine the partial results of consecutive chunks"""
+        if self.op == 'collect':
+            return a + b
+        elif self.op == 'crossings':
+            level, edge = self.param
+            events = [a[3]]
+            if a[2] != b[1] and (edge == 'any' or b[1] == (edge == 'rising')):
+                events.append([b[0]-1])
+            events.append(b[3])
+            return (a[0], a[1], b[2], np.concatenate(events).astype(int))
+        elif self.op in ('min', 'max'):
+            fn = np.minimum if self.op == 'min' else np.maximum
+            N = max(a.shape[0], b.shape[0])
+            empty = np.inf if self.op == 'min' else -np.inf
+            return fn(self._pad(a, N, empty), self._pad(b, N, empty))
+        N = max(a[0].shape[0], b[0].shape[0])
+        a = [self._pad(this, N) for this in a]
+        b = [self._pad(this, N) for this in b]
+        if self.op not in ('var', 'std'):
+            return a[0] + b[0], a[1] + b[1]
+        # The pairwise (Chan et al.) update of the mean and variance
+        n = a[0] + b[0]
+        delta = b[1] - a[1]
+        frac = b[0] / np.maximum(n, 1)
+        mean = a[1] + delta * frac
+        m2 = a[2] + b[2] + delta*delta * a[0] * frac
+        return n, mean, m2
+        
+    def _result(self, partial):
+        """Return the final result from the merged partial results"""
+        if self.op == 'collect':
+            return np.concatenate(partial) if partial else np.zeros(0)
+        elif self.op == 'crossings':
+            return np.zeros(0, dtype=int) if partial is None else partial[3]
+        if partial is None:
+            partial = self._partial(0, np.zeros(0), None if self.by is None 
+                    else np.zeros(0, dtype=int))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if self.op in ('min', 'max'):
+                out = np.where(np.isinf(partial) & (partial > 0 if self.op == 'min' 
+                        else partial < 0), np.nan, partial)
+            elif self.op == 'count':
+                out = partial[0]
+            elif self.op == 'sum':
+                out = partial[1]
+            elif self.op == 'mean':
+                out = partial[1] / partial[0]
+            else:
+                out = np.where(partial[0] > 0, partial[2] / partial[0], np.nan)
+                if self.op == 'std':
+                    out = np.sqrt(out)
+        if self.by is None:
+            return out[0]
+        return out
+
+
+class _LProgram:
+    """The fused per-chunk evaluation of a set of LExpr graphs"""
+    def __init__(self, roots):
+        self.roots = roots
+        self.order = []
+        self.uses = {}
+        seen = set()
+        def visit(node):
+            if id(node) in seen:
+                return
+            seen.add(id(node))
+            for this in node.args:
+                if isinstance(this, LExpr):
+                    visit(this)
+                    self.uses[id(this)] = self.uses.get(id(this), 0) + 1
+            self.order.append(node)
+        for this in roots:
+            visit(this)
+        # The values of the roots are never reused
+        for this in roots:
+            self.uses[id(this)] = np.inf
+        self.stateful = any([this.stateful for this in roots])
+        self.samplehz = roots[0].conf.get(0, 'samplehz') if roots else 1.
+        # Result types are learned from the first chunk
+        self.dtypes = {}
+        
+    def run(self, index, data, didata, states):
+        """Evaluate the roots for one chunk and return a list of their values"""
+        N = data.shape[0]
+        values = {}
+        remaining = dict(self.uses)
+        free = []
+        for node in self.order:
+            args = []
+            for this in node.args:
+                if isinstance(this, LExpr):
+                    args.append(values[id(this)])
+                    remaining[id(this)] -= 1
+                    # Arrays that we made can be overwritten after their last 
+                    # use.  Channels, digital inputs, and filter outputs may be
+                    # views of the loaded data, so they are never reused.
+                    if remaining[id(this)] == 0 and this.op in ('ufunc', 'index', 'time'):
+                        free.append(values[id(this)])
+                else:
+                    args.append(this)
+                    
+            if node.op == 'ufunc':
+                dtype = self.dtypes.get(id(node))
+                out = None
+                for k in range(len(free)):
+                    if free[k].dtype == dtype and free[k].shape == (N,):
+                        out = free.pop(k)
+                        break
+                if out is None:
+                    y = node.param(*args)
+                    self.dtypes[id(node)] = y.dtype
+                else:
+                    y = node.param(*args, out=out)
+            elif node.op == 'channel':
+                y = data[:,node.param]
+            elif node.op == 'index':
+                y = np.arange(index, index+N)
+            elif node.op == 'time':
+                y = np.arange(index, index+N) * (1./self.samplehz)
+            elif node.op == 'di':
+                if didata.shape[1] > 1:
+                    y = didata[:,node.param] if node.param is not None else \
+                            (didata.astype(int) << np.arange(16)).sum(axis=1)
+                else:
+                    y = didata[:,0] if node.param is None else \
+                            ((didata[:,0] >> node.param) & 1) == 1
+            elif node.op == 'filter':
+                state = states.get(id(node))
+                if state is None:
+                    state = node.param.init(self.samplehz, np.atleast_1d(args[0][0]))
+                    states[id(node)] = state
+                y = node.param.process(args[0], state)
+            values[id(node)] = y
+        return [values[id(this)] for this in self.roots]
+
+
+def _lazy_source(conf, chunk, start=None, stop=None):
+    """Yield (index, data, didata) chunks of at most CHUNK rows
+    
+Chunks are slices of loaded arrays or LCompact data.  Otherwise the 
+rows are read with iter_blocks().  START and STOP are times in seconds.
+"""
+    samplehz = conf.get(0, 'samplehz')
+    i0 = int(np.round(start*samplehz)) if start else 0
+    i1 = int(np.round(stop*samplehz)) if stop else None
+    if isinstance(conf.data, (np.ndarray, LCompact)):
+        i1 = conf.ndata() if i1 is None else min(i1, conf.ndata())
+        for index in range(i0, i1, chunk):
+            I1 = min(index+chunk, i1)
+            didata = None
+            if conf.didata is not None:
+                didata = np.asarray(conf.didata[index:I1])
+            yield index, np.asarray(conf.data[index:I1]), didata
+        return
+    for index, data, didata in conf.iter_blocks():
+        a = max(i0 - index, 0)
+        b = data.shape[0] if i1 is None else min(i1 - index, data.shape[0])
+        for I0 in range(a, b, chunk):
+            I1 = min(I0+chunk, b)
+            yield (index+I0, data[I0:I1], 
+                    None if didata is None else didata[I0:I1])
+        if i1 is not None and index + data.shape[0] >= i1:
+            break
+
+
+def compute(*reductions, chunk=65536, nthread=1, start=None, stop=None):
+    """Compute lazy reductions in a single pass over the data
+    result = compute(R, chunk=65536, nthread=1, start=None, stop=None)
+    result1, result2, ... = compute(R1, R2, ...)
+    
+Each R is an LReduce object returned by the reduction methods of LExpr, 
+and all must refer to the same LConf object.  With one reduction, its 
+result is returned; otherwise a tuple of results is returned.  See 
+help(LExpr).
+
+CHUNK
+The number of rows evaluated at a time.  The default of 65536 keeps the
+buffers for a few intermediate results in the processor's cache.
+
+NTHREAD
+The number of threads that evaluate chunks in parallel.  The data are 
+still read in order by this thread, and the partial results are combined
+in order, so the result does not depend on NTHREAD.  Expressions with 
+filter() stages are always evaluated in this thread.
+
+START, STOP
+Times in seconds between which the data are used.  By default, the 
+entire record is used.
+"""
+    if not reductions:
+        return ()
+    conf = reductions[0].expr.conf
+    roots = []
+    for this in reductions:
+        if this.expr.conf is not conf:
+            raise Exception('COMPUTE: The reductions must all refer to the same LConf object.')
+        roots.append(this.expr)
+        if this.by is not None:
+            roots.append(this.by)
+    program = _LProgram(roots)
+    states = {}
+    
+    def work(index, data, didata):
+        values = program.run(index, data, didata, states)
+        out = []
+        for this in reductions:
+            x = values.pop(0)
+            g = values.pop(0) if this.by is not None else None
+            out.append(this._partial(index, x, g))
+        return out
+        
+    partials = [None] * len(reductions)
+    def merge(out):
+        for k, this in enumerate(reductions):
+            partials[k] = out[k] if partials[k] is None else \
+                    this._merge(partials[k], out[k])
+    
+    source = (item for item in _lazy_source(conf, chunk, start, stop) 
+            if item[1].shape[0])
+    if nthread > 1 and not program.stateful:
+        from concurrent.futures import ThreadPoolExecutor
+        from collections import deque
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=nthread) as pool:
+            for item in source:
+                pending.append(pool.submit(work, *item))
+                # Bound the number of chunks held in memory
+                if len(pending) >= 2*nthread:
+                    merge(pending.popleft().result())
+            while pending:
+                merge(pending.popleft().result())
+    else:
+        for item in source:
+            merge(work(*item))
+    
+    results = tuple([this._result(partials[k]) 
+            for k, this in enumerate(reductions)])
+    return results[0] if len(results) == 1 else results
+
+
+###
+# Data server
+###
+
+def _send_message(sock, header, arrays=()):
+    """Send a JSON header followed by the raw bytes of each array"""
+    arrays = [np.ascontiguousarray(this) for this in arrays]
+    header = dict(header)
+    header['arrays'] = [[this.dtype.str, list(this.shape)] for this in arrays]
+    text = json.dumps(header).encode()
+    # Small messages go out in one piece
+    parts = [len(text).to_bytes(4, 'big'), text] + [
+            memoryview(this).cast('B') for this in arrays if this.nbytes]
+    if sum([len(this) for this in parts]) <= 65536:
+        sock.sendall(b''.join(parts))
+    else:
+        for this in parts:
+            sock.sendall(this)
+
+
+def _recv_exact(sock, N):
+    """Receive exactly N bytes from a socket"""
+    buf = bytearray(N)
+    view = memoryview(buf)
+    index = 0
+    while index < N:
+        count = sock.recv_into(view[index:])
+        if not count:
+            raise ConnectionError('The connection was closed.')
+        index += count
+    return buf
+
+
+def _recv_message(sock, maxbytes=None):
+    """Receive a message sent by _send_message() and return (header, arrays)"""
+    N = int.from_bytes(_recv_exact(sock, 4), 'big')
+    if maxbytes and N > maxbytes:
+        raise ConnectionError('The message header is too long.')
+    header = json.loads(_recv_exact(sock, N).decode())
+    arrays = []
+    for dtype, shape in header.pop('arrays', []):
+        dtype = np.dtype(dtype)
+        nbyte = dtype.itemsize * int(np.prod(shape))
+        arrays.append(np.frombuffer(_recv_exact(sock, nbyte), 
+                dtype=dtype).reshape(shape))
+    return header, arrays
+
+
+class LServer:
+    """A local server of decimated channel windows from loaded data files
+    S = LServer(port=0, root=None, maxfiles=8, cache=256, base=64)
+    S.start()       # Serve from a background thread
+    ...
+    S.close()
+    
+or from the command line,
+    python -m lconfig serve -p 8765 --root /path/to/data
+    
+Processes on the same workstation that look at the same large files 
+should not each parse and hold them.  The server keeps the loaded LConf
+objects and their pyramids (see help(LPyramid)) in one process and 
+answers requests for calibrated windows of the channels from LClient 
+objects.  It listens only on the loopback interface, and it has no 
+authentication, so every user of the workstation can read the files it
+can read.
+
+PORT
+The TCP port.  If it is 0, a free port is chosen; see the address member.
+
+ROOT
+If not None, only files within this directory are served, and relative
+file names are taken relative to it.
+
+MAXFILES
+The number of loaded files kept in a least-recently-used LCache.  Files
+are loaded again when their size or modification time changes.
+
+CACHE
+The number of responses kept in a second, shared LCache, so repeated 
+requests for the same window by different clients are answered without
+touching the data.  The 'channel' responses are not kept, since each
+may hold up to MAXROWS samples.
+
+BASE
+The pyramid block size.  Pyramids are read from and written to sidecar 
+files; see LConf.build_pyramid().
+
+MAXROWS
+The largest number of samples returned by a 'channel' request.
+
+The requests for one file are answered one at a time, since LConf 
+objects are not safe to use from several threads at once.  Requests for
+different files, and the ones answered from the cache, run in parallel.
+
+The requests are described in help(LClient).  Each is a JSON header 
+preceded by its length as a 4-byte big-endian integer.  A response has 
+the same form, and the raw bytes of the arrays listed in its header 
+follow it.
+"""
+    def __init__(self, port=0, root=None, maxfiles=8, cache=256, base=64,
+            maxrows=10000000):
+        import socket, socketserver, threading
+        self.root = None if root is None else os.path.realpath(root)
+        self.base = base
+        self.maxrows = maxrows
+        self._files = LCache(maxsize=maxfiles)
+        self._results = LCache(maxsize=cache)
+        self._lock = threading.Lock()
+        self._loading = {}
+        self._connections = set()
+        self._thread = None
+        server = self
+        
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with server._lock:
+                    server._connections.add(self.request)
+                try:
+                    self._serve()
+                finally:
+                    with server._lock:
+                        server._connections.discard(self.request)
+                        
+            def _serve(self):
+                while True:
+                    try:
+                        request, _ = _recv_message(self.request, maxbytes=1048576)
+                    except (ConnectionError, OSError, ValueError):
+                        return
+                    try:
+                        header, arrays = server.respond(request)
+                    except Exception as err:
+                        header, arrays = {'error':str(err)}, ()
+                    try:
+                        _send_message(self.request, header, arrays)
+                    except OSError:
+                        return
+                        
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+            
+        self.server = Server(('127.0.0.1', port), Handler)
+        self.address = self.server.server_address
+        
+    def __repr__(self):
+        return 'LServer(%s:%d)'%self.address
+        
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, *args):
+        self.close()
+        
+    def start(self):
+        """Serve requests from a daemon thread and return the LServer"""
+        import threading
+        self._thread = threading.Thread(target=self.server.serve_forever, 
+                name=repr(self), daemon=True)
+        self._thread.start()
+        return self
+        
+    def serve_forever(self):
+        """Serve requests in this thread until close() is called from another"""
+        self.server.serve_forever()
+        
+    def close(self):
+        """Stop serving, close the open connections, and release the port"""
+        import socket
+        if self._thread is not None:
+            self.server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server.server_close()
+        with self._lock:
+            connections = list(self._connections)
+        for this in connections:
+            try:
+                this.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        
+    def _path(self, filename):
+        """Resolve a requested file name and check that it may be served"""
+        if not isinstance(filename, str):
+            raise Exception('LSERVER: The file name must be a string.')
+        if self.root is not None:
+            path = os.path.realpath(os.path.join(self.root, filename))
+            if os.path.commonpath((path, self.root)) != self.root:
+                raise Exception('LSERVER: %s is outside of the served directory.'%filename)
+        else:
+            path = os.path.realpath(filename)
+        if not os.path.isfile(path):
+            raise Exception('LSERVER: File not found: %s'%filename)
+        return path
+        
+    def _conf(self, path):
+        """Return the loaded LConf for a file, its (size, mtime) signature, 
+and the lock that guards its use"""
+        import threading
+        st = os.stat(path)
+        signature = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            entry = self._files.get(path)
+            if entry is not None and entry[1] == signature:
+                return entry
+            # Only one thread loads each file
+            loading = self._loading.setdefault(path, threading.Lock())
+        with loading:
+            with self._lock:
+                entry = self._files.get(path)
+            if entry is None or entry[1] != signature:
+                conf = LConf(path, data=True, cal=True)
+                if conf.data is None:
+                    raise Exception('LSERVER: %s does not contain data.'%path)
+                conf.build_pyramid(base=self.base, cache=True)
+                entry = (conf, signature, threading.Lock())
+                with self._lock:
+                    self._files[path] = entry
+        return entry
+        
+    def cache_info(self):
+        """Return a dictionary of the file and response cache statistics"""
+        with self._lock:
+            return {'files':self._files.info(), 'results':self._results.info()}
+            
+    def respond(self, request):
+        """Return the (header, arrays) response to a request dictionary"""
+        op = request.get('op')
+        if op == 'ping':
+            return {'version':__version__}, ()
+        elif op == 'cache_info':
+            return self.cache_info(), ()
+        elif op not in ('info', 'window', 'channel', 'stats'):
+            raise Exception('LSERVER: Unrecognized request: %s'%repr(op))
+        path = self._path(request.get('filename'))
+        conf, signature, lock = self._conf(path)
+        if op == 'channel':
+            # Full-resolution responses are too large to keep
+            with lock:
+                return self._compute(conf, path, request)
+        key = (path, signature, json.dumps(request, sort_keys=True))
+        with self._lock:
+            out = self._results.get(key)
+        if out is not None:
+            return out
+        
+        with lock:
+            out = self._compute(conf, path, request)
+        with self._lock:
+            self._results[key] = out
+        return out
+        
+    def _compute(self, conf, path, request):
+        """Return the (header, arrays) response computed from a loaded file"""
+        op = request.get('op')
+        aich = request.get('aich')
+        start = request.get('start')
+        stop = request.get('stop')
+        if op == 'info':
+            out = {'filename':path,
+                    'samplehz':conf.get(0, 'samplehz'),
+                    'ndata':conf.ndata(),
+                    'timestamp':conf.timestamp.lstrip('#:').strip(),
+                    'labels':conf.get_labels(0),
+                    'units':[conf.get(0, 'aicalunits', aich=k) 
+                            for k in range(conf.naich(0))],
+                    'meta':dict(conf.get_meta(0))}, ()
+        elif op == 'window':
+            out = {}, conf.get_envelope(aich, npoints=int(request.get('npoints', 1000)),
+                    start=start, stop=stop)
+        elif op == 'channel':
+            downsample = request.get('downsample')
+            t = conf.get_time(downsample=downsample, start=start, stop=stop)
+            if t.shape[0] > self.maxrows:
+                raise Exception('LSERVER: %d samples were requested, but the limit is %d.'%(
+                        t.shape[0], self.maxrows))
+            out = {}, (t, conf.get_channel(aich, downsample=downsample, 
+                    start=start, stop=stop))
+        elif op == 'stats':
+            stats = conf.get_stats(aich, start=start, stop=stop)
+            out = {'stats':{key:np.asarray(value).tolist() 
+                    for key, value in stats.items()}}, ()
+        return out
+
+
+class LClient:
+    """A client of an LServer with a pool of connections
+    C = LClient(port, maxconn=4, timeout=30., relative=False)
+    
+    C.ping()
+    info = C.info('run.dat')
+    t, ymin, ymax, ymean = C.window('run.dat', 'Ch0 Current', npoints=1000)
+    t, y = C.channel('run.dat', 0, start=1., stop=2.)
+    s = C.stats('run.dat', 0, start=1., stop=2.)
+    C.close()
+    
+File names are made absolute on the client side unless RELATIVE is True,
+which is appropriate when the server has a ROOT directory.  window(), 
+channel(), and stats() take the same arguments as LConf.get_envelope(), 
+get_channel(), and get_stats(), and info() returns a dictionary with the
+sample rate, number of samples, timestamp, channel labels and units, and
+meta parameters.  Errors on the server are raised as exceptions.
+
+An LClient may be shared by threads.  Up to MAXCONN connections are 
+opened as they are needed and are kept open for later requests.  See 
+help(LServer).
+"""
+    def __init__(self, port, maxconn=4, timeout=30., relative=False):
+        import threading
+        self.port = port
+        self.timeout = timeout
+        self.relative = relative
+        self._pool = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        
+    def __repr__(self):
+        return 'LClient(%d)'%self.port
+        
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, *args):
+        self.close()
+        
+    def _connect(self):
+        import socket
+        sock = socket.create_connection(('127.0.0.1', self.port), 
+                timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+        
+    def request(self, **request):
+        """Send a request and return the (header, arrays) response"""
+        with self._slots:
+            with self._lock:
+                sock = self._pool.pop() if self._pool else None
+            # A pooled connection may have been closed by the server
+            for attempt in (0, 1):
+                if sock is None:
+                    sock = self._connect()
+                    attempt = 1
+                try:
+                    _send_message(sock, request)
+                    header, arrays = _recv_message(sock)
+                    break
+                except (ConnectionError, OSError):
+                    sock.close()
+                    sock = None
+                    if attempt:
+                        raise
+            with self._lock:
+                self._pool.append(sock)
+        if 'error' in header:
+            raise Exception('LCLIENT: %s'%header['error'])
+        return header, arrays
+        
+    def _filename(self, filename):
+        return filename if self.relative else os.path.abspath(filename)
+        
+    def ping(self):
+        """Return the lconfig version of the server"""
+        return self.request(op='ping')[0]['version']
+        
+    def cache_info(self):
+        """Return the server's cache statistics"""
+        return self.request(op='cache_info')[0]
+        
+    def info(self, filename):
+        """Return a dictionary describing a data file"""
+        return self.request(op='info', filename=self._filename(filename))[0]
+        
+    def window(self, filename, aich, npoints=1000, start=None, stop=None):
+        """Return the decimated envelope (t, ymin, ymax, ymean) of a channel"""
+        return tuple(self.request(op='window', filename=self._filename(filename),
+                aich=aich, npoints=npoints, start=start, stop=stop)[1])
+                
+    def channel(self, filename, aich, downsample=None, start=None, stop=None):
+        """Return the time and calibrated samples (t, y) of a channel"""
+        return tuple(self.request(op='channel', filename=self._filename(filename),
+                aich=aich, downsample=downsample, start=start, stop=stop)[1])
+                
+    def stats(self, filename, aich=None, start=None, stop=None):
+        """Return the summary statistics of a window.  See LConf.get_stats()."""
+        stats = self.request(op='stats', filename=self._filename(filename),
+                aich=aich, start=start, stop=stop)[0]['stats']
+        return {key:np.asarray(value) if isinstance(value, list) else value
+                for key, value in stats.items()}
+                
+    def close(self):
+        """Close the pooled connections"""
+        with self._lock:
+            while self._pool:
+                self._pool.pop().close()
+
+
+###
+# Command line
+###
+
+# Summaries are remembered in this file in each directory
+SUMMARY_CACHE = '.lconfig_summary.json'
+# Bump to invalidate cached summaries when their contents change
+_SUMMARY_VERSION = 1
+
+def _summarize_file(filename, cal=True, nbyte=1048576):
+    """Summarize one data file in a single streaming pass
+    summary = _summarize_file(filename, cal=True)
+
+Only the header is parsed with LConf, and the rows are read with 
+iter_blocks().  Per-channel means and variances are merged block by 
+block with the pairwise (Chan et al.) update, so the result does not 
+depend on the block size and does not lose precision on long records.
+"""
+    st = os.stat(filename)
+    conf = LConf(filename, cal=cal)
+    naich = conf.naich(0) if conf.ndev() else 0
+    n = 0
+    ymin = np.full(naich, np.inf)
+    ymax = np.full(naich, -np.inf)
+    mean = np.zeros(naich)
+    m2 = np.zeros(naich)
+    if conf._offset is not None:
+        for index, data, didata in conf.iter_blocks(nbyte=nbyte):
+            nb = data.shape[0]
+            if not nb:
+                continue
+            ymin = np.minimum(ymin, data.min(axis=0))
+            ymax = np.maximum(ymax, data.max(axis=0))
+            bmean = data.mean(axis=0)
+            bm2 = ((data - bmean)**2).sum(axis=0)
+            delta = bmean - mean
+            total = n + nb
+            mean += delta * (nb / total)
+            m2 += bm2 + delta*delta * (n * nb / total)
+            n = total
+    samplehz = conf.get(0, 'samplehz') if conf.ndev() else -1.
+    channels = []
+    for aich in range(naich):
+        channels.append({
+                'label':conf.get(0, 'ailabel', aich=aich),
+                'units':conf.get(0, 'aicalunits', aich=aich) if cal else 'V',
+                'min':float(ymin[aich]) if n else None,
+                'max':float(ymax[aich]) if n else None,
+                'mean':float(mean[aich]) if n else None,
+                'std':float(np.sqrt(m2[aich]/n)) if n else None})
+    meta = dict(conf.get_meta(0)) if conf.ndev() else {}
+    flow = None
+    if 'fg_scfh' in meta and 'o2_scfh' in meta:
+        flow = meta['fg_scfh'] + meta['o2_scfh']
+    return {'filename':os.path.abspath(filename),
+            'size':st.st_size,
+            'mtime_ns':st.st_mtime_ns,
+            'cal':cal,
+            'version':_SUMMARY_VERSION,
+            'timestamp':conf.timestamp.lstrip('#:').strip(),
+            'samplehz':samplehz,
+            'nsample':n,
+            'duration':n / samplehz if samplehz > 0 else None,
+            'naich':naich,
+            'flow':flow,
+            'meta':meta,
+            'channels':channels}
+
+
+def summarize(directory, pattern='*.dat', nproc=None, cal=True, cache=True):
+    """Summarize every data file in a directory
+    summaries = summarize(directory, pattern='*.dat', nproc=None)
+
+Each file matching PATTERN is summarized by _summarize_file() in a pool 
+of NPROC worker processes (the number of CPUs by default).  The result 
+is a list of dictionaries, one per file, sorted by file name, with the 
+sample count, duration, timestamp, meta parameters, total flow rate 
+(fg_scfh + o2_scfh when both are present), and the calibrated min, max, 
+mean, and standard deviation of each analog input channel.
+
+When CACHE is True, the summaries are saved in SUMMARY_CACHE in the 
+directory, and files whose size and modification time have not changed
+are not read again.  Files that cannot be read are reported on stderr
+and skipped.
+"""
+    import glob
+    from concurrent.futures import ProcessPoolExecutor
+    filenames = sorted(os.path.abspath(this) 
+            for this in glob.glob(os.path.join(directory, pattern)))
+    cachefile = os.path.join(directory, SUMMARY_CACHE)
+    previous = {}
+    if cache and os.path.isfile(cachefile):
+        try:
+            with open(cachefile, 'r') as ff:
+                previous = {this['filename']:this for this in json.load(ff)}
+        except (ValueError, KeyError, TypeError):
+            previous = {}
+    
+    out = {}
+    todo = []
+    for filename in filenames:
+        st = os.stat(filename)
+        this = previous.get(filename)
+        if this and this.get('size') == st.st_size and \
+                this.get('mtime_ns') == st.st_mtime_ns and \
+                this.get('cal') == cal and this.get('version') == _SUMMARY_VERSION:
+            out[filename] = this
+        else:
+            todo.append(filename)
+            
+    if nproc is None:
+        nproc = os.cpu_count() or 1
+    nproc = max(min(nproc, len(todo)), 1)
+    if todo and nproc == 1:
+        results = []
+        for filename in todo:
+            try:
+                results.append(_summarize_file(filename, cal))
+            except Exception as err:
+                results.append(err)
+    elif todo:
+        with ProcessPoolExecutor(max_workers=nproc) as pool:
+            futures = [pool.submit(_summarize_file, filename, cal) 
+                    for filename in todo]
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as err:
+                    results.append(err)
+    else:
+        results = []
+    for filename, result in zip(todo, results):
+        if isinstance(result, Exception):
+            sys.stderr.write('LCONF: Could not summarize %s: %s\n'%(filename, result))
+        else:
+            out[filename] = result
+            
+    summaries = [out[filename] for filename in filenames if filename in out]
+    if cache and todo:
+        try:
+            with open(cachefile, 'w') as ff:
+                json.dump(summaries, ff, indent=1)
+        except OSError as err:
+            sys.stderr.write('LCONF: Could not write %s: %s\n'%(cachefile, err))
+    return summaries
+
+
+def _summary_rows(summaries):
+    """Flatten summaries into a header list and rows for CSV output"""
+    metas = []
+    nch = 0
+    for this in summaries:
+        for param in this['meta']:
+            if param not in metas:
+                metas.append(param)
+        nch = max(nch, this['naich'])
+    header = ['filename', 'timestamp', 'samplehz', 'nsample', 'duration', 
+            'naich', 'flow'] + metas
+    for aich in range(nch):
+        header += ['aich%d_%s'%(aich, stat) for stat in 
+                ('label', 'units', 'min', 'max', 'mean', 'std')]
+    rows = []
+    for this in summaries:
+        row = [os.path.basename(this['filename'])]
+        row += [this[key] for key in ('timestamp', 'samplehz', 'nsample', 
+                'duration', 'naich', 'flow')]
+        row += [this['meta'].get(param) for param in metas]
+        for aich in range(nch):
+            if aich < len(this['channels']):
+                channel = this['channels'][aich]
+                row += [channel[stat] for stat in 
+                        ('label', 'units', 'min', 'max', 'mean', 'std')]
+            else:
+                row += [None]*6
+        rows.append(['' if value is None else value for value in row])
+    return header, rows
+
+
+def main(argv=None):
+    """Command line entry point
+    python -m lconfig summarize DIR [-f csv|json] [-o FILE]
+    python -m lconfig serve [-p PORT] [--root DIR]
+"""
+    import argparse, csv
+    parser = argparse.ArgumentParser(prog='python -m lconfig',
+            description='LConfig data file utilities.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    sub = commands.add_parser('summarize', 
+            help='Summarize the data files in a directory')
+    sub.add_argument('directory', help='Directory of data files')
+    sub.add_argument('-p', '--pattern', default='*.dat',
+            help='File name pattern (default: *.dat)')
+    sub.add_argument('-f', '--format', choices=('csv', 'json'), default='csv',
+            help='Output format (default: csv)')
+    sub.add_argument('-o', '--output', default='-',
+            help='Output file (default: standard output)')
+    sub.add_argument('-j', '--nproc', type=int, default=None,
+            help='Number of worker processes (default: number of CPUs)')
+    sub.add_argument('--raw', action='store_true',
+            help='Do not apply the channel calibrations')
+    sub.add_argument('--no-cache', action='store_true',
+            help='Ignore and do not write the cached summaries')
+    sub = commands.add_parser('serve',
+            help='Serve decimated channel windows to local clients')
+    sub.add_argument('-p', '--port', type=int, default=8765,
+            help='TCP port on the loopback interface (default: 8765)')
+    sub.add_argument('--root', default=None,
+            help='Only serve files in this directory')
+    sub.add_argument('--maxfiles', type=int, default=8,
+            help='Number of loaded files to keep (default: 8)')
+    sub.add_argument('--cache', type=int, default=256,
+            help='Number of window, info, and stats responses to keep (default: 256)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        server = LServer(port=args.port, root=args.root, 
+                maxfiles=args.maxfiles, cache=args.cache)
+        sys.stderr.write('Serving on %s:%d\n'%server.address)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+        return 0
+
+    summaries = summarize(args.directory, pattern=args.pattern, 
+            nproc=args.nproc, cal=not args.raw, cache=not args.no_cache)
+    ff = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    try:
+        if args.format == 'json':
+            json.dump(summaries, ff, indent=1)
+            ff.write('\n')
+        else:
+            header, rows = _summary_rows(summaries)
+            writer = csv.writer(ff)
+            writer.writerow(header)
+            writer.writerows(rows)
+    finally:
+        if ff is not sys.stdout:
+            ff.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,425 @@
+#
+#   Simulated LabJack data acquisition producing LCONF data files
+#
+"""Synthetic LConf data from a configuration file
+
+    python lcsim.py lcburst.conf out.dat [--nsample N] [--rate HZ]
+
+The LSim class reads an LConfig configuration (like lcburst.conf or
+lcstat.conf) and writes data files in the same format that LCONFIG's data
+acquisition binaries produce: the configuration header, the end-of-
+configuration line and timestamp, and then rows of raw (uncalibrated)
+analog input values in blocks of the configured nsample.  The output can
+be a file, a named pipe, standard output, or any open file object, and
+rows can be paced at the configured samplehz (or any other rate) so that
+LFollow and the block readers can be exercised without hardware.
+
+    import lcsim
+    S = lcsim.LSim('lcburst.conf', meta={'fg_scfh':4.55, 'o2_scfh':5.49})
+    S.write('sim.dat', nsample=20000)
+    S.write('sim.dat', nsample=-1, rate=1000.)     # Until interrupted
+
+The analog outputs are synthesized from aosignal, aofrequency,
+aoamplitude, aooffset, and aoduty.  Each analog input is assigned a role
+from its label and units:
+
+    voltage     aicalunits "V" or a label containing "volt".  The first
+                analog output amplified by vgain and shifted by vbias.
+    current     aicalunits ending in "A" or a label containing "current".
+                The ion current response of a flame probe to the voltage
+                channel (see RESPONSE).
+    noise       Every other channel.  Its aicalzero with noise.
+
+Roles can be overridden with the roles keyword.  If digital input
+streaming is configured, bit 0 of the stream is high while the first
+analog output is rising, and bit 1 toggles at random.
+"""
+import os, sys, time, argparse
+import numpy as np
+import lconfig as lc
+
+# Default parameters of the simulated probe.  Currents are in the
+# calibrated units of the current channel (usually uA) and voltages in V.
+#   i = isat * tanh((v - v0)/vs) + g*(v - v0)
+# isat is multiplied by flow/10 when the fg_scfh and o2_scfh meta
+# parameters are both given.
+RESPONSE = {
+    'vgain':4.,
+    'vbias':-1.,
+    'isat':2.,
+    'v0':0.5,
+    'vs':1.,
+    'g':1.,
+    'inoise':0.5,
+    'vnoise':0.02,
+    'hum':0.2,
+    'humhz':60.,
+}
+
+
+def _format_value(value):
+    """Return a configuration value as a string for the LConfig format"""
+    if isinstance(value, lc.LEnum):
+        # Names that are shared by several values must be written by value
+        if value._strings.count(value.get()) > 1:
+            return '%d'%value.getvalue()
+        return value.get()
+    elif isinstance(value, str):
+        return '"%s"'%value
+    elif isinstance(value, float):
+        return '%f'%value
+    return '%d'%value
+
+
+def _differs(value, default):
+    if isinstance(value, lc.LEnum):
+        return value.getstate() != default.getstate()
+    return value != default
+
+
+def write_config(conf, ff, devnum=0, meta=None):
+    """Write a device configuration in the LConfig file format
+    write_config(conf, ff, devnum=0, meta=None)
+
+CONF is an LConf object and FF is an open text file.  The connection,
+sample rate, and sample count are always written along with every
+channel number; other parameters are only written when they differ from
+their defaults.  Empty strings are never written, since the LConfig
+parser cannot read them.  The end-of-configuration line is not written.
+If META is a dictionary, it is written in place of the configured meta
+parameters.
+"""
+    ff.write('# Configuration automatically generated by LCSIM\n')
+    for param, default in lc.DEF_DEV.items():
+        value = conf.get(devnum, param)
+        if param in ('connection', 'samplehz', 'nsample') or \
+                (_differs(value, default) and value != ''):
+            ff.write('%s %s\n'%(param, _format_value(value)))
+
+    groups = [('aich', 'Analog Inputs', 'aichannel', lc.DEF_AICH),
+            ('aoch', 'Analog Outputs', 'aochannel', lc.DEF_AOCH),
+            ('efch', 'Flexible IO', 'efchannel', lc.DEF_EFCH),
+            ('comch', 'Com Channels', 'comchannel', lc.DEF_COMCH)]
+    for source, title, first, defaults in groups:
+        channels = conf.get(devnum, source)
+        if channels:
+            ff.write('\n# %s\n'%title)
+        for index, channel in enumerate(channels):
+            if index:
+                ff.write('\n')
+            # The channel parameter must come first
+            ff.write('%s %s\n'%(first, _format_value(
+                    channel.get(first, defaults[first]))))
+            for param, default in defaults.items():
+                value = channel.get(param, default)
+                if param != first and _differs(value, default) and value != '':
+                    ff.write('%s %s\n'%(param, _format_value(value)))
+
+    domask = conf.get(devnum, 'domask')
+    if domask:
+        ff.write('\n# Digital output\n')
+        for channel in range(domask.bit_length()):
+            if domask & (1<<channel):
+                ff.write('do%d 1\n'%channel)
+
+    if meta is None:
+        meta = conf.get_meta(devnum)
+    if meta:
+        ff.write('\n# Meta Parameters\n')
+        for metatype, cls in (('int', int), ('float', float), ('str', str)):
+            params = [param for param in meta if type(meta[param]) is cls]
+            if params:
+                ff.write('meta %s\n'%metatype)
+                for param in params:
+                    ff.write('%s %s\n'%(param, _format_value(meta[param])))
+        ff.write('meta end\n')
+
+
+class LSim:
+    """Simulated LabJack data acquisition
+    S = LSim('lcburst.conf', devnum=0, seed=None, meta=None, roles=None,
+            **response)
+
+The configuration of device DEVNUM in the configuration file (or LConf
+object) is simulated.  SEED seeds the random number generator.  META is
+an optional dictionary of meta parameters to add or override; meta
+values must be int, float, or str.  ROLES is an optional dictionary
+mapping analog input indices or labels to 'voltage', 'current', or
+'noise'.  Other keywords override the probe parameters in RESPONSE.
+
+    S.header()              The configuration header as a string
+    S.generate(n)           The next n rows of raw data as an array
+    S.write(target)         Write a complete data file
+    S.reset()               Restart at sample zero
+
+The simulation is continuous across calls to generate() and write()
+until reset() is called.
+"""
+    def __init__(self, config, devnum=0, seed=None, meta=None, roles=None,
+            **response):
+        if isinstance(config, lc.LConf):
+            self.conf = config
+        else:
+            self.conf = lc.LConf(config)
+        if devnum >= self.conf.ndev():
+            raise Exception('LSIM: Device %d is not configured in %s'%(
+                    devnum, self.conf.filename))
+        self.devnum = devnum
+        self.seed = seed
+        self.meta = dict(self.conf.get_meta(devnum))
+        if meta:
+            self.meta.update(meta)
+        for param in response:
+            if param not in RESPONSE:
+                raise Exception('LSIM: Unrecognized response parameter: %s'%param)
+        self.response = dict(RESPONSE)
+        self.response.update(response)
+
+        self.samplehz = self.conf.get(devnum, 'samplehz')
+        if self.samplehz <= 0:
+            raise Exception('LSIM: The configuration does not specify samplehz')
+        self.nsample = self.conf.get(devnum, 'nsample')
+        self.distream = self.conf.get(devnum, 'distream')
+
+        # Assign the analog input roles
+        self.roles = []
+        for aich in range(self.conf.naich(devnum)):
+            label = self.conf.get(devnum, 'ailabel', aich=aich)
+            units = self.conf.get(devnum, 'aicalunits', aich=aich)
+            if units.lower() == 'v' or 'volt' in label.lower():
+                self.roles.append('voltage')
+            elif units.endswith('A') or 'current' in label.lower():
+                self.roles.append('current')
+            else:
+                self.roles.append('noise')
+        if roles:
+            for aich, role in roles.items():
+                if isinstance(aich, str):
+                    aich = self.conf.get_labels(devnum).index(aich)
+                if role not in ('voltage', 'current', 'noise'):
+                    raise Exception('LSIM: Unrecognized role: %s'%repr(role))
+                self.roles[aich] = role
+        self.reset()
+
+    def reset(self):
+        """Restart the simulation at sample zero"""
+        self.index = 0
+        self._rng = np.random.default_rng(self.seed)
+        self._distate = 0
+        self._aolast = None
+
+    def header(self, timestamp=None):
+        """Return the configuration header of the simulated data file
+    text = S.header(timestamp=None)
+
+TIMESTAMP is the seconds since the epoch to write in the timestamp line.
+It defaults to the current time.
+"""
+        out = _StringFile()
+        write_config(self.conf, out, self.devnum, meta=self.meta)
+        out.write('\n## End Configuration ##\n')
+        out.write('#: %s\n'%time.ctime(timestamp))
+        return out.text()
+
+    def aoch(self, aoch, t):
+        """Evaluate an analog output waveform at times t in seconds"""
+        conf, devnum = self.conf, self.devnum
+        signal = conf.get(devnum, 'aosignal', aoch=aoch).get()
+        frequency, amplitude, offset, duty = conf.get(devnum,
+                ('aofrequency', 'aoamplitude', 'aooffset', 'aoduty'), aoch=aoch)
+        phase = (t * frequency) % 1.
+        if signal == 'sine':
+            return offset + amplitude * np.sin(2*np.pi*phase)
+        elif signal == 'square':
+            return np.where(phase < duty, offset + amplitude, offset - amplitude)
+        elif signal == 'triangle':
+            # Rise for the duty fraction of the period and then fall
+            duty = min(max(duty, 1e-6), 1. - 1e-6)
+            ramp = np.where(phase < duty, phase/duty, (1. - phase)/(1. - duty))
+            return offset + amplitude * (2.*ramp - 1.)
+        elif signal == 'noise':
+            return offset + amplitude * self._rng.uniform(-1., 1., t.shape)
+        return np.full(t.shape, offset)
+
+    def current(self, v):
+        """Evaluate the noiseless probe current at voltages v"""
+        r = self.response
+        isat = r['isat']
+        if 'fg_scfh' in self.meta and 'o2_scfh' in self.meta:
+            isat *= (self.meta['fg_scfh'] + self.meta['o2_scfh']) / 10.
+        x = v - r['v0']
+        return isat * np.tanh(x / r['vs']) + r['g'] * x
+
+    def generate(self, n):
+        """Return the next n rows of raw data
+    data = S.generate(n)
+
+DATA is an (n, naich) array, or (n, naich+1) when digital input
+streaming is configured, of the raw values that would appear in the
+data file.  Calibrations are inverted so that LConf(..., cal=True)
+recovers the simulated values in calibrated units, and the raw values 
+are clipped to +/- airange, as they would be by the converter.
+"""
+        conf, devnum, r = self.conf, self.devnum, self.response
+        rng = self._rng
+        t = (self.index + np.arange(n)) * (1. / self.samplehz)
+        naich = conf.naich(devnum)
+        data = np.empty((n, naich + (1 if self.distream else 0)))
+
+        if conf.naoch(devnum):
+            ao = self.aoch(0, t)
+        else:
+            ao = np.zeros(n)
+        v = r['vgain'] * (ao - (conf.get(devnum, 'aooffset', aoch=0)
+                if conf.naoch(devnum) else 0.)) + r['vbias']
+        hum = r['hum'] * np.sin(2*np.pi*r['humhz']*t)
+        for aich, role in enumerate(self.roles):
+            if role == 'voltage':
+                y = v + r['vnoise']*rng.standard_normal(n)
+            elif role == 'current':
+                y = self.current(v) + hum + r['inoise']*rng.standard_normal(n)
+            else:
+                y = r['vnoise']*rng.standard_normal(n)
+            slope, zero = conf.get(devnum, ('aicalslope', 'aicalzero'), aich=aich)
+            if role == 'noise':
+                # Raw noise about the calibration zero
+                data[:,aich] = zero + y
+            else:
+                # Invert the calibration
+                data[:,aich] = y/slope + zero
+            # The converter cannot report values outside of its range
+            airange = conf.get(devnum, 'airange', aich=aich)
+            np.clip(data[:,aich], -airange, airange, out=data[:,aich])
+
+        if self.distream:
+            rising = np.zeros(n, dtype=bool)
+            if conf.naoch(devnum) and n:
+                # The first sample is compared with the last one of the previous block
+                last = ao[0] if self._aolast is None else self._aolast
+                rising = np.diff(ao, prepend=last) > 0
+                self._aolast = ao[-1]
+            toggle = (rng.random(n) < 0.01).cumsum() + self._distate
+            if n:
+                self._distate = toggle[-1]
+            data[:,-1] = rising.astype(int) | ((toggle % 2) << 1)
+        self.index += n
+        return data
+
+    def write(self, target, nsample=None, rate=None, blocksize=None,
+            timestamp=None):
+        """Write a simulated data file
+    S.write(target, nsample=None, rate=None, blocksize=None)
+
+TARGET is a file name, '-' for standard output, or an open text file.
+If TARGET names an existing named pipe, it is opened for writing, which
+waits for a reader.  NSAMPLE is the number of rows to write; it defaults
+to the configured nsample, and a negative value writes until the reader
+closes the pipe or the write is interrupted.  Rows are written and
+flushed in blocks of BLOCKSIZE rows (the configured nsample by default).
+
+RATE is the number of rows per second to write.  If it is None, the rows
+are paced at the configured samplehz, as a real acquisition would write
+them.  If it is 0, they are written as fast as possible.
+
+Returns the number of rows written.
+"""
+        if nsample is None:
+            nsample = self.nsample
+        if rate is None:
+            rate = self.samplehz
+        if blocksize is None:
+            blocksize = self.nsample if self.nsample > 0 else 64
+
+        if target == '-':
+            return self._write(sys.stdout, nsample, rate, blocksize, timestamp)
+        elif isinstance(target, str):
+            with open(target, 'w') as ff:
+                return self._write(ff, nsample, rate, blocksize, timestamp)
+        return self._write(target, nsample, rate, blocksize, timestamp)
+
+    def _write(self, ff, nsample, rate, blocksize, timestamp):
+        ff.write(self.header(timestamp))
+        ff.flush()
+        count = 0
+        t0 = time.perf_counter()
+        try:
+            while nsample < 0 or count < nsample:
+                n = blocksize if nsample < 0 else min(blocksize, nsample - count)
+                data = self.generate(n)
+                if self.distream:
+                    fmt = ['%e']*(data.shape[1]-1) + ['%d']
+                else:
+                    fmt = '%e'
+                np.savetxt(ff, data, fmt=fmt, delimiter='\t')
+                ff.flush()
+                count += n
+                if rate > 0:
+                    # Sleep until the block is due
+                    delay = t0 + count/rate - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+        except (BrokenPipeError, KeyboardInterrupt):
+            pass
+        return count
+
+
+class _StringFile:
+    """Minimal writable text buffer"""
+    def __init__(self):
+        self._parts = []
+
+    def write(self, text):
+        self._parts.append(text)
+
+    def text(self):
+        return ''.join(self._parts)
+
+
+def _meta_value(text):
+    for cls in (int, float):
+        try:
+            return cls(text)
+        except ValueError:
+            pass
+    return text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+            description='Write simulated LConf data from a configuration file.')
+    parser.add_argument('config', help='LConfig configuration file')
+    parser.add_argument('output', nargs='?', default='-',
+            help='Output data file or named pipe (default: standard output)')
+    parser.add_argument('-d', '--devnum', type=int, default=0,
+            help='Device number in the configuration to simulate')
+    parser.add_argument('-n', '--nsample', type=int, default=None,
+            help='Number of rows to write; negative to write until interrupted')
+    parser.add_argument('-r', '--rate', type=float, default=None,
+            help='Rows per second (default: samplehz; 0 for unpaced)')
+    parser.add_argument('-b', '--blocksize', type=int, default=None,
+            help='Rows per written block (default: nsample)')
+    parser.add_argument('-s', '--seed', type=int, default=None,
+            help='Random number generator seed')
+    parser.add_argument('-m', '--meta', nargs='*', default=[],
+            help='Meta parameters as name=value')
+    parser.add_argument('--fifo', action='store_true',
+            help='Create the output as a named pipe if it does not exist')
+    args = parser.parse_args(argv)
+
+    meta = {}
+    for item in args.meta:
+        name, sep, value = item.partition('=')
+        if not sep:
+            parser.error('Meta parameters must be given as name=value: %s'%item)
+        meta[name.lower()] = _meta_value(value)
+
+    if args.fifo and args.output != '-' and not os.path.exists(args.output):
+        os.mkfifo(args.output)
+    sim = LSim(args.config, devnum=args.devnum, seed=args.seed, meta=meta)
+    sim.write(args.output, nsample=args.nsample, rate=args.rate,
+            blocksize=args.blocksize)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())